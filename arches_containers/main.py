@@ -1,25 +1,94 @@
 import argparse
-from rich_argparse import RichHelpFormatter
 import os
-import webbrowser
-from slugify import slugify
 from arches_containers import AC_VERSION as arches_containers_version
-from arches_containers.manage import compose_project, initialize_project, status
+from arches_containers.manage import compose_project, up_project, init_project, build_project, status, watch, get_project_app_port, SERVER_MODES
 import arches_containers.utils.arches_repo_helper as arches_repo_helper
 from arches_containers.utils.workspace import AcWorkspace, AcSettings, AcProject, AcProjectSettings
+from arches_containers.utils.session import AcSession
+from arches_containers.utils.templates import load_manifest
 from arches_containers.utils.create_launch_config import generate_launch_config
+from arches_containers.utils.status import get_all_projects_status
 from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.orchestrator import run_for_projects, DEFAULT_MAX_WORKERS
+from arches_containers.utils.ports import find_port_conflicts
+from arches_containers.utils.timing import timing_run, get_history_path, report_stats, DEFAULT_BASELINE_RUNS, DEFAULT_REGRESSION_THRESHOLD
+
+
+class RichHelpFormatter(argparse.HelpFormatter):
+    '''
+    Help formatter that only imports rich_argparse when help or usage is actually rendered.
+
+    argparse builds a formatter for every add_argument call, so the rich formatter is created on first use of the help-rendering methods.
+    '''
+    def __init__(self, prog, *args, **kwargs):
+        super().__init__(prog, *args, **kwargs)
+        self._formatter_args = (prog, args, kwargs)
+        self._rich_formatter = None
+
+    def _rich(self):
+        if self._rich_formatter is None:
+            from rich_argparse import RichHelpFormatter as _RichHelpFormatter
+
+            prog, args, kwargs = self._formatter_args
+            self._rich_formatter = _RichHelpFormatter(prog, *args, **kwargs)
+        return self._rich_formatter
+
+    def start_section(self, heading):
+        self._rich().start_section(heading)
+
+    def end_section(self):
+        self._rich().end_section()
+
+    def add_text(self, text):
+        self._rich().add_text(text)
+
+    def add_usage(self, usage, actions, groups, prefix=None):
+        self._rich().add_usage(usage, actions, groups, prefix)
+
+    def add_argument(self, action):
+        self._rich().add_argument(action)
+
+    def add_arguments(self, actions):
+        self._rich().add_arguments(actions)
+
+    def format_help(self):
+        return self._rich().format_help()
+
+
+def resolve_project_names(args, session):
+    '''
+    Returns the projects a command should operate on: every project with --all, the names passed with -p, or the active project.
+    '''
+    if args.all:
+        project_names = session.workspace.list_projects()
+        if not project_names:
+            AcOutputManager.fail("No projects found. Run 'arches-containers create' to create a new project.")
+        return project_names
+    if args.project_name:
+        # drop repeated names while keeping the order they were given in
+        return list(dict.fromkeys(args.project_name))
+    try:
+        return [session.settings.get_active_project().project_name]
+    except Exception as e:
+        AcOutputManager.fail("No project name passed and no active project set. Run 'arches-containers create' to create a new project.")
+
+
+def describe_projects(project_names):
+    if len(project_names) == 1:
+        return f"project: {project_names[0]}"
+    return f"projects: {', '.join(project_names)}"
 
 
 def main():
     parser = argparse.ArgumentParser(description="Create and manage Arches container projects.", formatter_class=RichHelpFormatter)
     
-    subparsers = parser.add_subparsers(dest="command", help="Sub-command help")
+    # prog is passed explicitly so argparse does not build a help formatter (and import rich) just to derive it
+    subparsers = parser.add_subparsers(dest="command", help="Sub-command help", prog=parser.prog)
     
     # Sub-parser for the create command
     parser_create = subparsers.add_parser("create", help="Create a new container project", formatter_class=parser.formatter_class)
     parser_create.add_argument("-p", "--project_name", required=True, help="The name of the project. This value will be slugified to lowercase with underscore separators")
-    parser_create.add_argument("-v", "--version", "--ver", required=True, help="The arches version the project will be using (major.minor format)")
+    parser_create.add_argument("-v", "--version", "--ver", required=True, help="The arches version the project will be using (major.minor format). Run 'act versions' to list supported versions")
     parser_create.add_argument("-o", "--organization", default="archesproject", help="The GitHub organization of the arches repo (default: archesproject)")
     parser_create.add_argument("-br", "--branch", help="The branch of the arches repo to use. Default is the 'dev/<version>.x' branch.")
     parser_create.add_argument("--activate", action="store_true", help="Activate the project after creation.")
@@ -27,26 +96,40 @@ def main():
 
     # Sub-parser for starting containers
     parser_up = subparsers.add_parser("up", help="Start the project containers", formatter_class=parser.formatter_class)
-    parser_up.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    project_group_up = parser_up.add_mutually_exclusive_group()
+    project_group_up.add_argument("-p", "--project_name", nargs="+", action="extend", default=[], help="The name of one or more projects. If excluded, the active project will be used.")
+    project_group_up.add_argument("--all", action="store_true", help="Operate on every project in the workspace")
+    parser_up.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_WORKERS, help=f"The number of projects to operate on at once (default: {DEFAULT_MAX_WORKERS})")
     parser_up.add_argument("-b", "--build", action="store_true", help="Rebuild containers when composing up")
     parser_up.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output during the compose processes")
+    parser_up.add_argument("--mode", choices=SERVER_MODES, default="debug", help="The application server: the Django development server (default; see --debug), or gunicorn with the worker and thread counts from the project config (perf). perf never starts the debugger")
+    parser_up.add_argument("--debug", action=argparse.BooleanOptionalAction, default=None, help="Start the development server under the debugpy listener on the project's debugpy port, 5678 plus its port_offset (--no-debug to run it without). Default is the project's debugpy setting, which is off unless turned on with 'act generate-debug-config --debug'. Not allowed with --mode perf")
     container_group_up = parser_up.add_mutually_exclusive_group()
     container_group_up.add_argument("--app", action="store_true", help="Only operate on application containers (docker-compose.yml)")
     container_group_up.add_argument("--dep", action="store_true", help="Only operate on dependency containers (docker-compose-dependencies.yml)")
 
     # Sub-parser for stopping containers
     parser_down = subparsers.add_parser("down", help="Stop the project containers", formatter_class=parser.formatter_class)
-    parser_down.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    project_group_down = parser_down.add_mutually_exclusive_group()
+    project_group_down.add_argument("-p", "--project_name", nargs="+", action="extend", default=[], help="The name of one or more projects. If excluded, the active project will be used.")
+    project_group_down.add_argument("--all", action="store_true", help="Operate on every project in the workspace")
+    parser_down.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_WORKERS, help=f"The number of projects to operate on at once (default: {DEFAULT_MAX_WORKERS})")
     parser_down.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output during the compose processes")
     container_group_down = parser_down.add_mutually_exclusive_group()
     container_group_down.add_argument("--app", action="store_true", help="Only operate on application containers (docker-compose.yml)")
     container_group_down.add_argument("--dep", action="store_true", help="Only operate on dependency containers (docker-compose-dependencies.yml)")
 
     # Sub-parser for restarting containers
-    parser_restart = subparsers.add_parser("restart", help="Restart the project containers (down + up)", formatter_class=parser.formatter_class)
-    parser_restart.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    parser_restart = subparsers.add_parser("restart", help="Restart the project containers, recreating only the services whose configuration or image changed", formatter_class=parser.formatter_class)
+    project_group_restart = parser_restart.add_mutually_exclusive_group()
+    project_group_restart.add_argument("-p", "--project_name", nargs="+", action="extend", default=[], help="The name of one or more projects. If excluded, the active project will be used.")
+    project_group_restart.add_argument("--all", action="store_true", help="Operate on every project in the workspace")
+    parser_restart.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_WORKERS, help=f"The number of projects to operate on at once (default: {DEFAULT_MAX_WORKERS})")
     parser_restart.add_argument("-b", "--build", action="store_true", help="Rebuild containers when composing up")
     parser_restart.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output during the compose processes")
+    parser_restart.add_argument("--mode", choices=SERVER_MODES, default="debug", help="The application server: the Django development server (default; see --debug), or gunicorn with the worker and thread counts from the project config (perf). perf never starts the debugger")
+    parser_restart.add_argument("--debug", action=argparse.BooleanOptionalAction, default=None, help="Start the development server under the debugpy listener on the project's debugpy port, 5678 plus its port_offset (--no-debug to run it without). Default is the project's debugpy setting, which is off unless turned on with 'act generate-debug-config --debug'. Not allowed with --mode perf")
+    parser_restart.add_argument("--full", action="store_true", help="Bring every container down and up again (down + up), even if unchanged")
     container_group_restart = parser_restart.add_mutually_exclusive_group()
     container_group_restart.add_argument("--app", action="store_true", help="Only operate on application containers (docker-compose.yml)")
     container_group_restart.add_argument("--dep", action="store_true", help="Only operate on dependency containers (docker-compose-dependencies.yml)")
@@ -64,12 +147,22 @@ def main():
     # Sub-parser for the list command
     parser_list = subparsers.add_parser("list", help="List all container projects", formatter_class=parser.formatter_class)
     
+    # Sub-parser for the upgrade command
+    parser_upgrade = subparsers.add_parser("upgrade", help="Update the project's files from the current templates, keeping local edits", formatter_class=parser.formatter_class)
+    parser_upgrade.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    parser_upgrade.add_argument("--dry-run", action="store_true", help="Report what would change without writing any files")
+    parser_upgrade.add_argument("--force", action="store_true", help="Overwrite conflicting files with the template version, keeping the local file as <file>.orig")
+
+    # Sub-parser for the versions command
+    parser_versions = subparsers.add_parser("versions", help="List the supported Arches versions", formatter_class=parser.formatter_class)
+
     # Sub-parser for the delete command
     parser_delete = subparsers.add_parser("delete", help="Delete an existing container project", formatter_class=parser.formatter_class)
     parser_delete.add_argument("-p", "--project_name", required=True, help="The name of the project to delete")
     
     # Sub-parser for the generate-launch-config command
     parser_launch = subparsers.add_parser("generate-debug-config", help="Generate vscode launch.json configuration for the workspace", formatter_class=parser.formatter_class)
+    parser_launch.add_argument("--debug", action=argparse.BooleanOptionalAction, default=None, help="Turn the active project's debugpy setting on (or off with --no-debug), so 'up' and 'restart' start the debug listener the configuration attaches to")
     
     # Sub-parser for the export command
     parser_export = subparsers.add_parser("export", help="Export a project to a given repository folder", formatter_class=parser.formatter_class)
@@ -83,26 +176,72 @@ def main():
 
     # Sub-parser for the status command
     parser_status = subparsers.add_parser("status", help="Check container status", formatter_class=parser.formatter_class)
+    project_group_status = parser_status.add_mutually_exclusive_group()
+    project_group_status.add_argument("-p", "--project_name", nargs="+", action="extend", default=[], help="The name of one or more projects. If excluded, the active project will be used.")
+    project_group_status.add_argument("--all", action="store_true", help="Operate on every project in the workspace")
+    parser_status.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_WORKERS, help=f"The number of projects to operate on at once (default: {DEFAULT_MAX_WORKERS})")
+    parser_status.add_argument("-w", "--watch", action="store_true", help="Keep watching and update the table as containers start, become healthy, die or restart")
+
+    # Sub-parser for the stats command
+    parser_stats = subparsers.add_parser("stats", help="Show timing statistics for previous up, down, restart, init and build runs", formatter_class=parser.formatter_class)
+    parser_stats.add_argument("-p", "--project_name", help="Only show timings for this project. Default is all projects.")
+    parser_stats.add_argument("-c", "--command_name", choices=["up", "down", "restart", "init", "build"], help="Only show timings for this command")
+    parser_stats.add_argument("--baseline", type=int, default=DEFAULT_BASELINE_RUNS, help=f"The number of previous runs the last run is compared against (default: {DEFAULT_BASELINE_RUNS})")
+    parser_stats.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD * 100, help=f"The percentage slowdown against the baseline that is flagged as a regression (default: {DEFAULT_REGRESSION_THRESHOLD * 100:.0f})")
+
+    # Sub-parser for the top command
+    parser_top = subparsers.add_parser("top", help="Show live CPU, memory and I/O usage of the project containers", formatter_class=parser.formatter_class)
+    parser_top.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    parser_top.add_argument("-i", "--interval", type=float, default=2.0, help="Seconds between refreshes (default: 2)")
+    parser_top.add_argument("--json", nargs="?", const="-", metavar="FILE", help="Write a single JSON snapshot to FILE (or stdout if no file is given) instead of the live table")
+
+    # Sub-parser for building the project image
+    parser_build = subparsers.add_parser("build", help="Build the project image, optionally importing and exporting the build cache as a local directory", formatter_class=parser.formatter_class)
+    parser_build.add_argument("-p", "--project_name", default="", help="The name of the project. If excluded, the active project will be used.")
+    parser_build.add_argument("--cache-from", metavar="DIR", help="Import the build cache from this directory (e.g. one restored by a CI cache step)")
+    parser_build.add_argument("--cache-to", metavar="DIR", help="Export the build cache to this directory, replacing any cache already there")
+    parser_build.add_argument("--target", choices=["dev", "runtime"], default="dev", help="The image to build: the development image the project runs (default), or the slim deployable runtime image, tagged he/<project>:runtime")
+    parser_build.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output during the build")
+
+    # Sub-parser for the shared base images
+    parser_images = subparsers.add_parser("images", help="Build, list and prune the shared per-version Arches base images", formatter_class=parser.formatter_class)
+    images_subparsers = parser_images.add_subparsers(dest="images_command", required=True, prog=f"{parser.prog} images")
+    parser_images_build = images_subparsers.add_parser("build", help="Build (or rebuild) the base image of an Arches version", formatter_class=parser.formatter_class)
+    parser_images_build.add_argument("-v", "--version", "--ver", required=True, help="The arches version of the base image (major.minor format). Run 'act versions' to list supported versions")
+    parser_images_build.add_argument("-o", "--organization", default="archesproject", help="The GitHub organization of the arches repo the dependencies are read from (default: archesproject)")
+    parser_images_build.add_argument("-br", "--branch", help="The branch of the arches repo the dependencies are read from. Default is the 'dev/<version>.x' branch.")
+    parser_images_build.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output during the build")
+    images_subparsers.add_parser("list", help="List the base images and the projects built from each", formatter_class=parser.formatter_class)
+    parser_images_prune = images_subparsers.add_parser("prune", help="Remove the base images no workspace project uses, and dangling images left by rebuilds", formatter_class=parser.formatter_class)
+    parser_images_prune.add_argument("--all", action="store_true", help="Remove every base image, including those workspace projects use")
+    parser_images_prune.add_argument("-vb", "--verbose", action="store_true", help="Print verbose output while removing images")
 
     # Sub-parser for the view command
     parser_view = subparsers.add_parser("view", help="View the active project in a web browser", formatter_class=parser.formatter_class)
     args = parser.parse_args()
+    if getattr(args, "mode", None) == "perf" and getattr(args, "debug", None):
+        # gunicorn runs without the debugpy listener, so the flag would be silently ignored
+        parser.error("argument --debug: not allowed with argument --mode perf")
+    if args.command == "top" and args.interval <= 0:
+        parser.error("argument -i/--interval: must be greater than 0")
     
 
     ac_workspace = AcWorkspace()
-    ac_settings = ac_workspace.get_settings()
+    session = AcSession(ac_workspace)
+    ac_settings = session.settings
 
     # ========================================================================================================
     if args.command == "create":
         with AcOutputManager("Creating project") as spinner:
             AcOutputManager.write(f"▶️  Creating project: {args.project_name}")
-            
+            from slugify import slugify
+
             project_name = slugify(args.project_name)
             project = ac_workspace.create_project(project_name, args)
             if args.activate:
                 ac_settings.set_active_project(project.project_name)
     # ========================================================================================================
-    elif args.command in ["up", "down", "init", "activate", "restart"]:
+    elif args.command in ["init", "activate"]:
         if args.project_name == "" and args.command != "activate":
             try:
                 args.project_name = ac_settings.get_active_project().project_name
@@ -113,7 +252,7 @@ def main():
             AcOutputManager.write(f"▶️  {args.command.capitalize()} command for project: {args.project_name}")
             
             if hasattr(args, 'organization') or hasattr(args, 'branch'):
-                ac_project = ac_workspace.get_project(args.project_name)
+                ac_project = session.get_project(args.project_name)
                 if hasattr(args, 'organization') and args.organization:
                     ac_project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value] = args.organization
                 if hasattr(args, 'branch') and args.branch:
@@ -125,24 +264,42 @@ def main():
 
             if args.command == "activate":
                 ac_settings.set_active_project(args.project_name)
-                arches_repo_helper.clone_and_checkout_repo(args.project_name, verbose=args.verbose)
+                arches_repo_helper.clone_and_checkout_repo(args.project_name, verbose=args.verbose, session=session)
                 AcOutputManager.complete_step(f"Project '{args.project_name}' set as active.")
             elif args.command == "init":
-                arches_repo_helper.clone_and_checkout_repo(args.project_name, verbose=args.verbose)
-                initialize_project(args.project_name, args.verbose)
-            elif args.command == "restart":
-                arches_repo_helper.change_arches_branch(args.project_name, verbose=args.verbose)
-                # Determine container type
-                container_type = "app" if getattr(args, 'app', False) else "dep" if getattr(args, 'dep', False) else "both"
-                # First bring containers down
-                compose_project(args.project_name, "down", False, args.verbose, container_type)
-                # Then bring them up, with build if requested
-                compose_project(args.project_name, "up", getattr(args, 'build', False), args.verbose, container_type)
-            else:
-                arches_repo_helper.change_arches_branch(args.project_name, verbose=args.verbose)
-                # Determine container type
-                container_type = "app" if getattr(args, 'app', False) else "dep" if getattr(args, 'dep', False) else "both"
-                compose_project(args.project_name, args.command, getattr(args, 'build', False), args.verbose, container_type)
+                with timing_run(args.command, args.project_name, get_history_path(ac_workspace)):
+                    init_project(args.project_name, args.verbose, session=session)
+
+    # ========================================================================================================
+    elif args.command in ["up", "down", "restart"]:
+        project_names = resolve_project_names(args, session)
+        if args.command != "down" and len(project_names) > 1:
+            # projects that publish the same host ports cannot run at the same time
+            port_offsets = {project_name: ac_workspace.get_project(project_name).get(AcProjectSettings.PROJECT_PORT_OFFSET.value) for project_name in project_names}
+            conflicts = find_port_conflicts(port_offsets)
+            if conflicts:
+                for project_name, other_name, ports in conflicts:
+                    AcOutputManager.write(f"... ❌ projects {project_name} and {other_name} both publish host ports {', '.join(str(port) for port in ports)}.")
+                AcOutputManager.fail(f"cannot {args.command} projects that share host ports together. Set a different port_offset in the config.json of one of each pair and run 'act upgrade' on it.")
+        # Determine container type
+        container_type = "app" if getattr(args, 'app', False) else "dep" if getattr(args, 'dep', False) else "both"
+
+        def run_command(project_name):
+            with timing_run(args.command, project_name, get_history_path(ac_workspace)):
+                if args.command == "down":
+                    arches_repo_helper.change_arches_branch(project_name, verbose=args.verbose, session=session)
+                    compose_project(project_name, "down", False, args.verbose, container_type, session=session)
+                else:
+                    # up and restart sync the repo, build and start (recreating only changed services on restart) as a task graph so independent steps overlap
+                    up_project(project_name, getattr(args, 'build', False), args.verbose, container_type, session=session, restart=args.command == "restart", full=getattr(args, 'full', False), mode=args.mode, debug=args.debug)
+
+        with AcOutputManager(f"Running {args.command} command for {describe_projects(project_names)}") as spinner:
+            AcOutputManager.write(f"▶️  {args.command.capitalize()} command for {describe_projects(project_names)}")
+            if args.verbose:
+                AcOutputManager.pretty_write_args(vars(args))
+            exit_code = run_for_projects(project_names, run_command, args.jobs)
+        if exit_code:
+            exit(exit_code)
 
     # ========================================================================================================
     elif args.command == "list":
@@ -159,6 +316,25 @@ def main():
             else:
                 AcOutputManager.write(f"   - {project}")
 
+    # ========================================================================================================
+    elif args.command == "upgrade":
+        if args.project_name == "":
+            try:
+                args.project_name = ac_settings.get_active_project_name()
+            except Exception as e:
+                AcOutputManager.fail("No project name passed and no active project set. Run 'arches-containers create' to create a new project.")
+
+        AcOutputManager.write(f"▶️  Upgrading project: {args.project_name}{' (dry run)' if args.dry_run else ''}")
+        conflicts = ac_workspace.upgrade_project(args.project_name, dry_run=args.dry_run, force=args.force)
+        if conflicts:
+            AcOutputManager.fail(f"Upgrade of '{args.project_name}' left {len(conflicts)} conflict(s).")
+
+    # ========================================================================================================
+    elif args.command == "versions":
+        AcOutputManager.write("▶️  Supported Arches Versions")
+        for version, template in load_manifest()["versions"].items():
+            AcOutputManager.write(f"   - {version} (default branch: {template['default_branch']})")
+
     # ========================================================================================================
     elif args.command == "delete":
         AcOutputManager.write(f"▶️  Deleting project: {args.project_name}")
@@ -168,7 +344,7 @@ def main():
     # ========================================================================================================
     elif args.command == "generate-debug-config":
         with AcOutputManager("Generating launch.json") as spinner:
-            generate_launch_config()
+            generate_launch_config(session, args.debug)
     
     # ========================================================================================================
     elif args.command == "export":
@@ -192,16 +368,97 @@ def main():
     
     # ========================================================================================================
     elif args.command == "status":
-        with AcOutputManager("Checking active project container status") as spinner:
-            AcOutputManager.write("▶️  Checking active project container status")
-            status()
+        project_names = resolve_project_names(args, session)
+        if args.watch:
+            AcOutputManager.write(f"▶️  Watching container status for {describe_projects(project_names)}")
+            watch(session, project_names)
+        else:
+            with AcOutputManager(f"Checking container status for {describe_projects(project_names)}") as spinner:
+                AcOutputManager.write(f"▶️  Checking container status for {describe_projects(project_names)}")
+                if args.all:
+                    # a single list call covers every project
+                    get_all_projects_status(project_names)
+                    exit_code = 0
+                else:
+                    exit_code = run_for_projects(project_names, lambda project_name: status(session, project_name), args.jobs)
+            if exit_code:
+                exit(exit_code)
+
+    # ========================================================================================================
+    elif args.command == "stats":
+        AcOutputManager.write("▶️  Timing statistics")
+        report_stats(get_history_path(ac_workspace), args.project_name, args.command_name, args.baseline, args.threshold / 100)
+
+    # ========================================================================================================
+    elif args.command == "top":
+        from arches_containers.utils.top import run_top, write_snapshot
+        from arches_containers.utils.docker_api import AcDockerApiError
+
+        if args.project_name == "":
+            try:
+                args.project_name = ac_settings.get_active_project_name()
+            except Exception as e:
+                AcOutputManager.fail("No project name passed and no active project set. Run 'arches-containers create' to create a new project.")
+
+        try:
+            if args.json:
+                write_snapshot(args.project_name, args.json)
+            else:
+                AcOutputManager.write(f"▶️  Container resource usage for project: {args.project_name}")
+                run_top(args.project_name, args.interval)
+        except AcDockerApiError as e:
+            AcOutputManager.fail(f"top needs the Docker Engine API: {e}")
+
+    # ========================================================================================================
+    elif args.command == "build":
+        if args.project_name == "":
+            try:
+                args.project_name = ac_settings.get_active_project_name()
+            except Exception as e:
+                AcOutputManager.fail("No project name passed and no active project set. Run 'arches-containers create' to create a new project.")
+
+        with AcOutputManager(f"Building project: {args.project_name}") as spinner:
+            AcOutputManager.write(f"▶️  Build command for project: {args.project_name}")
+            if args.verbose:
+                AcOutputManager.pretty_write_args(vars(args))
+            with timing_run(args.command, args.project_name, get_history_path(ac_workspace)):
+                build_project(args.project_name, args.cache_from, args.cache_to, args.verbose, session=session, stage=None if args.target == "dev" else args.target)
+
+    # ========================================================================================================
+    elif args.command == "images":
+        from arches_containers.utils.base_image import AcBaseImageError, build_base_image, write_base_images, prune_base_images
+
+        project_versions = {name: ac_workspace.get_project(name)[AcProjectSettings.PROJECT_ARCHES_VERSION.value] for name in ac_workspace.list_projects()}
+        try:
+            if args.images_command == "build":
+                with AcOutputManager(f"Building base image for Arches {args.version}") as spinner:
+                    AcOutputManager.write(f"▶️  Building base image for Arches {args.version}")
+                    image = build_base_image(args.version, args.organization, args.branch, args.verbose)
+                    AcOutputManager.complete_step(f"base image {image} built.")
+            elif args.images_command == "list":
+                AcOutputManager.write("▶️  Arches Base Images")
+                write_base_images(project_versions)
+            elif args.images_command == "prune":
+                AcOutputManager.write("▶️  Pruning base images")
+                removed, failed = prune_base_images(set(project_versions.values()), args.all, args.verbose)
+                for image in removed:
+                    AcOutputManager.complete_step(f"removed {image}.")
+                for image in failed:
+                    AcOutputManager.skipped_step(f"could not remove {image}; it is still used by a container.")
+                if not removed and not failed:
+                    AcOutputManager.complete_step("no unused base images to remove.")
+        except AcBaseImageError as e:
+            AcOutputManager.fail(str(e))
 
     # ========================================================================================================
     elif args.command == "view":
-        ac_settings = AcWorkspace().get_settings().settings
-        host = ac_settings["host"]
-        port = ac_settings["port"]
-        url = f"http://{host}:{port}/"
+        import webbrowser
+
+        active_project = ac_settings.get_active_project()
+        if active_project is None:
+            AcOutputManager.fail("No active project set. Run 'arches-containers activate' to set an active project.")
+        host = ac_settings.settings["host"]
+        url = f"http://{host}:{get_project_app_port(active_project)}/"
         webbrowser.open(url)
 
     # ========================================================================================================
@@ -1,99 +1,446 @@
 import os, sys
+import json
+import shutil
+import tempfile
 import subprocess
-from time import sleep
-from arches_containers.utils.workspace import AcWorkspace, AcSettings, AcProject
+from time import monotonic
+from arches_containers.utils.workspace import AcWorkspace, AcSettings, AcProject, AcProjectSettings
+from arches_containers.utils.session import AcSession
 import arches_containers.utils.arches_repo_helper as arches_repo_helper
 from arches_containers.utils.logger import AcOutputManager
 from arches_containers.utils.status import get_running_containers
+from arches_containers.utils.timing import timed_phase
+from arches_containers.utils.pipeline import AcPipeline
+from arches_containers.utils.config_store import atomic_write_text
 
 DOCKER_COMPOSE_INIT_FILE = "docker-compose-init.yml"
+# exporting the build cache to a directory needs a docker-container builder; the default docker driver cannot do it
+BUILDX_BUILDER = "arches-containers"
 DOCKER_COMPOSE_FILE = "docker-compose.yml"
 DOCKER_COMPOSE_DEPENDENCIES_FILE = "docker-compose-dependencies.yml"
+# read by docker compose from the project directory, so every compose command on the project sees the same server mode
+SERVER_ENV_FILE = ".env"
+SERVER_MODES = ("debug", "perf")
 
 
-def test_project_service_available_with_status_200(project_name) -> bool:
+def _run_command(command, cwd, verbose=False):
+    # cwd is passed rather than changing directory so several projects can be composed concurrently
+    if verbose:
+        return subprocess.run(command, cwd=cwd)
+    return subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def _container_exited_check(container_name):
     '''
-    Test if the project service is available.
+    Returns an abort check for wait_for_service that stops waiting once the application container is no longer running.
     '''
-    ac_settings = AcWorkspace().get_settings().settings
-    host = ac_settings["host"]
-    port = ac_settings["port"]
-    url = f"http://{host}:{port}/"
-    result = subprocess.run(["curl", "-s", "-o", "/dev/null", "-w", "%{http_code}\n", url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    if result.returncode != 0 and result.stdout != "200":
-        return False
-    else:
-        return True
+    def check():
+        result = subprocess.run(["docker", "inspect", "--format", "{{.State.Status}}", container_name], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        state = result.stdout.strip()
+        if result.returncode == 0 and state in ("exited", "dead"):
+            return f"container {container_name} has {state}"
+        return None
+    return check
 
-def compose_project(project_name, action="up", build=False, verbose=False, container_type="both"):
+def get_project_app_port(project):
     '''
-    Compose the project using docker-compose.yml and docker-compose-dependencies.yml files.
-    container_type can be 'both', 'app', or 'dep' to control which containers are affected.
+    Returns the host port the project's application container is published on.
     '''
-    container_desc = {
-        "both": "project",
-        "app": "application",
-        "dep": "dependency"
-    }
-    AcOutputManager.text(f"{'starting' if action == 'up' else 'stopping'} {container_desc[container_type]} containers")
-    project = AcWorkspace().get_project(project_name)
-    project_path = project.get_project_path()    
-    
-    # Select compose files based on container_type
+    from arches_containers.utils.ports import APP_PORT, get_project_ports
+
+    return get_project_ports(project.get(AcProjectSettings.PROJECT_PORT_OFFSET.value))[APP_PORT]
+
+def wait_for_project_service(project_name, session=None):
+    '''
+    Wait for the project service to respond with a 2xx or 3xx status, failing once the service_timeout setting is exceeded or the application container exits.
+    '''
+    from arches_containers.utils.readiness import wait_for_service
+
+    ac_workspace = session.workspace if session else AcWorkspace()
+    ac_settings = ac_workspace.get_settings().settings
+    project = ac_workspace.get_project(project_name)
+    url = f"http://{ac_settings['host']}:{get_project_app_port(project)}/"
+    result = wait_for_service(url, ac_settings["service_timeout"], abort_check=_container_exited_check(project["project_name_url_safe"]))
+
+    if result.first_response is not None:
+        AcOutputManager.complete_step(f"first response from project service after {result.first_response:.1f}s.")
+    if not result.ready:
+        last_status = f"HTTP {result.status}" if result.status is not None else "no response"
+        AcOutputManager.fail(f"project service at {url} not available: {result.reason} (last: {last_status}). Check the container logs.")
+    else:
+        AcOutputManager.complete_step(f"project service available after {result.ready_after:.1f}s (HTTP {result.status}).")
+
+CONTAINER_DESCRIPTIONS = {
+    "both": "project",
+    "app": "application",
+    "dep": "dependency"
+}
+
+def _compose_files(container_type, action="up"):
     if container_type == "app":
-        compose_files = [DOCKER_COMPOSE_FILE]
-    elif container_type == "dep":
-        compose_files = [DOCKER_COMPOSE_DEPENDENCIES_FILE]
-    else:  # container_type == "both"
-        compose_files = [DOCKER_COMPOSE_DEPENDENCIES_FILE, DOCKER_COMPOSE_FILE]
-        if action == "down":
-            compose_files.reverse()
-    
+        return [DOCKER_COMPOSE_FILE]
+    if container_type == "dep":
+        return [DOCKER_COMPOSE_DEPENDENCIES_FILE]
+    # dependencies start first and stop last
+    compose_files = [DOCKER_COMPOSE_DEPENDENCIES_FILE, DOCKER_COMPOSE_FILE]
+    if action == "down":
+        compose_files.reverse()
+    return compose_files
+
+def _compose_kind(compose_file):
+    return "dependencies" if compose_file == DOCKER_COMPOSE_DEPENDENCIES_FILE else "app"
+
+def _compose_build(project_path, compose_file, verbose=False):
+    '''
+    Build the images of one compose file (equivalent to 'up --build', run as its own step so the build time is recorded on its own).
+    '''
+    kind = _compose_kind(compose_file)
+    AcOutputManager.text(f"building {kind} images")
+    with timed_phase(f"build_{kind}"):
+        result = _run_command(["docker", "compose", "-f", os.path.join(project_path, compose_file), "build"], project_path, verbose)
+    if result.returncode != 0:
+        AcOutputManager.fail(f"failed to build the images in {compose_file}.")
+
+def _compose_file(project_path, compose_file, action, dependency_timeout, verbose=False, services=None):
+    '''
+    Run 'docker compose up' or 'down' for one compose file. Bringing the dependencies up waits for their healthchecks to pass.
+    If services are given, only those services are force-recreated and the rest of the file is left alone.
+    '''
+    kind = _compose_kind(compose_file)
+    command = ["docker", "compose", "-f", os.path.join(project_path, compose_file), action]
+    wait_for_health = action == "up" and compose_file == DOCKER_COMPOSE_DEPENDENCIES_FILE
+    if action == "up":
+        command.append("-d")
+        if services:
+            command.extend(["--force-recreate", "--no-deps"])
+        if wait_for_health:
+            # block until the dependency healthchecks pass rather than sleeping for a fixed time before starting the app
+            AcOutputManager.text("waiting for dependency containers to become healthy")
+            command.extend(["--wait", "--wait-timeout", str(dependency_timeout)])
+        command.extend(services or [])
+    started = monotonic()
+
+    with timed_phase(f"compose_{action}_{kind}"):
+        result = _run_command(command, project_path, verbose)
+
+    if result.returncode != 0:
+        if wait_for_health:
+            AcOutputManager.fail(f"failed to run {compose_file} - the dependency containers failed to start or did not become healthy within {dependency_timeout}s. Check the container logs.")
+        AcOutputManager.fail(f"failed to run {compose_file}.")
+    elif wait_for_health:
+        AcOutputManager.complete_step(f"dependency containers started and healthy ({monotonic() - started:.1f}s).")
+    else:
+        AcOutputManager.complete_step(f"{'dependency' if kind == 'dependencies' else 'project'} containers {'started' if action == 'up' else 'stopped'}.")
+
+def _restart_changed_services(project_path, compose_file, dependency_timeout, verbose=False):
+    '''
+    Recreate only the services of one compose file whose resolved configuration or image differs from their running container.
+    Unchanged application containers are restarted in place so they reload code and settings; unchanged dependencies are left running.
+    '''
+    from arches_containers.utils.restart_plan import plan_restart, AcRestartPlanError
+
+    kind = _compose_kind(compose_file)
+    try:
+        with timed_phase(f"plan_{kind}"):
+            plan = plan_restart(os.path.join(project_path, compose_file), project_path)
+    except AcRestartPlanError as e:
+        AcOutputManager.write(f"... ℹ️ could not compare the {kind} containers with their configuration ({e}); recreating all of them.")
+        with timed_phase(f"recreate_{kind}"):
+            result = _run_command(["docker", "compose", "-f", os.path.join(project_path, compose_file), "up", "-d", "--force-recreate"], project_path, verbose)
+        if result.returncode != 0:
+            AcOutputManager.fail(f"failed to run {compose_file}.")
+        return
+
+    for change in plan.changed:
+        AcOutputManager.write(f"... 🔁 {change.service}: {change.reason}")
+    if plan.changed:
+        _compose_file(project_path, compose_file, "up", dependency_timeout, verbose, services=plan.services_to_recreate)
+    if not plan.unchanged:
+        return
+    if kind == "dependencies":
+        AcOutputManager.complete_step(f"unchanged dependency containers left running: {', '.join(plan.unchanged)}.")
+        return
+    with timed_phase("restart_app"):
+        result = _run_command(["docker", "compose", "-f", os.path.join(project_path, compose_file), "restart", *plan.unchanged], project_path, verbose)
+    if result.returncode != 0:
+        AcOutputManager.fail(f"failed to restart the containers in {compose_file}.")
+    AcOutputManager.complete_step(f"unchanged project containers restarted in place: {', '.join(plan.unchanged)}.")
+
+def _ensure_base_image(project_name, verbose=False, session=None):
+    '''
+    Build the shared base image of the project's Arches version if the project builds from it and it has not been built yet.
+    '''
+    from arches_containers.utils.base_image import AcBaseImageError, uses_base_image, base_image_exists, build_base_image, get_base_image
+
+    ac_workspace = session.workspace if session else AcWorkspace()
+    project = ac_workspace.get_project(project_name)
+    if not uses_base_image(project.get_project_path()):
+        return
+    version = project[AcProjectSettings.PROJECT_ARCHES_VERSION.value]
+    if base_image_exists(version):
+        return
+    AcOutputManager.text(f"building the shared Arches {version} base image (once per version)")
+    try:
+        build_base_image(version, verbose=verbose)
+    except AcBaseImageError as e:
+        AcOutputManager.fail(f"failed to build the base image {get_base_image(version)}: {e}")
+    AcOutputManager.complete_step(f"base image {get_base_image(version)} built.")
+
+def _await_project_service(project_name, session=None):
+    AcOutputManager.text("awaiting project service availability")
+    AcOutputManager.write("... ℹ️ depending on your application configuration this may take a while.")
+    AcOutputManager.write("...    check container logs for detailed information.")
+    with timed_phase("service_ready"):
+        wait_for_project_service(project_name, session)
+
+def _compose_context(project_name, session=None):
+    ac_workspace = session.workspace if session else AcWorkspace()
+    project_path = ac_workspace.get_project(project_name).get_project_path()
+    return project_path, ac_workspace.get_settings().settings["dependency_timeout"]
+
+def _check_compose_files(project_path, compose_files):
     for compose_file in compose_files:
-        compose_file_path = os.path.join(project_path, compose_file)
-        if not os.path.exists(compose_file_path):
+        if not os.path.exists(os.path.join(project_path, compose_file)):
             AcOutputManager.failed_step(f"{compose_file} not found in {project_path}.")
-    
+
+def compose_project(project_name, action="up", build=False, verbose=False, container_type="both", session=None):
+    '''
+    Compose the project using docker-compose.yml and docker-compose-dependencies.yml files, one file after the other.
+    container_type can be 'both', 'app', or 'dep' to control which containers are affected.
+    '''
+    AcOutputManager.text(f"{'starting' if action == 'up' else 'stopping'} {CONTAINER_DESCRIPTIONS[container_type]} containers")
+    project_path, dependency_timeout = _compose_context(project_name, session)
+    compose_files = _compose_files(container_type, action)
+    _check_compose_files(project_path, compose_files)
+
     for compose_file in compose_files:
-        if compose_file == DOCKER_COMPOSE_FILE and action == "up":
-            subprocess.run(["sleep", "15"])
-
-        compose_file_path = os.path.join(project_path, compose_file)
-        command = ["docker", "compose", "-f", compose_file_path, action]
-        if action == "up":
-            command.append("-d")
-            if build:
-                command.append("--build")
-        
-        os.chdir(project_path)
-        if verbose:
-            result = subprocess.run(command)
-        else:
-            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        if result.returncode != 0:
-            AcOutputManager.fail(f"failed to run {compose_file}.")
-        else:
-            AcOutputManager.complete_step(f"{'dependency' if compose_file == DOCKER_COMPOSE_DEPENDENCIES_FILE else 'project'} containers {'started' if action == 'up' else 'stopped'}.")
+        if action == "up" and build:
+            _compose_build(project_path, compose_file, verbose)
+        _compose_file(project_path, compose_file, action, dependency_timeout, verbose)
 
-    AcOutputManager.complete_step(f"{container_desc[container_type]} containers for project {project_name} {'started' if action == 'up' else 'stopped'}.")
+    AcOutputManager.complete_step(f"{CONTAINER_DESCRIPTIONS[container_type]} containers for project {project_name} {'started' if action == 'up' else 'stopped'}.")
     if action == "up" and container_type in ["both", "app"]:
-        AcOutputManager.text("awaiting project service availability")
-        AcOutputManager.write("... ℹ️ depending on your application configuration this may take a while.")
-        AcOutputManager.write("...    check container logs for detailed information.")
-        while True:
-            sleep(5)
-            if test_project_service_available_with_status_200(project_name):
-                AcOutputManager.complete_step("awaiting project service availability")
-                AcOutputManager.complete_step("project service available.")
-                break
+        _await_project_service(project_name, session)
+
+def build_up_pipeline(project_name, build=False, verbose=False, container_type="both", session=None, restart=False, full=False):
+    '''
+    Builds the task graph for 'up' or 'restart'.
+
+    The dependency containers do not mount the arches repo, so they are pulled and started while the repo is synced.
+    The application images are built while the dependencies come up and wait for their healthchecks.
+    The application containers start once the repo is synced, the images are built and the dependencies are healthy.
+
+    A restart only recreates the services whose configuration or image changed. A full restart brings every container down first, building the images while they stop.
+    '''
+    project_path, dependency_timeout = _compose_context(project_name, session)
+    compose_files = _compose_files(container_type)
+    _check_compose_files(project_path, compose_files)
+    pipeline = AcPipeline(f"{project_name} {'restart' if restart else 'up'}")
+    changed_only = restart and not full
+    step = "restart" if changed_only else "up"
+
+    def start(compose_file):
+        if changed_only:
+            return lambda: _restart_changed_services(project_path, compose_file, dependency_timeout, verbose)
+        return lambda: _compose_file(project_path, compose_file, "up", dependency_timeout, verbose)
+
+    pipeline.add("repo_sync", lambda: arches_repo_helper.change_arches_branch(project_name, verbose, session=session))
+    app_after = ["repo_sync"]
+    dependencies_after = []
+    if restart and full:
+        previous = []
+        for compose_file in _compose_files(container_type, "down"):
+            name = f"{_compose_kind(compose_file)}_down"
+            pipeline.add(name, lambda compose_file=compose_file: _compose_file(project_path, compose_file, "down", dependency_timeout, verbose), depends_on=previous)
+            previous = [name]
+        # everything is down before anything starts again
+        app_after.extend(previous)
+        dependencies_after.extend(previous)
+
+    if DOCKER_COMPOSE_DEPENDENCIES_FILE in compose_files:
+        if build:
+            pipeline.add("build_dependencies", lambda: _compose_build(project_path, DOCKER_COMPOSE_DEPENDENCIES_FILE, verbose))
+            dependencies_after.append("build_dependencies")
+        pipeline.add(f"dependencies_{step}", start(DOCKER_COMPOSE_DEPENDENCIES_FILE), depends_on=dependencies_after)
+        app_after.append(f"dependencies_{step}")
+
+    if DOCKER_COMPOSE_FILE in compose_files:
+        # the app image builds FROM the shared base image, which does not need the repo and is built alongside the sync if missing
+        pipeline.add("base_image", lambda: _ensure_base_image(project_name, verbose, session))
+        app_after.append("base_image")
+        if build:
+            # the image copies the arches repo, so it is built from the synced checkout
+            pipeline.add("build_app", lambda: _compose_build(project_path, DOCKER_COMPOSE_FILE, verbose), depends_on=["repo_sync", "base_image"])
+            app_after.append("build_app")
+        pipeline.add(f"app_{step}", start(DOCKER_COMPOSE_FILE), depends_on=app_after)
+        pipeline.add("service_ready", lambda: _await_project_service(project_name, session), depends_on=[f"app_{step}"])
+    return pipeline
+
+def write_server_env(project_name, mode="debug", session=None, debug=None):
+    '''
+    Writes the server mode, the gunicorn worker and thread counts, whether to start the debugger and the project's host ports to the .env file of the project,
+    which the compose files read. Empty counts let the container size them from its CPU count.
+    Unless debug is given, the debugger is started if the project's debugpy setting is on.
+    '''
+    from arches_containers.utils.ports import get_project_ports
+
+    ac_workspace = session.workspace if session else AcWorkspace()
+    project = ac_workspace.get_project(project_name)
+    project_path = project.get_project_path()
+    if debug is None:
+        debug = bool(project.get(AcProjectSettings.PROJECT_DEBUGPY.value, False))
+    port_offset = project.get(AcProjectSettings.PROJECT_PORT_OFFSET.value)
+    required = {
+        DOCKER_COMPOSE_FILE: [variable for variable, needed in (("ARCHES_SERVER_MODE", mode != "debug"), ("ARCHES_DEBUGPY", debug), ("AC_APP_PORT", port_offset)) if needed],
+        DOCKER_COMPOSE_DEPENDENCIES_FILE: ["AC_DB_PORT"] if port_offset else [],
+    }
+    for compose_file, variables in required.items():
+        if not variables or not os.path.exists(os.path.join(project_path, compose_file)):
+            continue
+        # compose files rendered before these variables existed silently ignore them
+        with open(os.path.join(project_path, compose_file), "r") as f:
+            compose = f.read()
+        missing = [variable for variable in variables if variable not in compose]
+        if missing:
+            AcOutputManager.fail(f"the {compose_file} of project {project_name} does not read {', '.join(missing)}. Run 'act upgrade -p {project_name}' first.")
+    workers = project.get(AcProjectSettings.PROJECT_SERVER_WORKERS.value)
+    threads = project.get(AcProjectSettings.PROJECT_SERVER_THREADS.value)
+    lines = [f"ARCHES_SERVER_MODE={mode}", f"GUNICORN_WORKERS={workers or ''}", f"GUNICORN_THREADS={threads or ''}", f"ARCHES_DEBUGPY={debug}"]
+    lines.extend(f"{variable}={port}" for variable, port in get_project_ports(port_offset).items())
+    atomic_write_text(os.path.join(project_path, SERVER_ENV_FILE), "\n".join(lines) + "\n")
+
+def up_project(project_name, build=False, verbose=False, container_type="both", session=None, restart=False, full=False, mode="debug", debug=None):
+    '''
+    Sync the arches repo and bring the project up, or restart it, running independent steps concurrently.
+    A restart recreates only the changed services unless full is set, in which case everything is brought down first.
+    The mode selects the application server: the Django development server, or gunicorn ("perf").
+    debug starts the development server under the debugpy listener; None leaves it to the project's debugpy setting.
+    '''
+    AcOutputManager.text(f"{'restarting' if restart else 'starting'} {CONTAINER_DESCRIPTIONS[container_type]} containers")
+    # a changed mode or port changes the resolved service configuration, so a restart recreates the affected containers
+    write_server_env(project_name, mode, session, debug)
+    pipeline = build_up_pipeline(project_name, build, verbose, container_type, session, restart, full)
+    pipeline.run()
+    AcOutputManager.complete_step(f"{CONTAINER_DESCRIPTIONS[container_type]} containers for project {project_name} started.")
+    pipeline.report()
+    return pipeline
+
+def _ensure_buildx_builder(project_path, verbose=False):
+    if subprocess.run(["docker", "buildx", "inspect", BUILDX_BUILDER], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+        return
+    AcOutputManager.text(f"creating the '{BUILDX_BUILDER}' buildx builder")
+    result = _run_command(["docker", "buildx", "create", "--name", BUILDX_BUILDER, "--driver", "docker-container"], project_path, verbose)
+    if result.returncode != 0:
+        AcOutputManager.fail(f"failed to create the '{BUILDX_BUILDER}' buildx builder. Check that docker buildx is installed.")
 
+def build_project(project_name, cache_from=None, cache_to=None, verbose=False, session=None, stage=None):
+    '''
+    Sync the arches repo and build the project image. With a stage (e.g. "runtime" for the slim deployable image) that stage of the Dockerfile is built instead and tagged he/<project>:<stage>.
+    With cache_from or cache_to the image is built with 'docker buildx bake', importing and exporting the BuildKit cache (including the pip, npm and apt cache mounts) as a local directory.
+    '''
+    from arches_containers.utils.base_image import AcBaseImageError, uses_base_image, prepare_base_context, get_base_image
+
+    project_path, _ = _compose_context(project_name, session)
+    _check_compose_files(project_path, [DOCKER_COMPOSE_FILE])
+    with timed_phase("repo_sync"):
+        arches_repo_helper.change_arches_branch(project_name, verbose, session=session)
+    caching = bool(cache_from or cache_to)
+    if not caching:
+        _ensure_base_image(project_name, verbose, session)
+        if not stage:
+            _compose_build(project_path, DOCKER_COMPOSE_FILE, verbose)
+            AcOutputManager.complete_step(f"images for project {project_name} built.")
+            return
+
+    project = (session.workspace if session else AcWorkspace()).get_project(project_name)
+    # the compose service, and so the bake target, is named after the url safe project name
+    service = project["project_name_url_safe"]
+    command = ["docker", "buildx", "bake"]
+    if caching:
+        _ensure_buildx_builder(project_path, verbose)
+        command.extend(["--builder", BUILDX_BUILDER])
+    command.extend(["--load", "-f", os.path.join(project_path, DOCKER_COMPOSE_FILE)])
+    if stage:
+        # 'docker compose build' cannot pick a stage, so other stages are built with bake. They get their own tag
+        # next to the he/<project>:dev_build image the compose file runs, so 'up' never runs them
+        command.extend(["--set", f"{service}.target={stage}", "--set", f"{service}.tags=he/{project_name}:{stage}"])
+    if cache_from:
+        if os.path.isdir(cache_from):
+            command.extend(["--set", f"{service}.cache-from=type=local,src={os.path.abspath(cache_from)}"])
+        else:
+            AcOutputManager.write(f"... ℹ️ no build cache found at {cache_from}; building without it.")
+    export_dir = None
+    if cache_to:
+        # exported to a new directory and swapped in afterwards, as exporting over the old cache would keep every stale layer
+        export_dir = f"{os.path.abspath(cache_to).rstrip(os.sep)}.new"
+        shutil.rmtree(export_dir, ignore_errors=True)
+        command.extend(["--set", f"{service}.cache-to=type=local,dest={export_dir},mode=max"])
+
+    with tempfile.TemporaryDirectory(prefix="ac-bake-") as bake_dir:
+        if caching and uses_base_image(project_path):
+            # the buildx builder cannot see images in the local docker store, so the base image is built in the same bake
+            # and substituted for the FROM image, which also puts its layers in the exported cache
+            version = project[AcProjectSettings.PROJECT_ARCHES_VERSION.value]
+            base_context = os.path.join(bake_dir, "base")
+            try:
+                base_dockerfile, _ = prepare_base_context(version, base_context, verbose=verbose)
+            except AcBaseImageError as e:
+                AcOutputManager.fail(f"failed to prepare the base image build: {e}")
+            bake_file = os.path.join(bake_dir, "docker-bake.json")
+            with open(bake_file, "w") as f:
+                json.dump({"target": {
+                    "base": {"context": base_context, "dockerfile": base_dockerfile},
+                    service: {"contexts": {get_base_image(version): "target:base"}},
+                }}, f)
+            # merged over the targets read from the compose file
+            command.extend(["-f", bake_file])
+        command.append(service)
 
-def initialize_project(project_name, verbose=False):
+        AcOutputManager.text(f"building the {stage} image" if stage else "building app images")
+        with timed_phase(f"build_{stage}" if stage else "build_app"):
+            result = _run_command(command, project_path, verbose)
+    if result.returncode != 0:
+        if export_dir:
+            shutil.rmtree(export_dir, ignore_errors=True)
+        AcOutputManager.fail(f"failed to build the images in {DOCKER_COMPOSE_FILE}.")
+    if export_dir:
+        shutil.rmtree(cache_to, ignore_errors=True)
+        os.replace(export_dir, cache_to)
+        AcOutputManager.complete_step(f"build cache exported to {cache_to}.")
+    if stage:
+        AcOutputManager.complete_step(f"{stage} image he/{project_name}:{stage} built.")
+    else:
+        AcOutputManager.complete_step(f"images for project {project_name} built.")
+
+def _pull_dependency_images(project_path, verbose=False):
+    # best effort: anything not pulled now is pulled by the first 'up'
+    with timed_phase("pull_dependencies"):
+        result = _run_command(["docker", "compose", "-f", os.path.join(project_path, DOCKER_COMPOSE_DEPENDENCIES_FILE), "pull", "--quiet"], project_path, verbose)
+    if result.returncode != 0:
+        AcOutputManager.skipped_step("could not pull the dependency images now; they will be pulled on the first 'up'.")
+    else:
+        AcOutputManager.complete_step("dependency images pulled.")
+
+def init_project(project_name, verbose=False, session=None):
+    '''
+    Clone and check out the arches repo and initialise the project. The dependency images are pulled and the shared base image is built (if missing) at the same time.
+    '''
+    project_path, _ = _compose_context(project_name, session)
+    pipeline = AcPipeline(f"{project_name} init")
+    pipeline.add("repo_sync", lambda: arches_repo_helper.clone_and_checkout_repo(project_name, verbose, session=session))
+    if os.path.exists(os.path.join(project_path, DOCKER_COMPOSE_DEPENDENCIES_FILE)):
+        pipeline.add("pull_dependencies", lambda: _pull_dependency_images(project_path, verbose))
+    pipeline.add("base_image", lambda: _ensure_base_image(project_name, verbose, session))
+    pipeline.add("init_project", lambda: initialize_project(project_name, verbose, session=session), depends_on=["repo_sync", "base_image"])
+    pipeline.run()
+    pipeline.report()
+    return pipeline
+
+
+def initialize_project(project_name, verbose=False, session=None):
     '''
     Initialize the project using the docker-compose-init.yml file.
     '''
-    ac_workspace = AcWorkspace()
+    ac_workspace = session.workspace if session else AcWorkspace()
     if os.path.exists(os.path.join(ac_workspace.path, project_name)):
         AcOutputManager.complete_step(f"project {project_name} already initialized.")
 
@@ -105,29 +452,24 @@ def initialize_project(project_name, verbose=False):
     if not os.path.exists(compose_file_path):
         AcOutputManager.fail(f"{DOCKER_COMPOSE_INIT_FILE} not found in {project_path}.")
 
-    os.chdir(project_path)
+    # the init compose file publishes the project's host ports too
+    write_server_env(project_name, session=session)
     command = ["docker", "compose", "-f", compose_file_path, "up", "--exit-code-from", config["project_name_url_safe"]]
-    if verbose:
-        result = subprocess.run(command)
-        if result.returncode == 0:
-            result = subprocess.run(["docker", "compose", "-f", compose_file_path, "down"])
-        else:
-            AcOutputManager.fail("failed to build the development image during initialisation.")
+    with timed_phase("init_compose"):
+        result = _run_command(command, project_path, verbose)
+    if result.returncode == 0:
+        with timed_phase("init_down"):
+            result = _run_command(["docker", "compose", "-f", compose_file_path, "down"], project_path, verbose)
     else:
-        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        if result.returncode == 0:
-            result = subprocess.run(["docker", "compose", "-f", compose_file_path, "down"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:
-            AcOutputManager.fail("failed to build the development image during initialisation.")
+        AcOutputManager.fail("failed to build the development image during initialisation.")
 
     # now that the docker compose process has created the project directory, we can run the pre-commit install in the directory. make sure the virtualenv is activated.
-    os.chdir(project_path)
-    
     # Check if the directory is a git repository before attempting to install pre-commit
-    git_check = subprocess.run(["git", "rev-parse", "--is-inside-work-tree"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    git_check = subprocess.run(["git", "rev-parse", "--is-inside-work-tree"], cwd=project_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     if git_check.returncode == 0:
         # Directory is a git repository, install pre-commit
-        result = subprocess.run([sys.executable, "-m", "pre_commit", "install"])
+        with timed_phase("pre_commit_install"):
+            result = subprocess.run([sys.executable, "-m", "pre_commit", "install"], cwd=project_path)
         if result.returncode != 0:
             AcOutputManager.fail("failed to run pre-commit install.")
         else:
@@ -137,29 +479,52 @@ def initialize_project(project_name, verbose=False):
 
     AcOutputManager.complete_step("initialization complete.")
 
-def status():
-        ac_settings = AcWorkspace().get_settings()
-        active_project = ac_settings.get_active_project()
-        if not active_project:
-            AcOutputManager.fail("No active project set. Run 'arches-containers activate' to set an active project.")
+def status(session=None, project_name=None):
+        '''
+        Show the container status of a project, or of the active project if no project name is given.
+        '''
+        ac_workspace = session.workspace if session else AcWorkspace()
+        if project_name:
+            project = ac_workspace.get_project(project_name)
+        else:
+            project = ac_workspace.get_settings().get_active_project()
+            if not project:
+                AcOutputManager.fail("No active project set. Run 'arches-containers activate' to set an active project.")
         
-        project_name = active_project.project_name
-        project_name_urlsafe = active_project["project_name_url_safe"]
+        project_name = project.project_name
+        project_name_urlsafe = project["project_name_url_safe"]
         get_running_containers(project_name, project_name_urlsafe)
 
+def watch(session=None, project_names=None):
+        '''
+        Watch the containers of one or more projects (or the active project), updating as Docker events arrive until interrupted.
+        '''
+        from arches_containers.utils.watch import watch_status
+        from arches_containers.utils.docker_api import AcDockerApiError
+
+        ac_workspace = session.workspace if session else AcWorkspace()
+        if not project_names:
+            project = ac_workspace.get_settings().get_active_project()
+            if not project:
+                AcOutputManager.fail("No active project set. Run 'arches-containers activate' to set an active project.")
+            project_names = [project.project_name]
+
+        projects = {project_name: ac_workspace.get_project(project_name)["project_name_url_safe"] for project_name in project_names}
+        try:
+            watch_status(projects)
+        except AcDockerApiError as e:
+            AcOutputManager.fail(f"Watching status needs the Docker Engine API: {e}")
+
 def main(project_name=None, action="up", build=False, verbose=False):
-    ac_workspace = AcWorkspace()
+    session = AcSession()
     if project_name is None:
-        project_name = ac_workspace.get_active_project_name()
-
-    ac_project = ac_workspace.get_project(project_name)
-    organization = ac_project["arches_repo_organization"]
+        project_name = session.settings.get_active_project_name()
 
     if action == "init":
         # install arches if not already installed
-        arches_repo_helper.clone_and_checkout_repo(project_name, organization, verbose)
-        initialize_project(project_name, verbose)
-        pass
+        init_project(project_name, verbose, session=session)
+    elif action == "up":
+        up_project(project_name, build, verbose, session=session)
     else:
-        arches_repo_helper.change_arches_branch(project_name)
-        compose_project(project_name, action, build, verbose)
\ No newline at end of file
+        arches_repo_helper.change_arches_branch(project_name, session=session)
+        compose_project(project_name, action, build, verbose, session=session)
\ No newline at end of file
@@ -13,32 +13,51 @@ fi
 # SET DEFAULT WORKING DIRECTORY
 cd ${APP_FOLDER}
 
-YARN_MODULES_FOLDER=${PACKAGE_JSON_FOLDER}/$(awk \
-	-F '--install.modules-folder' '{print $2}' ${PACKAGE_JSON_FOLDER}/.yarnrc \
-	| awk '{print $1}' \
-	| tr -d $'\r' \
-	| tr -d '"' \
-	| sed -e "s/^\.\///g")
-
-#Utility functions that check db status
-wait_for_db() {
-	echo "Testing if database server is up..."
-	while [[ ! ${return_code} == 0 ]]
+#Utility functions that check dependency status
+# Seconds to wait for Postgres, Elasticsearch and RabbitMQ before giving up, overridable from env_file.env
+DEPENDENCY_TIMEOUT=${DEPENDENCY_TIMEOUT:-300}
+
+wait_for_dependency() {
+	# Runs a readiness check until it passes, backing off from 1 to 10 seconds between attempts, and reports how long it took
+	local name=$1
+	shift
+	local started=${SECONDS}
+	local delay=1
+	until "$@" >&/dev/null
 	do
-        psql --host=${PGHOST} --port=${PGPORT} --user=${PGUSERNAME} --dbname=postgres -c "select 1" >&/dev/null
-		return_code=$?
-		sleep 3
+		if (( SECONDS - started + delay > DEPENDENCY_TIMEOUT )); then
+			echo "${name} is not ready after ${DEPENDENCY_TIMEOUT}s" >&2
+			return 1
+		fi
+		sleep ${delay}
+		delay=$(( delay * 2 > 10 ? 10 : delay * 2 ))
+	done
+	echo "${name} is up after $(( SECONDS - started ))s"
+}
+
+wait_for_dependencies() {
+	# The checks run in parallel, so start-up waits for the slowest dependency rather than for each in turn
+	if [[ -n ${DEPENDENCIES_READY} ]]; then
+		return 0
+	fi
+	echo "Testing if Postgres, Elasticsearch and RabbitMQ are up..."
+	local pids=()
+	wait_for_dependency "Postgres" env PGCONNECT_TIMEOUT=5 psql --host=${PGHOST} --port=${PGPORT} --user=${PGUSERNAME} --dbname=postgres -c "select 1" &
+	pids+=($!)
+	wait_for_dependency "Elasticsearch" curl -fs --max-time 10 "http://${ESHOST}:${ESPORT}/_cluster/health?wait_for_status=yellow&timeout=5s" &
+	pids+=($!)
+	wait_for_dependency "RabbitMQ" timeout 5 bash -c "</dev/tcp/${RABBITMQ_HOST}/${RABBITMQ_PORT:-5672}" &
+	pids+=($!)
+	local failed=0
+	for pid in ${pids[@]}
+	do
+		wait ${pid} || failed=1
 	done
-	echo "Database server is up"
-
-    echo "Testing if Elasticsearch is up..."
-    while [[ ! ${return_code} == 0 ]]
-    do
-        curl -s "http://${ESHOST}:${ESPORT}/_cluster/health?wait_for_status=green&timeout=60s" >&/dev/null
-        return_code=$?
-        sleep 3
-    done
-    echo "Elasticsearch is up"
+	if [[ ${failed} != 0 ]]; then
+		echo "Exiting..."
+		exit 1
+	fi
+	DEPENDENCIES_READY=True
 }
 
 db_exists() {
@@ -90,7 +109,7 @@ init_arches() {
 		echo "Custom Arches project '${ARCHES_PROJECT}' exists."
 	fi
 
-	wait_for_db
+	wait_for_dependencies
 	if db_exists; then
 		echo "Database ${PGDBNAME} already exists."
 		echo "Skipping Package Loading"
@@ -139,13 +158,45 @@ setup_couchdb() {
     curl -X PUT ${COUCHDB_URL}/_replicator
 }
 
+# Node packages
+node_modules_folder() {
+	# the modules folder a .yarnrc redirects yarn to, otherwise node_modules
+	local modules_folder=""
+	if [[ -f $1/.yarnrc ]]; then
+		modules_folder=$(awk \
+			-F '--install.modules-folder' '{print $2}' $1/.yarnrc \
+			| awk '{print $1}' \
+			| tr -d $'\r' \
+			| tr -d '"' \
+			| sed -e "s/^\.\///g")
+	fi
+	echo $1/${modules_folder:-node_modules}
+}
+
+install_node_packages() {
+	# Runs '<npm|yarn> install' in a folder unless its package.json and lockfile are unchanged since the last install.
+	# The app and webpack containers install into the same bind-mounted folders, so installs take a lock on the shared node cache volume.
+	local folder=$1
+	local manager=$2
+	local stamp=$(node_modules_folder ${folder})/.ac-install-hash
+	local lock_folder=${NODE_CACHE_DIR:-/tmp}/locks
+	mkdir -p ${lock_folder}
+	(
+		flock 9
+		cd ${folder}
+		local hash=$(cat package.json package-lock.json yarn.lock 2>/dev/null | sha256sum | cut -d ' ' -f 1)
+		if [[ -f ${stamp} ]] && [[ "$(cat ${stamp})" == "${hash}" ]]; then
+			echo "Node packages in ${folder} are up to date, skipping ${manager} install."
+		else
+			echo "Installing node packages in ${folder}..."
+			${manager} install && echo ${hash} > ${stamp}
+		fi
+	) 9>${lock_folder}/$(echo ${folder} | tr '/' '_').lock
+}
+
 # Yarn
 install_yarn_components() {
-	if [[ ! -d ${YARN_MODULES_FOLDER} ]] || [[ ! "$(ls ${YARN_MODULES_FOLDER})" ]]; then
-		echo "Yarn modules do not exist, installing..."
-		cd ${PACKAGE_JSON_FOLDER}
-		yarn install
-	fi
+	install_node_packages ${PACKAGE_JSON_FOLDER} yarn
 }
 
 #### Misc
@@ -196,12 +247,23 @@ run_load_package() {
 
 # "exec" means that it will finish building???
 run_django_server() {
+	if [[ "${ARCHES_SERVER_MODE}" == "perf" ]]; then
+		# 'act up --mode perf': a multi-process server with whitenoise serving the collected static files, and no debugger
+		export STATIC_ROOT=${STATIC_ROOT:-${WEB_ROOT}/static_root}
+		run_collectstatic
+		run_gunicorn_server
+	fi
 	echo ""
 	echo "----- *** RUNNING DJANGO DEVELOPMENT SERVER *** -----"
 	echo ""
 	cd ${APP_FOLDER}
     echo "Running Django"
-	exec sh -c "pip install debugpy -t /tmp && python3 /tmp/debugpy --listen 0.0.0.0:5678 manage.py runserver 0.0.0.0:${DJANGO_PORT}"
+	if [[ "${ARCHES_DEBUGPY}" == "True" ]]; then
+		# 'act up --debug': debugpy is installed in the image, so the listener starts without the network
+		echo "Debugger listening on port 5678"
+		exec python3 -m debugpy --listen 0.0.0.0:5678 manage.py runserver 0.0.0.0:${DJANGO_PORT}
+	fi
+	exec python3 manage.py runserver 0.0.0.0:${DJANGO_PORT}
 }
 
 run_livereload_server() {
@@ -229,6 +291,26 @@ run_livereload() {
 	run_livereload_server
 }
 
+run_gunicorn_server() {
+	echo ""
+	echo "----- *** RUNNING GUNICORN *** -----"
+	echo ""
+	cd ${APP_FOLDER}
+	# workers default to the number of CPUs available to the container
+	workers=${GUNICORN_WORKERS:-$(nproc)}
+	threads=${GUNICORN_THREADS:-2}
+	echo "Running gunicorn with ${workers} workers of ${threads} threads"
+	exec gunicorn ${ARCHES_PROJECT}.wsgi:application --bind 0.0.0.0:${DJANGO_PORT} --workers ${workers} --threads ${threads} --access-logfile -
+}
+
+run_collectstatic() {
+	echo ""
+	echo "----- COLLECTING STATIC FILES -----"
+	echo ""
+	cd ${APP_FOLDER}
+	python3 manage.py collectstatic --noinput
+}
+
 ### Starting point ###
 
 # trying not to use virtualenv???
@@ -244,7 +326,7 @@ if [[ $#  -eq 0 ]]; then
 	echo "No arguments supplied, running Arches server..."
 	copy_settings_local
 	start_celery_supervisor
-	wait_for_db
+	wait_for_dependencies
 	run_arches
 fi
 
@@ -258,21 +340,26 @@ do
 	case ${key} in
 		run_arches)
 			copy_settings_local
-			wait_for_db
+			wait_for_dependencies
 			start_celery_supervisor
 			run_arches
 		;;
 		run_livereload)
 			run_livereload_server
 		;;
+		run_gunicorn)
+			copy_settings_local
+			wait_for_dependencies
+			run_gunicorn_server
+		;;
 		run_tests)
 			copy_settings_local
-			wait_for_db
+			wait_for_dependencies
 			run_tests
 		;;
 		run_migrations)
 			copy_settings_local
-			wait_for_db
+			wait_for_dependencies
 			run_migrations
 		;;
 		create_project)
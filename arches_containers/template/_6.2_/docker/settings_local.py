@@ -67,4 +67,19 @@ if USER_SECRET_KEY:
     SECRET_KEY = USER_SECRET_KEY
 
 #STATIC_ROOT = "/static_root"
+USER_STATIC_ROOT = get_optional_env_variable("STATIC_ROOT")
+if USER_STATIC_ROOT:
+    STATIC_ROOT = USER_STATIC_ROOT
+
+# set by 'act up --mode perf' and in the runtime image, where the project is served by gunicorn
+if get_optional_env_variable("ARCHES_SERVER_MODE") == "perf":
+    DEBUG = False
+    # the project's settings.py imports this module at its end, so its MIDDLEWARE is read from the partially imported module
+    _project_settings = sys.modules.get("{{project}}.settings")
+    _middleware = getattr(_project_settings, "MIDDLEWARE", None) or globals().get("MIDDLEWARE")
+    if _middleware and "whitenoise.middleware.WhiteNoiseMiddleware" not in _middleware:
+        # whitenoise goes straight after the security middleware, as its documentation asks
+        MIDDLEWARE = list(_middleware)
+        security = "django.middleware.security.SecurityMiddleware"
+        MIDDLEWARE.insert(MIDDLEWARE.index(security) + 1 if security in MIDDLEWARE else 0, "whitenoise.middleware.WhiteNoiseMiddleware")
 ARCHES_NAMESPACE_FOR_DATA_EXPORT = f"http://{get_env_variable('ARCHES_PROJECT')}:{get_env_variable('DJANGO_PORT')}"
\ No newline at end of file
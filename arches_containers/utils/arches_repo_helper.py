@@ -1,42 +1,139 @@
 import os
+import threading
 import subprocess
 from arches_containers.utils.workspace import AcWorkspace, AcProjectSettings
 from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.timing import timed_phase
+from arches_containers.utils.repo_mirror import AcMirrorError, get_mirror_path, update_mirror, clone_from_mirror
 
-def _get_repo_info(project_name):
-    ac_workspace = AcWorkspace()
+# checkouts and worktrees of the shared arches clone are changed one at a time, even when several projects run concurrently
+_checkout_lock = threading.Lock()
+
+WORKTREE_SUFFIX = "-arches"
+
+def _get_repo_info(project_name, session=None):
+    ac_workspace = session.workspace if session else AcWorkspace()
     ac_project = ac_workspace.get_project(project_name)
     branch = ac_project[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value]
     repo_url = f"https://github.com/{ac_project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value]}/arches.git"
     clone_dir = os.path.join(ac_workspace.path, "arches")
     return (ac_project, repo_url, clone_dir, branch)
 
-def clone_and_checkout_repo(project_name, verbose=False):
-    ac_project, repo_url, clone_dir, branch = _get_repo_info(project_name)
+def get_worktree_dir(workspace_path, project_name):
+    return os.path.join(workspace_path, f"{project_name}{WORKTREE_SUFFIX}")
+
+def uses_worktree(ac_project):
+    # projects created before worktrees were introduced have no setting and keep using the shared clone
+    return bool(ac_project.get(AcProjectSettings.PROJECT_ARCHES_REPO_WORKTREE.value, False))
+
+def get_arches_dir(project_name, session=None):
+    '''
+    Returns the arches checkout mounted into the project's containers: the project's own worktree, or the shared clone for older projects.
+    '''
+    ac_project, repo_url, clone_dir, branch = _get_repo_info(project_name, session)
+    if uses_worktree(ac_project):
+        return get_worktree_dir(os.path.dirname(clone_dir), project_name)
+    return clone_dir
+
+def _git_output(args, cwd):
+    result = subprocess.run(["git", *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def _resolve_branch(repo_dir, branch):
+    '''
+    Returns the ref for a branch, preferring the local branch over the origin branch, or None if neither exists.
+    '''
+    for ref in (f"refs/heads/{branch}", f"refs/remotes/origin/{branch}"):
+        if _git_output(["rev-parse", "--verify", "-q", f"{ref}^{{commit}}"], repo_dir):
+            return ref
+    return None
+
+def has_checkout(repo_dir):
+    '''
+    Returns True if the tree has been checked out. A --no-checkout clone has HEAD on the remote default branch but no index and no files until its first checkout.
+    '''
+    return bool(_git_output(["rev-parse", "--verify", "-q", "HEAD"], repo_dir)) and bool(_git_output(["ls-files"], repo_dir))
+
+def is_on_branch(repo_dir, branch):
+    '''
+    Returns True if HEAD is the branch, or is detached at the commit the branch points to.
+    '''
+    head_branch = _git_output(["symbolic-ref", "--short", "-q", "HEAD"], repo_dir)
+    if head_branch is not None:
+        return head_branch == branch
+    ref = _resolve_branch(repo_dir, branch)
+    return ref is not None and _git_output(["rev-parse", f"{ref}^{{commit}}"], repo_dir) == _git_output(["rev-parse", "HEAD"], repo_dir)
+
+def _checked_out_elsewhere(repo_dir, branch):
+    # a branch can only be checked out in one worktree, including the shared clone itself
+    worktrees = _git_output(["worktree", "list", "--porcelain"], repo_dir) or ""
+    own_dir = os.path.realpath(repo_dir)
+    current = None
+    for line in worktrees.splitlines():
+        if line.startswith("worktree "):
+            current = os.path.realpath(line[len("worktree "):])
+        elif line == f"branch refs/heads/{branch}" and current != own_dir:
+            return True
+    return False
+
+def clone_and_checkout_repo(project_name, verbose=False, session=None):
+    ac_project, repo_url, clone_dir, branch = _get_repo_info(project_name, session)
     
     if not os.path.exists(clone_dir):
-        results = subprocess.run(
-            ["git", "clone", repo_url, clone_dir],
-            stdout=subprocess.PIPE if not verbose else None,
-            stderr=subprocess.PIPE if not verbose else None
-        )
-        if results.returncode != 0:
-            AcOutputManager.fail(f"failed to clone arches repo from {repo_url}")
-
-    change_arches_branch(project_name, verbose)
-
-def change_arches_branch(project_name, verbose=False):
-    ac_project, repo_url, clone_dir, branch = _get_repo_info(project_name)
-    os.chdir(clone_dir)
-    result = subprocess.run(
-        ["git", "checkout", branch],
-        stdout=subprocess.PIPE if not verbose else None,
-        stderr=subprocess.PIPE if not verbose else None
-    )
+        ac_settings = session.settings if session else AcWorkspace().get_settings()
+        if ac_settings.settings["arches_repo_mirror"]:
+            organization = ac_project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value]
+            mirror_dir = get_mirror_path(organization)
+            try:
+                created = update_mirror(repo_url, mirror_dir, verbose)
+                AcOutputManager.complete_step(f"{'Created' if created else 'Updated'} the {organization}/arches mirror at {mirror_dir}")
+                clone_from_mirror(repo_url, mirror_dir, clone_dir, verbose)
+            except AcMirrorError as e:
+                AcOutputManager.fail(f"failed to clone arches repo from {repo_url} via the mirror at {mirror_dir}: {e}")
+        else:
+            # without the mirror, a blob-less partial clone keeps the history but only downloads file contents when they are checked out
+            with timed_phase("git_clone"):
+                results = subprocess.run(
+                    ["git", "clone", "--filter=blob:none", "--no-checkout", repo_url, clone_dir],
+                    stdout=subprocess.PIPE if not verbose else None,
+                    stderr=subprocess.PIPE if not verbose else None
+                )
+            if results.returncode != 0:
+                AcOutputManager.fail(f"failed to clone arches repo from {repo_url}")
+
+    change_arches_branch(project_name, verbose, session)
+
+def change_arches_branch(project_name, verbose=False, session=None):
+    '''
+    Puts the project's arches checkout on the configured branch, doing nothing if it is already there.
+
+    Projects using worktrees get their own worktree of the shared clone at <workspace>/<project>-arches, created on first use.
+    When the branch is already checked out in another worktree, the project's worktree is detached at the same commit instead.
+    '''
+    ac_project, repo_url, clone_dir, branch = _get_repo_info(project_name, session)
+    repo_dir = get_worktree_dir(os.path.dirname(clone_dir), project_name) if uses_worktree(ac_project) else clone_dir
+    output = subprocess.PIPE if not verbose else None
+    with _checkout_lock, timed_phase("git_checkout"):
+        if os.path.exists(repo_dir) and is_on_branch(repo_dir, branch) and has_checkout(repo_dir):
+            AcOutputManager.complete_step(f"Arches repo already on {branch}")
+            return
+
+        if not os.path.exists(repo_dir):
+            # forget worktrees whose directories were deleted so the path can be reused
+            subprocess.run(["git", "worktree", "prune"], cwd=clone_dir, stdout=output, stderr=output)
+            if _checked_out_elsewhere(clone_dir, branch):
+                command = ["git", "worktree", "add", "--detach", repo_dir, _resolve_branch(clone_dir, branch) or branch]
+            else:
+                command = ["git", "worktree", "add", repo_dir, branch]
+            result = subprocess.run(command, cwd=clone_dir, stdout=output, stderr=output)
+        elif repo_dir != clone_dir and _checked_out_elsewhere(repo_dir, branch):
+            result = subprocess.run(["git", "checkout", "--detach", _resolve_branch(repo_dir, branch) or branch], cwd=repo_dir, stdout=output, stderr=output)
+        else:
+            result = subprocess.run(["git", "checkout", branch], cwd=repo_dir, stdout=output, stderr=output)
     if result.returncode != 0:
         AcOutputManager.fail(f"Failed to checkout arches branch {branch}")
     
     if verbose:
         AcOutputManager.write(f"Changed arches repo branch to {branch}")
 
-    AcOutputManager.complete_step(f"Arches repo configured")
\ No newline at end of file
+    AcOutputManager.complete_step(f"Arches repo configured")
@@ -0,0 +1,142 @@
+import os
+import json
+import tempfile
+import subprocess
+from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.templates import get_template, get_template_folder
+from arches_containers.utils.repo_mirror import AcMirrorError, get_mirror_path, update_mirror
+from arches_containers.utils.timing import timed_phase
+
+BASE_IMAGE_REPOSITORY = "arches-containers/base"
+BASE_IMAGE_LABEL = "org.archescontainers.base.version"
+BASE_SOURCE_LABEL = "org.archescontainers.base.source"
+BASE_DOCKERFILE = "Dockerfile.base"
+DEFAULT_ORGANIZATION = "archesproject"
+# the dependency metadata the base Dockerfiles install from; each version's Dockerfile.base copies the files its Arches release has
+DEPENDENCY_MANIFESTS = ("pyproject.toml", "arches/install/requirements.txt", "arches/install/requirements_dev.txt")
+
+
+class AcBaseImageError(Exception):
+    '''
+    Raised when a base image cannot be built, listed or removed.
+    '''
+
+
+def get_base_image(version):
+    return f"{BASE_IMAGE_REPOSITORY}:{version}"
+
+
+def uses_base_image(project_path):
+    '''
+    Returns whether a project's Dockerfile builds from the shared base image. Projects created before base images existed build from scratch until upgraded.
+    '''
+    try:
+        with open(os.path.join(project_path, "Dockerfile"), "r") as f:
+            return "${BASE_IMAGE}" in f.read()
+    except OSError:
+        return False
+
+
+def base_image_exists(version):
+    return subprocess.run(["docker", "image", "inspect", get_base_image(version)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+def prepare_base_context(version, context_dir, organization=DEFAULT_ORGANIZATION, branch=None, verbose=False):
+    '''
+    Fills context_dir with the dependency manifests of the Arches branch the base image is built from, read from the shared repo mirror without a checkout.
+    Returns the path of the version's base Dockerfile and the organization/branch the manifests came from.
+    '''
+    template = get_template(version)
+    if template is None:
+        raise AcBaseImageError(f"Arches version {version} not supported.")
+    branch = branch or template["default_branch"]
+    mirror_dir = get_mirror_path(organization)
+    try:
+        update_mirror(f"https://github.com/{organization}/arches.git", mirror_dir, verbose)
+    except AcMirrorError as e:
+        raise AcBaseImageError(str(e)) from e
+
+    exported = []
+    for path in DEPENDENCY_MANIFESTS:
+        result = subprocess.run(["git", "show", f"{branch}:{path}"], cwd=mirror_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            continue
+        target = os.path.join(context_dir, *path.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(result.stdout)
+        exported.append(path)
+    if not exported:
+        raise AcBaseImageError(f"No dependency manifests found on {organization}/{branch}.")
+    return os.path.join(get_template_folder(version), BASE_DOCKERFILE), f"{organization}/{branch}"
+
+
+def build_base_image(version, organization=DEFAULT_ORGANIZATION, branch=None, verbose=False):
+    '''
+    Builds (or rebuilds) the base image of an Arches version, tagged arches-containers/base:<version>.
+    '''
+    with tempfile.TemporaryDirectory(prefix="ac-base-") as context_dir:
+        dockerfile, source = prepare_base_context(version, context_dir, organization, branch, verbose)
+        command = ["docker", "build", "-f", dockerfile, "--label", f"{BASE_SOURCE_LABEL}={source}", "-t", get_base_image(version), context_dir]
+        with timed_phase("build_base"):
+            result = subprocess.run(command, stdout=None if verbose else subprocess.DEVNULL, stderr=None if verbose else subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        detail = (result.stderr or "").strip().splitlines()[-1:] if not verbose else []
+        raise AcBaseImageError(f"docker build of {get_base_image(version)} failed{': ' + detail[0] if detail else ''}")
+    return get_base_image(version)
+
+
+def list_base_images():
+    '''
+    Returns the tagged base images as dicts with the version, image ID, creation time and size reported by 'docker image ls'.
+    '''
+    result = subprocess.run(["docker", "image", "ls", BASE_IMAGE_REPOSITORY, "--format", "{{json .}}"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise AcBaseImageError(result.stderr.strip() or "docker image ls failed")
+    images = [json.loads(line) for line in result.stdout.splitlines() if line.strip()]
+    return sorted(
+        ({"version": image["Tag"], "id": image["ID"], "created": image.get("CreatedSince", ""), "size": image.get("Size", "")} for image in images if image.get("Tag") != "<none>"),
+        key=lambda image: tuple(int(part) for part in image["version"].split(".") if part.isdigit()),
+    )
+
+
+def write_base_images(project_versions):
+    '''
+    Writes a table of the base images and the workspace projects built from each.
+    '''
+    from prettytable import PrettyTable
+
+    images = list_base_images()
+    if not images:
+        AcOutputManager.complete_step("No base images built. Run 'act images build --version <version>' to build one.")
+        return
+    table = PrettyTable()
+    table.align = "l"
+    table.field_names = ["Version", "Image", "Image ID", "Created", "Size", "Projects"]
+    for image in images:
+        projects = sorted(project for project, version in project_versions.items() if version == image["version"])
+        table.add_row([image["version"], get_base_image(image["version"]), image["id"], image["created"], image["size"], ", ".join(projects) or "-"])
+    AcOutputManager.write(table)
+
+
+def prune_base_images(keep_versions, remove_all=False, verbose=False):
+    '''
+    Removes the base images of versions not in keep_versions (or every base image with remove_all),
+    then the dangling images left behind when a base or project image is rebuilt under the same tag.
+    Returns the removed and the failed image names.
+    '''
+    removed = []
+    failed = []
+    for image in list_base_images():
+        if not remove_all and image["version"] in keep_versions:
+            continue
+        name = get_base_image(image["version"])
+        result = subprocess.run(["docker", "image", "rm", name], stdout=None if verbose else subprocess.DEVNULL, stderr=None if verbose else subprocess.DEVNULL)
+        if result.returncode == 0:
+            removed.append(name)
+        else:
+            # still in use by a container, or tagged under another name
+            failed.append(name)
+    # project images inherit the base label, so this also catches superseded project builds
+    subprocess.run(["docker", "image", "prune", "--force", "--filter", f"label={BASE_IMAGE_LABEL}"], stdout=None if verbose else subprocess.DEVNULL, stderr=None if verbose else subprocess.DEVNULL)
+    return removed, failed
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+LOCK_SUFFIX = ".lock"
+LOCK_TIMEOUT = 10.0
+LOCK_RETRY_INITIAL_DELAY = 0.01
+LOCK_RETRY_MAX_DELAY = 0.2
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd):
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+# per-thread count of locks already held, so nested read-modify-write sequences on the same file do not deadlock
+_held_locks = threading.local()
+
+
+@contextmanager
+def config_lock(path, timeout=LOCK_TIMEOUT):
+    '''
+    Holds an advisory exclusive lock for a config file during a read-modify-write sequence.
+
+    The lock is taken on a sidecar <path>.lock file so that the config file itself can be atomically replaced while locked.
+    While another process holds the lock, acquisition is retried with exponential backoff until the timeout, when a TimeoutError is raised.
+    '''
+    lock_path = os.path.abspath(path) + LOCK_SUFFIX
+    held = getattr(_held_locks, "paths", None)
+    if held is None:
+        held = _held_locks.paths = {}
+    if lock_path in held:
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        delay = LOCK_RETRY_INITIAL_DELAY
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out after {timeout}s waiting for the lock on {path}")
+            time.sleep(delay)
+            delay = min(delay * 2, LOCK_RETRY_MAX_DELAY)
+
+        held[lock_path] = 0
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, content):
+    '''
+    Writes content to a temporary file in the same directory and renames it over the target, so readers only ever see the old or the new file.
+    '''
+    directory, filename = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{filename}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as temp_file:
+            temp_file.write(content)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        _replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write_json(path, data):
+    '''
+    Serialises data as indented JSON and writes it atomically. Serialisation happens before the file is touched, so a failure leaves the original intact.
+    '''
+    atomic_write_text(path, json.dumps(data, indent=4))
+
+
+def _replace(source, target, attempts=5):
+    # On Windows, os.replace fails while another process has the target open, so retry briefly
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(LOCK_RETRY_INITIAL_DELAY * (2 ** attempt))
@@ -1,28 +1,43 @@
 import os
 import json
-from arches_containers.utils.workspace import AcWorkspace
+from arches_containers.utils.workspace import AcWorkspace, AcProjectSettings
 from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.arches_repo_helper import uses_worktree, get_worktree_dir
+from arches_containers.utils.ports import PROJECT_PORTS, DEBUGPY_PORT, get_project_ports
 
 
-def launch_config():
+def launch_config(arches_dir_name=None, port=PROJECT_PORTS[DEBUGPY_PORT]):
+    path_mappings = [
+        {
+            "localRoot": "${workspaceFolder}",
+            "remoteRoot": "/web_root"
+        }
+    ]
+    if arches_dir_name:
+        # the project's own arches worktree is mounted at /web_root/arches; the more specific mapping has to come first
+        path_mappings.insert(0, {"localRoot": f"${{workspaceFolder}}/{arches_dir_name}", "remoteRoot": "/web_root/arches"})
     return {
             "name": "Debug Arches Project",
             "type": "debugpy",
             "request": "attach",
             "connect": {
               "host": "localhost",
-              "port": 5678
+              "port": port
             },
-            "pathMappings": [
-              {
-                "localRoot": "${workspaceFolder}",
-                "remoteRoot": "/web_root"
-              }
-            ]
+            "pathMappings": path_mappings
           }
 
-def create_launch_config():
-    workspace = AcWorkspace().path
+def create_launch_config(session=None):
+    ac_workspace = session.workspace if session else AcWorkspace()
+    workspace = ac_workspace.path
+    active_project = ac_workspace.get_settings().get_active_project()
+    arches_dir_name = None
+    port = PROJECT_PORTS[DEBUGPY_PORT]
+    if active_project:
+        # attach to the debugpy port the active project publishes
+        port = get_project_ports(active_project.get(AcProjectSettings.PROJECT_PORT_OFFSET.value))[DEBUGPY_PORT]
+        if uses_worktree(active_project):
+            arches_dir_name = os.path.basename(get_worktree_dir(workspace, active_project.project_name))
     vscode_dir = os.path.join(workspace, ".vscode")
     if not os.path.exists(vscode_dir):
         os.makedirs(vscode_dir)
@@ -35,10 +50,24 @@ def create_launch_config():
             AcOutputManager.skipped_step("Aborted by user.")
             return
     with open(launch_json, "w") as f:
-        json.dump({"configurations": [launch_config()]}, f, indent=4)
+        json.dump({"configurations": [launch_config(arches_dir_name, port)]}, f, indent=4)
 
-def generate_launch_config():
-    create_launch_config()
+def set_debug_listener(enabled, session=None):
+    '''
+    Turns the active project's debugpy setting on or off. It applies from the next 'up' or 'restart', which write it to the project's .env file.
+    '''
+    ac_workspace = session.workspace if session else AcWorkspace()
+    active_project = ac_workspace.get_settings().get_active_project()
+    if active_project is None:
+        AcOutputManager.fail("No active project set. Run 'act activate' first.")
+    active_project[AcProjectSettings.PROJECT_DEBUGPY.value] = enabled
+    active_project.save()
+    AcOutputManager.complete_step(f"debug listener {'enabled' if enabled else 'disabled'} for project {active_project.project_name}; run 'act restart' to apply it.")
+
+def generate_launch_config(session=None, debug=None):
+    if debug is not None:
+        set_debug_listener(debug, session)
+    create_launch_config(session)
     AcOutputManager.complete_step("launch.json configuration generated successfully.")
 
 
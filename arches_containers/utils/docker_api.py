@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import socket
+import subprocess
+import http.client
+import urllib.parse
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+DEFAULT_TIMEOUT = 10.0
+
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+COMPOSE_SERVICE_LABEL = "com.docker.compose.service"
+COMPOSE_CONFIG_HASH_LABEL = "com.docker.compose.config-hash"
+
+HEALTH_PATTERN = re.compile(r"\((healthy|unhealthy|health: starting)\)")
+
+
+class AcDockerApiError(Exception):
+    '''
+    Raised when the Docker Engine API cannot be reached or returns an error.
+    '''
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=DEFAULT_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class AcDockerClient:
+    '''
+    Minimal client for the Docker Engine API, talking HTTP over the local unix socket (or a plain tcp:// DOCKER_HOST).
+
+    Only the endpoints the CLI needs are implemented. Any failure to reach the engine raises AcDockerApiError so callers can fall back to the docker CLI.
+    '''
+    def __init__(self, docker_host=None, timeout=DEFAULT_TIMEOUT):
+        self.docker_host = docker_host or os.environ.get("DOCKER_HOST") or DEFAULT_DOCKER_HOST
+        self.timeout = timeout
+        parsed = urllib.parse.urlparse(self.docker_host)
+        if parsed.scheme == "unix":
+            if not hasattr(socket, "AF_UNIX"):
+                # e.g. older Windows Pythons, where Docker Desktop is reached through a named pipe instead
+                raise AcDockerApiError(f"Unix sockets are not supported on this platform: {self.docker_host}")
+            self._socket_path = parsed.path
+            self._address = None
+        elif parsed.scheme == "tcp" and not os.environ.get("DOCKER_TLS_VERIFY"):
+            self._socket_path = None
+            self._address = (parsed.hostname, parsed.port or 2375)
+        else:
+            raise AcDockerApiError(f"Unsupported DOCKER_HOST for the Engine API client: {self.docker_host}")
+
+    def _connection(self, timeout):
+        if self._socket_path:
+            return _UnixHTTPConnection(self._socket_path, timeout=timeout)
+        return http.client.HTTPConnection(*self._address, timeout=timeout)
+
+    @staticmethod
+    def _url(path, query=None):
+        if not query:
+            return path
+        return f"{path}?{urllib.parse.urlencode(query)}"
+
+    def request(self, method, path, query=None):
+        '''
+        Makes a request and returns the decoded JSON body (or None for an empty body).
+        '''
+        connection = self._connection(self.timeout)
+        try:
+            connection.request(method, self._url(path, query), headers={"Host": "docker"})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            raise AcDockerApiError(f"Could not reach the Docker engine at {self.docker_host}: {e}") from e
+        finally:
+            connection.close()
+
+        if response.status >= 400:
+            try:
+                message = json.loads(body).get("message", "")
+            except ValueError:
+                message = body.decode("utf-8", "replace")
+            raise AcDockerApiError(f"Docker engine returned {response.status} for {path}: {message}")
+        return json.loads(body) if body else None
+
+    def stream(self, path, query=None):
+        '''
+        Yields JSON objects from a streaming endpoint (one object per line) until the engine closes the stream.
+        The socket has no read timeout, so the caller blocks without using CPU until the next object arrives.
+        '''
+        connection = self._connection(None)
+        try:
+            connection.request("GET", self._url(path, query), headers={"Host": "docker"})
+            response = connection.getresponse()
+            if response.status >= 400:
+                raise AcDockerApiError(f"Docker engine returned {response.status} for {path}")
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException) as e:
+            raise AcDockerApiError(f"Lost connection to the Docker engine at {self.docker_host}: {e}") from e
+        finally:
+            connection.close()
+
+    def ping(self):
+        connection = self._connection(self.timeout)
+        try:
+            connection.request("GET", "/_ping", headers={"Host": "docker"})
+            return connection.getresponse().status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def list_containers(self, labels=None, all=True):
+        '''
+        Lists containers, filtered server-side by labels ("key" or "key=value").
+        '''
+        query = {"all": "1" if all else "0"}
+        if labels:
+            query["filters"] = json.dumps({"label": list(labels)})
+        return self.request("GET", "/containers/json", query)
+
+    def inspect_container(self, container_id):
+        return self.request("GET", f"/containers/{container_id}/json")
+
+    def inspect_image(self, name):
+        # the engine routes image names containing '/' and ':' unescaped, as the docker CLI sends them
+        return self.request("GET", f"/images/{name}/json")
+
+
+def project_label(project_name=None):
+    '''
+    Label filter for the containers of a compose project, or of every compose project if no name is given.
+    '''
+    return f"{COMPOSE_PROJECT_LABEL}={project_name}" if project_name else COMPOSE_PROJECT_LABEL
+
+
+class AcContainerStatus:
+    '''
+    The status of one container, built from either the Engine API or the docker CLI.
+    '''
+    def __init__(self, name, project, service, state, status, ports, restart_count=None, container_id=None):
+        self.name = name
+        self.project = project
+        self.service = service
+        self.state = state
+        self.status = status
+        self.ports = ports
+        self.restart_count = restart_count
+        self.container_id = container_id
+
+    @property
+    def health(self):
+        match = HEALTH_PATTERN.search(self.status or "")
+        if not match:
+            return None
+        return "starting" if match.group(1) == "health: starting" else match.group(1)
+
+    @property
+    def uptime(self):
+        if self.state != "running":
+            return None
+        # status reads e.g. "Up 5 minutes (healthy)"
+        return HEALTH_PATTERN.sub("", self.status).replace("Up ", "", 1).strip()
+
+    @classmethod
+    def from_api(cls, container):
+        labels = container.get("Labels") or {}
+        ports = sorted({
+            f"{port['PublicPort']}->{port['PrivatePort']}/{port['Type']}"
+            for port in container.get("Ports") or []
+            if port.get("PublicPort")
+        })
+        return cls(
+            name=container["Names"][0].lstrip("/"),
+            project=labels.get(COMPOSE_PROJECT_LABEL),
+            service=labels.get(COMPOSE_SERVICE_LABEL),
+            state=container.get("State"),
+            status=container.get("Status", ""),
+            ports=ports,
+            container_id=container.get("Id"),
+        )
+
+    @classmethod
+    def from_cli(cls, container):
+        labels = dict(
+            label.split("=", 1) for label in (container.get("Labels") or "").split(",") if "=" in label
+        )
+        ports = sorted({
+            re.sub(r"^(0\.0\.0\.0|\[::\]|::):", "", port.strip())
+            for port in (container.get("Ports") or "").split(",")
+            if "->" in port
+        })
+        return cls(
+            name=container["Names"],
+            project=labels.get(COMPOSE_PROJECT_LABEL),
+            service=labels.get(COMPOSE_SERVICE_LABEL),
+            state=container.get("State"),
+            status=container.get("Status", ""),
+            ports=ports,
+            container_id=container.get("ID"),
+        )
+
+
+def _list_with_cli(labels):
+    command = ["docker", "ps", "-a", "--format", "{{json .}}"]
+    for label in labels:
+        command.extend(["--filter", f"label={label}"])
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise AcDockerApiError(result.stderr.strip() or "docker ps failed")
+    return [AcContainerStatus.from_cli(json.loads(line)) for line in result.stdout.splitlines() if line.strip()]
+
+
+def list_project_containers(project_name=None, client=None, restart_counts=False, cli_fallback=True):
+    '''
+    Returns the containers of a compose project (or of every compose project) in a single list call, filtered by the compose project label.
+
+    Uses the Engine API, falling back to 'docker ps --filter label=...' if the engine socket cannot be used, unless cli_fallback is off,
+    in which case AcDockerApiError is raised for callers that need the Engine API for more than the list.
+    Restart counts are only reported by inspecting each container, so they are fetched only when restart_counts is set.
+    '''
+    labels = [project_label(project_name)]
+    try:
+        client = client or AcDockerClient()
+        containers = [AcContainerStatus.from_api(container) for container in client.list_containers(labels)]
+        if restart_counts:
+            for container in containers:
+                container.restart_count = client.inspect_container(container.container_id).get("RestartCount", 0)
+    except AcDockerApiError:
+        if not cli_fallback:
+            raise
+        containers = _list_with_cli(labels)
+    return sorted(containers, key=lambda container: container.name)
@@ -1,14 +1,13 @@
-import json
-from prettytable import PrettyTable
-
-from rich.console import Console
-from rich.spinner import Spinner as RichSpinner
-from rich.live import Live
-from rich.align import Align
-from rich.text import Text
+import sys
+import threading
+import contextvars
+from contextlib import contextmanager
 import arches_containers
 from arches_containers import AC_VERSION as arches_containers_version
 
+# rich and prettytable are imported lazily inside the functions that need them so that
+# non-interactive invocations (CI scripts, pipes) do not pay their import cost.
+
 BANNER = f"""
 _█████╗ ██████╗  ██████╗██╗  ██╗███████╗███████╗   ██████╗ ██████╗ ███╗   ██╗████████╗ █████╗ ██████╗███╗   ██╗███████╗██████╗ ███████╗
 ██╔══██╗██╔══██╗██╔════╝██║  ██║██╔════╝██╔════╝  ██╔════╝██╔═══██╗████╗  ██║╚══██╔══╝██╔══██╗╚═██╔═╝████╗  ██║██╔════╝██╔══██╗██╔════╝
@@ -27,8 +26,22 @@ _█████╗        ██████╗        ████████
 ╚═╝  ╚═╝rches  ╚═════╝ontainer   ╚═╝ools  v{arches_containers_version}
 """
 
+# name of the project the current worker is operating on, set by AcOutputManager.project_scope
+_project_scope = contextvars.ContextVar("ac_project_scope", default=None)
+
+def _is_interactive():
+    '''
+    Returns True when stdout is attached to a terminal. When it is not, the banner and spinner are skipped and output is written as plain text.
+    '''
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
 def create_banner():
     """Display the ASCII art banner."""
+    from rich.text import Text
+
     # Create gradient effect with different colors
     banner_lines = BANNER.strip().split('\n')
     minibanner_lines = MINIBANNER.strip().split('\n')
@@ -45,15 +58,26 @@ def create_banner():
     return styled_banner
 
 class _RichSpinner:
-    def __init__(self, text=""):
-        self.console = Console()
-        #self.console.rule(f"Arches Containers CLI v{arches_containers.AC_VERSION}")
-        self.console.rule(style="bold red")
-        self.console.print(Align.left(create_banner()))
-        self.console.rule(style="bold red")
+    def __init__(self, text="", interactive=None):
+        self.interactive = _is_interactive() if interactive is None else interactive
         self.text = text
-        self._spinner = RichSpinner("dots", text=self.text)
+        self.console = None
+        self._spinner = None
         self._live = None
+        # per-project progress rows shown below the spinner while several projects run concurrently
+        self._tasks = {}
+        self._lock = threading.RLock()
+        if self.interactive:
+            from rich.console import Console
+            from rich.spinner import Spinner as RichSpinner
+            from rich.align import Align
+
+            self.console = Console()
+            #self.console.rule(f"Arches Containers CLI v{arches_containers.AC_VERSION}")
+            self.console.rule(style="bold red")
+            self.console.print(Align.left(create_banner()))
+            self.console.rule(style="bold red")
+            self._spinner = RichSpinner("dots", text=self.text)
 
     def __enter__(self):
         self.start()
@@ -65,11 +89,16 @@ class _RichSpinner:
     def start(self, message=None):
         if message:
             self.text = message
-            self._spinner.text = message
+            if self._spinner:
+                self._spinner.text = message
+        if not self.interactive:
+            return
         if not self._live:
-            self._live = Live(self._spinner, console=self.console, refresh_per_second=10, transient=True)
+            from rich.live import Live
+
+            self._live = Live(self, console=self.console, refresh_per_second=10, transient=True)
         else:
-            self._live.update(self._spinner)
+            self._live.update(self)
         
         self._live.start()
 
@@ -78,27 +107,76 @@ class _RichSpinner:
             self._live.stop()
             self._live = None
 
+    def __rich__(self):
+        with self._lock:
+            rows = list(self._tasks.values())
+        if not rows:
+            return self._spinner
+        from rich.console import Group
+
+        return Group(self._spinner, *rows)
+
+    def set_task(self, name, text):
+        '''
+        Shows (or updates) a progress row with its own spinner for a project.
+        '''
+        if not self.interactive:
+            return
+        from rich.spinner import Spinner as RichSpinner
+
+        with self._lock:
+            self._tasks[name] = RichSpinner("dots", text=f"{name}: {text}")
+
+    def finish_task(self, name, text):
+        '''
+        Replaces a project's progress row with a static line once it has finished.
+        '''
+        if not self.interactive:
+            return
+        from rich.text import Text
+
+        with self._lock:
+            self._tasks[name] = Text(f"  {name}: {text}")
+
+    def clear_tasks(self):
+        with self._lock:
+            self._tasks.clear()
+
     def write(self, message, style=None):
+        scope = _project_scope.get()
+        if scope:
+            # prefix every line so output from concurrently running projects can be told apart
+            message = "\n".join(f"{scope} | {line}" for line in str(message).split("\n"))
         # Print immediately
-        self.console.print(message, style=style)
+        with self._lock:
+            if self.console:
+                self.console.print(message, style=style)
+            else:
+                print(message, flush=True)
         
     def ok(self, text=""):
         self.stop()
         if text:
-            self.console.print(text)
+            self.write(text)
 
     def fail(self, text=""):
         self.stop()
         if text:
-            self.console.print(text)
+            self.write(text)
 
     @property
     def text_attr(self):
-        return self._spinner.text
+        return self._spinner.text if self._spinner else self.text
 
     @text_attr.setter
     def text_attr(self, value):
-        self._spinner.text = value
+        scope = _project_scope.get()
+        if scope:
+            self.set_task(scope, value)
+            return
+        self.text = value
+        if self._spinner:
+            self._spinner.text = value
 
 class AcOutputManager(object):
     """
@@ -123,6 +201,7 @@ class AcOutputManager(object):
         failed_step(message: str): Writes a failure message (🔴).
         success(message: str): Writes a success message, updates spinner text, sets OK status, then stops.
         fail(message: str): Writes a failure message, sets fail status, stops, and exits.
+        project_scope(project_name: str): Context manager that prefixes output and tracks progress for one of several concurrently running projects.
     """
     def __new__(cls, text=""):
         if not hasattr(cls, 'instance'):
@@ -163,6 +242,7 @@ class AcOutputManager(object):
         '''
         Write a pretty-printed version of the args to the spinner in an ascii table.
         '''
+        from prettytable import PrettyTable
 
         table = PrettyTable()
         table.align = "l"
@@ -209,13 +289,39 @@ class AcOutputManager(object):
         spinner_manager.write(f"🟢 {message}")
         spinner_manager.spinner.ok("🏁 Finished successfully")
 
+    @staticmethod
+    @contextmanager
+    def project_scope(project_name):
+        '''
+        Scope output to a project while several projects run concurrently. Messages are prefixed with the project name,
+        text() updates the project's own progress row and fail() only ends the current project rather than the program.
+        '''
+        spinner = AcOutputManager().spinner
+        token = _project_scope.set(project_name)
+        spinner.set_task(project_name, "waiting")
+        try:
+            yield
+        finally:
+            _project_scope.reset(token)
+
+    @staticmethod
+    def finish_project(project_name, ok):
+        '''
+        Mark a project's progress row as finished.
+        '''
+        AcOutputManager().spinner.finish_task(project_name, "🟢 done" if ok else "🔴 failed")
+
     @staticmethod
     def fail(message):
         '''
         Write a failure message to the spinner and stop it. It will also exit the program with a status code of 1.
+
+        Inside a project_scope only the current project is stopped, by raising SystemExit, and the spinner keeps running for the others.
         '''
         spinner_manager = AcOutputManager()
         spinner_manager.write(f"🔴 {message}")
+        if _project_scope.get():
+            raise SystemExit(1)
         spinner_manager.spinner.fail("❌ Finished with errors")
         exit(1)
 
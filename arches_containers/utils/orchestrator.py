@@ -0,0 +1,56 @@
+import contextvars
+from arches_containers.utils.logger import AcOutputManager
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _exit_code(exit_exception: SystemExit):
+    if exit_exception.code is None:
+        return 0
+    return exit_exception.code if isinstance(exit_exception.code, int) else 1
+
+
+def _run_project(project_name, action):
+    with AcOutputManager.project_scope(project_name):
+        try:
+            action(project_name)
+            code = 0
+        except SystemExit as e:
+            code = _exit_code(e)
+        except Exception as e:
+            AcOutputManager.failed_step(f"{e}")
+            code = 1
+        AcOutputManager.finish_project(project_name, code == 0)
+        return code
+
+
+def run_for_projects(project_names, action, max_workers=None) -> int:
+    '''
+    Runs action(project_name) for each project and returns the combined exit status, which is 0 only if every project succeeded.
+
+    A single project runs inline exactly as before. Several projects run on a bounded thread pool, each in its own
+    AcOutputManager.project_scope so its output is prefixed and its progress has its own row in the live display.
+    A failure in one project does not stop the others.
+    '''
+    if len(project_names) == 1:
+        action(project_names[0])
+        return 0
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, min(max_workers or DEFAULT_MAX_WORKERS, len(project_names)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ac-project") as executor:
+        # each project gets a copy of the current context so its output scope does not leak into the others
+        futures = {
+            project_name: executor.submit(contextvars.copy_context().run, _run_project, project_name, action)
+            for project_name in project_names
+        }
+        results = {project_name: future.result() for project_name, future in futures.items()}
+
+    AcOutputManager().spinner.clear_tasks()
+    for project_name, code in results.items():
+        if code == 0:
+            AcOutputManager.complete_step(f"{project_name}: done.")
+        else:
+            AcOutputManager.failed_step(f"{project_name}: failed.")
+    return max(results.values())
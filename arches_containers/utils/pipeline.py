@@ -0,0 +1,114 @@
+import time
+import contextvars
+from arches_containers.utils.logger import AcOutputManager
+
+
+class AcTask:
+    '''
+    One step of a pipeline and when it ran.
+    '''
+    def __init__(self, name, action, depends_on=()):
+        self.name = name
+        self.action = action
+        self.depends_on = list(depends_on)
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def run(self):
+        self.started = time.monotonic()
+        try:
+            self.action()
+        finally:
+            self.finished = time.monotonic()
+
+
+class AcPipeline:
+    '''
+    Runs tasks as a dependency graph: each task starts as soon as every task it depends on has finished, so independent tasks run at the same time.
+
+    Tasks run on a thread pool in a copy of the caller's context, so output scope and timing phases behave as if the tasks ran inline.
+    If a task fails no further tasks are started, the running ones are allowed to finish, and the first failure is raised.
+
+    Example:
+        pipeline = AcPipeline("up") \n
+        pipeline.add("repo_sync", sync) \n
+        pipeline.add("dependencies_up", start_dependencies) \n
+        pipeline.add("app_up", start_app, depends_on=["repo_sync", "dependencies_up"]) \n
+        pipeline.run() \n
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.tasks = {}
+
+    def add(self, name, action, depends_on=()):
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already in the pipeline")
+        # dependencies must already be added, which also keeps the graph acyclic
+        unknown = [dependency for dependency in depends_on if dependency not in self.tasks]
+        if unknown:
+            raise ValueError(f"Task '{name}' depends on unknown tasks: {', '.join(unknown)}")
+        self.tasks[name] = AcTask(name, action, depends_on)
+        return self.tasks[name]
+
+    def _ready(self, finished, submitted):
+        return [
+            task for task in self.tasks.values()
+            if task.name not in submitted and all(dependency in finished for dependency in task.depends_on)
+        ]
+
+    def run(self):
+        '''
+        Runs every task and returns the critical path.
+        '''
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        finished = set()
+        submitted = set()
+        failure = None
+        with ThreadPoolExecutor(max_workers=max(1, len(self.tasks)), thread_name_prefix="ac-task") as executor:
+            running = {}
+            while True:
+                if failure is None:
+                    for task in self._ready(finished, submitted):
+                        submitted.add(task.name)
+                        running[executor.submit(contextvars.copy_context().run, task.run)] = task
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        failure = failure or error
+                    else:
+                        finished.add(task.name)
+
+        if failure is not None:
+            raise failure
+        return self.critical_path()
+
+    def critical_path(self):
+        '''
+        Returns the chain of tasks that determined the total time: the last task to finish, preceded by whichever of its dependencies finished last, and so on.
+        '''
+        completed = [task for task in self.tasks.values() if task.finished is not None]
+        if not completed:
+            return []
+        path = [max(completed, key=lambda task: task.finished)]
+        while path[0].depends_on:
+            path.insert(0, max((self.tasks[dependency] for dependency in path[0].depends_on), key=lambda task: task.finished))
+        return path
+
+    def report(self):
+        path = self.critical_path()
+        if len(self.tasks) < 2 or not path:
+            return
+        total = path[-1].finished - min(task.started for task in self.tasks.values() if task.started is not None)
+        steps = " → ".join(f"{task.name} {task.duration:.1f}s" for task in path)
+        AcOutputManager.write(f"... ⏱️  critical path: {steps} ({total:.1f}s total)")
@@ -0,0 +1,53 @@
+# the host ports the compose files publish, by the variable they read them from in the project's .env; a project's port_offset is added to each
+PROJECT_PORTS = {
+    "AC_APP_PORT": 8002,
+    "AC_DEBUGPY_PORT": 5678,
+    "AC_WEBPACK_PORT": 8028,
+    "AC_LIVERELOAD_PORT": 35729,
+    "AC_NGINX_PORT": 8080,
+    "AC_DB_PORT": 5433,
+    "AC_ES_PORT": 9201,
+    "AC_ES_TRANSPORT_PORT": 9301,
+    "AC_RABBITMQ_PORT": 5673,
+    "AC_RABBITMQ_MANAGEMENT_PORT": 15673,
+    "AC_COUCHDB_PORT": 5985,
+    "AC_FEATURESERVER_PORT": 9000,
+    "AC_TILESERVER_PORT": 7800,
+}
+APP_PORT = "AC_APP_PORT"
+DEBUGPY_PORT = "AC_DEBUGPY_PORT"
+
+
+def get_project_ports(port_offset):
+    '''
+    Returns the host port of each published service for a project with the given port_offset (None for projects created before offsets existed).
+    '''
+    return {variable: port + (port_offset or 0) for variable, port in PROJECT_PORTS.items()}
+
+
+def allocate_port_offset(used_offsets):
+    '''
+    Returns the lowest port offset whose ports do not overlap the ports of any of the used offsets.
+    '''
+    used_ports = set()
+    for offset in used_offsets:
+        used_ports.update(get_project_ports(offset).values())
+    offset = 0
+    while used_ports.intersection(get_project_ports(offset).values()):
+        offset += 1
+    return offset
+
+
+def find_port_conflicts(project_offsets):
+    '''
+    Takes a dict of project name to port offset and returns (project, other project, shared ports) for every pair of projects that publish a port in common.
+    '''
+    names = list(project_offsets)
+    conflicts = []
+    for index, name in enumerate(names):
+        ports = set(get_project_ports(project_offsets[name]).values())
+        for other in names[index + 1:]:
+            shared = ports.intersection(get_project_ports(project_offsets[other]).values())
+            if shared:
+                conflicts.append((name, other, sorted(shared)))
+    return conflicts
@@ -0,0 +1,85 @@
+import time
+import socket
+import http.client
+import urllib.error
+import urllib.request
+
+DEFAULT_INITIAL_DELAY = 0.5
+DEFAULT_MAX_DELAY = 10.0
+DEFAULT_REQUEST_TIMEOUT = 5.0
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    '''
+    Stops urllib following redirects so a 3xx from the application counts as a response in its own right.
+    '''
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+# no proxy handler, so HTTP(S)_PROXY settings in the environment are not used for requests to the local containers
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _NoRedirectHandler)
+
+
+def is_ready_status(status):
+    return status is not None and 200 <= status < 400
+
+
+def probe(url, timeout=DEFAULT_REQUEST_TIMEOUT):
+    '''
+    Makes a single GET request and returns the HTTP status code, or None if no HTTP response was received.
+    '''
+    try:
+        with _opener.open(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, http.client.HTTPException, socket.timeout, OSError):
+        return None
+
+
+class AcReadinessResult:
+    '''
+    The outcome of waiting for a service. Times are seconds since waiting started, or None if it never happened.
+    '''
+    def __init__(self, ready, status, first_response, ready_after, elapsed, attempts, reason=None):
+        self.ready = ready
+        self.status = status
+        self.first_response = first_response
+        self.ready_after = ready_after
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.reason = reason
+
+
+def wait_for_service(url, deadline, abort_check=None, initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                     request_timeout=DEFAULT_REQUEST_TIMEOUT, clock=time.monotonic, sleep=time.sleep):
+    '''
+    Polls url until it returns a 2xx or 3xx status, backing off exponentially between attempts, or until deadline seconds have passed.
+
+    abort_check is called after each unsuccessful attempt and may return a reason to stop waiting early, for example
+    because the container serving the url has exited.
+    '''
+    started = clock()
+    first_response = None
+    status = None
+    attempts = 0
+    delay = initial_delay
+    while True:
+        attempts += 1
+        remaining = deadline - (clock() - started)
+        status = probe(url, timeout=max(0.1, min(request_timeout, remaining)))
+        elapsed = clock() - started
+        if status is not None and first_response is None:
+            first_response = elapsed
+        if is_ready_status(status):
+            return AcReadinessResult(True, status, first_response, elapsed, elapsed, attempts)
+
+        reason = abort_check() if abort_check else None
+        if reason:
+            return AcReadinessResult(False, status, first_response, None, elapsed, attempts, reason)
+        if elapsed + delay >= deadline:
+            return AcReadinessResult(False, status, first_response, None, elapsed, attempts, f"not ready after {deadline}s")
+
+        sleep(delay)
+        delay = min(delay * 2, max_delay)
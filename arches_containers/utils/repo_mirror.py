@@ -0,0 +1,107 @@
+import os
+import subprocess
+from contextlib import ExitStack, contextmanager
+from arches_containers.utils.config_store import config_lock
+from arches_containers.utils.timing import timed_phase
+
+CACHE_DIR_ENV = "AC_CACHE_DIR"
+CACHE_DIR_NAME = "arches-containers"
+MIRRORS_DIR_NAME = "mirrors"
+# cloning a mirror downloads the full history, so another process waiting on it may wait a long time
+MIRROR_LOCK_TIMEOUT = 1800.0
+# only branches and tags are mirrored; GitHub also advertises refs/pull/*, which would multiply the download
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+class AcMirrorError(Exception):
+    '''
+    Raised when a git command against the mirror cache fails.
+    '''
+
+
+def get_cache_dir():
+    '''
+    Returns the user-level cache directory: $AC_CACHE_DIR, else $XDG_CACHE_HOME/arches-containers, else ~/.cache/arches-containers.
+    '''
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, CACHE_DIR_NAME)
+
+
+def get_mirror_path(organization, repo_name="arches", cache_dir=None):
+    return os.path.join(cache_dir or get_cache_dir(), MIRRORS_DIR_NAME, organization, f"{repo_name}.git")
+
+
+def _git(args, cwd=None, verbose=False, check=True):
+    result = subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE if not verbose else None,
+        stderr=subprocess.PIPE if not verbose else None,
+        text=True,
+    )
+    if check and result.returncode != 0:
+        detail = (result.stderr or "").strip() if not verbose else ""
+        raise AcMirrorError(f"git {args[0]} failed{': ' + detail if detail else ''}")
+    return result
+
+
+def _sibling_mirrors(mirror_dir):
+    # mirrors of other organisations are usually forks of the same repo and share most of its history
+    organizations_dir = os.path.dirname(os.path.dirname(mirror_dir))
+    repo_name = os.path.basename(mirror_dir)
+    if not os.path.isdir(organizations_dir):
+        return []
+    siblings = [os.path.join(organizations_dir, organization, repo_name) for organization in sorted(os.listdir(organizations_dir))]
+    return [sibling for sibling in siblings if sibling != mirror_dir and os.path.isdir(os.path.join(sibling, "objects"))]
+
+
+@contextmanager
+def _mirror_lock(mirror_dir):
+    # only the wait for the lock is turned into AcMirrorError, which is what the callers catch; errors inside the block pass through
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(config_lock(mirror_dir, timeout=MIRROR_LOCK_TIMEOUT))
+        except TimeoutError as e:
+            raise AcMirrorError(f"{e}; another process may still be cloning the mirror") from e
+        yield
+
+
+def update_mirror(repo_url, mirror_dir, verbose=False):
+    '''
+    Creates the bare mirror of repo_url at mirror_dir, or brings an existing one up to date with an incremental fetch.
+
+    A new mirror borrows the objects of any mirror of another organisation while cloning and then copies them in
+    (--dissociate), so switching to a fork only downloads the commits the fork does not share.
+    '''
+    os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+    with _mirror_lock(mirror_dir):
+        if os.path.isdir(os.path.join(mirror_dir, "objects")):
+            with timed_phase("mirror_fetch"):
+                _git(["fetch", "--prune", "origin"], cwd=mirror_dir, verbose=verbose)
+            return False
+
+        references = []
+        for sibling in _sibling_mirrors(mirror_dir):
+            references.extend(["--reference-if-able", sibling])
+        if references:
+            references.append("--dissociate")
+        with timed_phase("mirror_clone"):
+            _git(["clone", "--bare", *references, repo_url, mirror_dir], verbose=verbose)
+        _git(["config", "--unset-all", "remote.origin.fetch"], cwd=mirror_dir, check=False)
+        for refspec in MIRROR_REFSPECS:
+            _git(["config", "--add", "remote.origin.fetch", refspec], cwd=mirror_dir)
+        # workspace clones borrow objects from the mirror, so objects that become unreachable here must never be pruned
+        _git(["config", "gc.pruneExpire", "never"], cwd=mirror_dir)
+        return True
+
+
+def clone_from_mirror(repo_url, mirror_dir, clone_dir, verbose=False):
+    '''
+    Clones the workspace repo from the local mirror, sharing its objects through git alternates rather than copying them,
+    then points origin back at repo_url so fetches and pushes go upstream as before.
+    '''
+    with timed_phase("git_clone"):
+        _git(["clone", "--shared", "--no-checkout", mirror_dir, clone_dir], verbose=verbose)
+    _git(["remote", "set-url", "origin", repo_url], cwd=clone_dir)
@@ -0,0 +1,99 @@
+import json
+import subprocess
+from arches_containers.utils.docker_api import AcDockerClient, AcDockerApiError, project_label, COMPOSE_SERVICE_LABEL, COMPOSE_CONFIG_HASH_LABEL
+
+
+class AcRestartPlanError(Exception):
+    '''
+    Raised when the compose configuration or the running containers cannot be read, so a restart cannot tell which services changed.
+    '''
+
+
+class AcServiceChange:
+    '''
+    A service whose container has to be recreated, and why.
+    '''
+    def __init__(self, service, reason):
+        self.service = service
+        self.reason = reason
+
+
+class AcRestartPlan:
+    '''
+    The services of one compose file split into those whose container must be recreated and those that can be left as they are.
+    '''
+    def __init__(self, project, changed, unchanged):
+        self.project = project
+        self.changed = changed
+        self.unchanged = unchanged
+
+    @property
+    def services_to_recreate(self):
+        return [change.service for change in self.changed]
+
+
+def _compose(compose_file_path, project_path, *args):
+    result = subprocess.run(["docker", "compose", "-f", compose_file_path, *args], cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise AcRestartPlanError(f"docker compose {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def resolve_services(compose_file_path, project_path):
+    '''
+    Returns the compose project name and, for each service, its image and the hash of its resolved configuration.
+    The hash is the one compose stores in the config-hash label of the containers it creates, so the two can be compared directly.
+    '''
+    try:
+        config = json.loads(_compose(compose_file_path, project_path, "config", "--format", "json"))
+    except ValueError as e:
+        raise AcRestartPlanError(f"could not parse the compose configuration: {e}") from e
+    hashes = dict(line.split(None, 1) for line in _compose(compose_file_path, project_path, "config", "--hash", "*").splitlines() if line.strip())
+    services = {
+        name: {"image": service.get("image"), "config_hash": hashes.get(name, "").strip()}
+        for name, service in (config.get("services") or {}).items()
+    }
+    return config.get("name"), services
+
+
+def _image_id(client, image, image_ids):
+    if image not in image_ids:
+        try:
+            image_ids[image] = client.inspect_image(image).get("Id") if image else None
+        except AcDockerApiError:
+            # not built or pulled yet
+            image_ids[image] = None
+    return image_ids[image]
+
+
+def plan_restart(compose_file_path, project_path, client=None):
+    '''
+    Compares every service of a compose file with its container: a service is recreated if it has no running container,
+    if its resolved configuration hash differs from the container's, or if its image now resolves to a different image ID.
+    '''
+    project, services = resolve_services(compose_file_path, project_path)
+    try:
+        client = client or AcDockerClient()
+        containers = client.list_containers([project_label(project)])
+    except AcDockerApiError as e:
+        raise AcRestartPlanError(str(e)) from e
+    by_service = {(container.get("Labels") or {}).get(COMPOSE_SERVICE_LABEL): container for container in containers}
+
+    changed = []
+    unchanged = []
+    image_ids = {}
+    for name, service in services.items():
+        container = by_service.get(name)
+        if container is None:
+            reason = "no container"
+        elif container.get("State") != "running":
+            reason = f"container {container.get('State')}"
+        elif (container.get("Labels") or {}).get(COMPOSE_CONFIG_HASH_LABEL) != service["config_hash"]:
+            reason = "configuration changed"
+        elif container.get("ImageID") != _image_id(client, service["image"], image_ids):
+            reason = "image changed"
+        else:
+            unchanged.append(name)
+            continue
+        changed.append(AcServiceChange(name, reason))
+    return AcRestartPlan(project, changed, unchanged)
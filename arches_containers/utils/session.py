@@ -0,0 +1,28 @@
+from arches_containers.utils.workspace import AcWorkspace, AcProject
+
+
+class AcSession:
+    '''
+    Per-process view of the workspace used by a single CLI invocation.
+
+    The workspace directory is resolved once and the settings and project configurations are held in memory,
+    only being re-read when the file on disk changes. Pass the session to helpers rather than creating a new AcWorkspace.
+
+    Example:
+        session = AcSession() \n
+        project = session.get_project("my_project") \n
+        compose_project(project.project_name, "up", session=session) \n
+    '''
+    def __init__(self, workspace=None):
+        self.workspace = workspace if workspace is not None else AcWorkspace()
+        self.settings = self.workspace.get_settings()
+
+    @property
+    def path(self):
+        return self.workspace.path
+
+    def get_project(self, project_name) -> AcProject:
+        return self.workspace.get_project(project_name)
+
+    def get_active_project(self) -> AcProject:
+        return self.settings.get_active_project()
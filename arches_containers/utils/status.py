@@ -1,24 +1,48 @@
-import subprocess
-import json
-from prettytable import PrettyTable
 from arches_containers.utils.logger import AcOutputManager
 
-def get_running_containers(project_name, project_name_urlsafe):
+# the Engine API client (and http.client) is imported inside the functions so commands that do not report status do not pay for it
+
+STATE_LABELS = {
+    "running": "🟢 Running",
+    "restarting": "🟡 Restarting",
+    "paused": "🟡 Paused",
+}
+HEALTH_LABELS = {
+    "healthy": "🟢 healthy",
+    "starting": "🟡 starting",
+    "unhealthy": "🔴 unhealthy",
+}
+
+
+def _state_label(state):
+    return STATE_LABELS.get(state, "🔴 Stopped")
+
+
+def get_running_containers(project_name, project_name_urlsafe=None, client=None):
+    '''
+    Writes a table of a project's containers with their state, health, uptime, restart count and published ports.
+
+    Containers are found by their compose project label rather than by matching names, so one project name being a prefix of another does not matter.
+    '''
+    from prettytable import PrettyTable
+    from arches_containers.utils.docker_api import list_project_containers
+
     try:
-        result = subprocess.run(['docker', 'ps', '-a', '--format', '{{json .}}'], stdout=subprocess.PIPE, text=True)
-        containers = result.stdout.strip().split('\n')
-        
+        containers = list_project_containers(project_name, client, restart_counts=True)
+
         table = PrettyTable()
         table.align = "l"
-        table.field_names = ["Name", "State"]
-        
+        table.field_names = ["Name", "Service", "State", "Health", "Uptime", "Restarts", "Ports"]
         for container in containers:
-            container_info = json.loads(container)
-            name = container_info['Names']
-            status = container_info['Status']
-            state = "🟢 Running" if "Up" in status else "🔴 Stopped"
-            if project_name in name or project_name_urlsafe in name:
-                table.add_row([name, state])
+            table.add_row([
+                container.name,
+                container.service or "-",
+                _state_label(container.state),
+                HEALTH_LABELS.get(container.health, "-"),
+                container.uptime or "-",
+                "-" if container.restart_count is None else container.restart_count,
+                ", ".join(container.ports) or "-",
+            ])
 
         #if the length of the table is 0, then no containers are running
         if len(table.rows) == 0:
@@ -26,4 +50,42 @@ def get_running_containers(project_name, project_name_urlsafe):
         else:
             AcOutputManager.write(table)
     except Exception as e:
-        AcOutputManager.fail(f"An error occurred fetching status: {e}")
\ No newline at end of file
+        AcOutputManager.fail(f"An error occurred fetching status: {e}")
+
+
+def get_all_projects_status(project_names, client=None):
+    '''
+    Writes a summary of the containers of every given project, fetched with a single list call for all compose projects.
+    '''
+    from prettytable import PrettyTable
+    from arches_containers.utils.docker_api import list_project_containers
+
+    try:
+        containers = list_project_containers(None, client)
+    except Exception as e:
+        AcOutputManager.fail(f"An error occurred fetching status: {e}")
+        return
+
+    by_project = {project_name: [] for project_name in project_names}
+    for container in containers:
+        if container.project in by_project:
+            by_project[container.project].append(container)
+
+    table = PrettyTable()
+    table.align = "l"
+    table.field_names = ["Project", "State", "Running", "Unhealthy", "Restarting", "Stopped"]
+    for project_name, project_containers in by_project.items():
+        running = sum(1 for container in project_containers if container.state == "running")
+        unhealthy = sum(1 for container in project_containers if container.health == "unhealthy")
+        restarting = sum(1 for container in project_containers if container.state == "restarting")
+        stopped = len(project_containers) - running - restarting
+        if not project_containers:
+            state = "⚪ No containers"
+        elif unhealthy or restarting:
+            state = "🟡 Degraded"
+        elif running:
+            state = "🟢 Running"
+        else:
+            state = "🔴 Stopped"
+        table.add_row([project_name, state, running, unhealthy, restarting, stopped])
+    AcOutputManager.write(table)
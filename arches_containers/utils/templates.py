@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import arches_containers
+from arches_containers.utils.config_store import atomic_write_text, atomic_write_json
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(arches_containers.__file__), "template")
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_PATH = os.path.join(TEMPLATE_PATH, MANIFEST_FILE_NAME)
+MANIFEST_VERSION = 1
+
+TEMPLATE_DIRECTORY_PATTERN = re.compile(r"_(\d+\.\d+)_")
+
+REPLACE_TOKEN = "{{project}}"
+REPLACE_TOKEN_URLSAFE = "{{project_urlsafe}}"
+REPLACE_TOKEN_PATTERN = re.compile(r"\{\{(project|project_urlsafe)\}\}")
+PLATFORM_LINE_EXTENSIONS = (".yml", ".yaml")
+
+# records the hash of every file as originally rendered into a project, used by upgrades to detect local edits
+RENDER_MANIFEST_FILE_NAME = ".ac-render.json"
+# files holding project state; upgrades only add missing keys to these rather than replacing them
+PROJECT_STATE_FILES = ("config.json",)
+# files used straight from the template directory, which are neither listed in the manifest nor rendered into projects
+TEMPLATE_ONLY_FILES = ("Dockerfile.base",)
+
+UPGRADE_UNCHANGED = "unchanged"
+UPGRADE_UPDATE = "update"
+UPGRADE_ADD = "add"
+UPGRADE_KEEP_LOCAL = "keep-local"
+UPGRADE_CONFLICT = "conflict"
+UPGRADE_DELETED_LOCALLY = "deleted-locally"
+UPGRADE_REMOVED_UPSTREAM = "removed-upstream"
+UPGRADE_MERGE_STATE = "merge-state"
+
+_manifest_cache = {}
+
+
+def _version_key(version):
+    return tuple(int(part) for part in version.split("."))
+
+
+def hash_bytes(content: bytes):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def build_manifest(template_path=TEMPLATE_PATH):
+    '''
+    Builds the template manifest by scanning the template directory.
+
+    Maps each supported Arches version to its template directory, default arches branch and the content hash of every template file.
+    '''
+    versions = {}
+    for entry in os.listdir(template_path):
+        match = TEMPLATE_DIRECTORY_PATTERN.fullmatch(entry)
+        directory = os.path.join(template_path, entry)
+        if not match or not os.path.isdir(directory):
+            continue
+
+        files = {}
+        for root, dirs, filenames in os.walk(directory):
+            for filename in filenames:
+                file_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(file_path, directory).replace(os.sep, "/")
+                if relative_path in TEMPLATE_ONLY_FILES:
+                    continue
+                files[relative_path] = _hash_file(file_path)
+
+        with open(os.path.join(directory, "config.json"), "r") as config_file:
+            config = json.load(config_file)
+
+        versions[match.group(1)] = {
+            "directory": entry,
+            "default_branch": config["arches_repo_branch"],
+            "files": dict(sorted(files.items())),
+        }
+
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "versions": dict(sorted(versions.items(), key=lambda item: _version_key(item[0]))),
+    }
+
+
+def write_manifest(template_path=TEMPLATE_PATH):
+    '''
+    Regenerates manifest.json in the template directory. Run this whenever a template file is added or changed.
+    '''
+    manifest = build_manifest(template_path)
+    atomic_write_text(os.path.join(template_path, MANIFEST_FILE_NAME), json.dumps(manifest, indent=4) + "\n")
+    return manifest
+
+
+def load_manifest(template_path=TEMPLATE_PATH):
+    '''
+    Returns the template manifest, reading manifest.json once per process. Falls back to scanning the templates if it has not been generated.
+    '''
+    if template_path not in _manifest_cache:
+        manifest_path = os.path.join(template_path, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as manifest_file:
+                _manifest_cache[template_path] = json.load(manifest_file)
+        else:
+            _manifest_cache[template_path] = build_manifest(template_path)
+    return _manifest_cache[template_path]
+
+
+def get_supported_versions(template_path=TEMPLATE_PATH):
+    return list(load_manifest(template_path)["versions"])
+
+
+def get_template(version, template_path=TEMPLATE_PATH):
+    '''
+    Returns the manifest entry for an Arches version (major.minor), or None if the version is not supported.
+    '''
+    if version is None:
+        return None
+    return load_manifest(template_path)["versions"].get(version.strip().lower())
+
+
+def get_template_folder(version, template_path=TEMPLATE_PATH):
+    template = get_template(version, template_path)
+    if template is None:
+        return None
+    return os.path.join(template_path, template["directory"])
+
+
+def adjust_platform_content(content, uncomment: bool):
+    '''
+    Adjusts platform lines in docker-compose file content.
+    If uncomment=True, uncomment '#platform: linux/arm64'
+    If uncomment=False, comment 'platform: linux/arm64'
+    '''
+    if uncomment:
+        # Remove only the first '#' (and any following space) before 'platform: linux/arm64', preserving indentation
+        return re.sub(r'^(\s*)#(\s*)(platform:\s*linux/arm64)', r'\1\3', content, flags=re.MULTILINE)
+    # Add a '#' before 'platform: linux/arm64' if not already commented, preserving indentation
+    return re.sub(r'^(\s*)(platform:\s*linux/arm64)', r'\1#\2', content, flags=re.MULTILINE)
+
+
+def render_content(relative_path, content, project_name, project_name_urlsafe, arm64=False):
+    '''
+    Substitutes the project placeholders and, for compose files, the platform lines in a single pass over the content.
+    '''
+    values = {"project": project_name, "project_urlsafe": project_name_urlsafe}
+    content = REPLACE_TOKEN_PATTERN.sub(lambda match: values[match.group(1)], content)
+    if arm64 and relative_path.endswith(PLATFORM_LINE_EXTENSIONS):
+        content = adjust_platform_content(content, uncomment=True)
+    return content
+
+
+def render_template(version, project_name, project_name_urlsafe, arm64=False, template_path=TEMPLATE_PATH):
+    '''
+    Yields (relative_path, rendered_content, file_mode) for every file of a version's template, reading each file once.
+    '''
+    template = get_template(version, template_path)
+    if template is None:
+        raise ValueError(f"Arches version {version} not supported.")
+
+    template_folder = os.path.join(template_path, template["directory"])
+    for relative_path in template["files"]:
+        source_path = os.path.join(template_folder, *relative_path.split("/"))
+        with open(source_path, "r", encoding="utf-8", newline="") as source_file:
+            content = source_file.read()
+            mode = os.fstat(source_file.fileno()).st_mode & 0o7777
+        yield relative_path, render_content(relative_path, content, project_name, project_name_urlsafe, arm64), mode
+
+
+def materialise_project(version, target_path, project_name, project_name_urlsafe, arm64=False, template_path=TEMPLATE_PATH):
+    '''
+    Renders a version's template into a temporary directory next to target_path and renames it into place,
+    so an interrupted create never leaves a partially rendered project behind.
+    '''
+    parent_path, target_name = os.path.split(os.path.abspath(target_path))
+    temp_path = tempfile.mkdtemp(dir=parent_path, prefix=f".{target_name}.", suffix=".tmp")
+    try:
+        hashes = {}
+        for relative_path, content, mode in render_template(version, project_name, project_name_urlsafe, arm64, template_path):
+            file_path = os.path.join(temp_path, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8", newline="") as target_file:
+                target_file.write(content)
+            os.chmod(file_path, mode)
+            hashes[relative_path] = hash_bytes(content.encode("utf-8"))
+        write_render_manifest(temp_path, version, hashes)
+        os.chmod(temp_path, 0o755)
+        os.rename(temp_path, target_path)
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return target_path
+
+
+def read_render_manifest(project_path):
+    '''
+    Returns the render manifest of a project, or None for projects created before render manifests were recorded.
+    '''
+    try:
+        with open(os.path.join(project_path, RENDER_MANIFEST_FILE_NAME), "r") as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+
+
+def write_render_manifest(project_path, version, hashes):
+    atomic_write_json(os.path.join(project_path, RENDER_MANIFEST_FILE_NAME), {
+        "arches_version": version,
+        "ac_version": arches_containers.AC_VERSION,
+        "files": dict(sorted(hashes.items())),
+    })
+
+
+class AcUpgradeStep:
+    '''
+    A single file in an upgrade plan, with the action to take and the newly rendered content.
+    '''
+    def __init__(self, relative_path, action, content=None, mode=None, rendered_hash=None):
+        self.relative_path = relative_path
+        self.action = action
+        self.content = content
+        self.mode = mode
+        self.rendered_hash = rendered_hash
+
+
+def plan_upgrade(project_path, version, project_name, project_name_urlsafe, arm64=False, template_path=TEMPLATE_PATH):
+    '''
+    Compares the freshly rendered template with the project's files and with the hashes recorded when the project was rendered.
+
+    A file is updated only if it changed upstream and still matches its original render. Files changed both upstream
+    and locally are conflicts, and files only changed locally are kept.
+    '''
+    render_manifest = read_render_manifest(project_path) or {}
+    baseline = render_manifest.get("files", {})
+    plan = []
+    for relative_path, content, mode in render_template(version, project_name, project_name_urlsafe, arm64, template_path):
+        rendered_hash = hash_bytes(content.encode("utf-8"))
+        if relative_path in PROJECT_STATE_FILES:
+            plan.append(AcUpgradeStep(relative_path, UPGRADE_MERGE_STATE, content, mode, rendered_hash))
+            continue
+
+        file_path = os.path.join(project_path, *relative_path.split("/"))
+        current_hash = _hash_file(file_path) if os.path.exists(file_path) else None
+        base_hash = baseline.get(relative_path)
+        if current_hash == rendered_hash:
+            action = UPGRADE_UNCHANGED
+        elif current_hash is None:
+            action = UPGRADE_ADD if base_hash is None else UPGRADE_DELETED_LOCALLY
+        elif current_hash == base_hash:
+            action = UPGRADE_UPDATE
+        elif base_hash == rendered_hash:
+            action = UPGRADE_KEEP_LOCAL
+        else:
+            action = UPGRADE_CONFLICT
+        plan.append(AcUpgradeStep(relative_path, action, content, mode, rendered_hash))
+
+    rendered_paths = {step.relative_path for step in plan}
+    for relative_path in baseline:
+        if relative_path not in rendered_paths:
+            plan.append(AcUpgradeStep(relative_path, UPGRADE_REMOVED_UPSTREAM))
+    return plan
+
+
+if __name__ == "__main__":
+    manifest = write_manifest()
+    print(f"Wrote {MANIFEST_PATH} ({len(manifest['versions'])} versions)")
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import datetime
+import contextvars
+from contextlib import contextmanager
+import arches_containers
+from arches_containers.utils.config_store import config_lock
+
+TIMING_HISTORY_FILE_NAME = "timings.jsonl"
+DEFAULT_BASELINE_RUNS = 10
+DEFAULT_REGRESSION_THRESHOLD = 0.25
+MIN_BASELINE_RUNS = 3
+
+# the run being timed in the current context; each project worker gets its own copy of the context
+_current_run = contextvars.ContextVar("ac_timing_run", default=None)
+
+
+def get_history_path(workspace):
+    return os.path.join(workspace._get_ac_directory_path(), TIMING_HISTORY_FILE_NAME)
+
+
+class AcTimingRun:
+    '''
+    The phase durations of one command run against one project.
+    '''
+    def __init__(self, command, project_name):
+        self.command = command
+        self.project_name = project_name
+        self.started = time.monotonic()
+        self.timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        self.phases = {}
+
+    def add_phase(self, name, seconds):
+        # a phase run more than once in a command (e.g. compose down then up on restart) is summed
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def to_record(self, status):
+        return {
+            "timestamp": self.timestamp,
+            "ac_version": arches_containers.AC_VERSION,
+            "command": self.command,
+            "project": self.project_name,
+            "status": status,
+            "total": round(time.monotonic() - self.started, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+@contextmanager
+def timing_run(command, project_name, history_path):
+    '''
+    Times a command for a project and appends its phase durations to the history file when it finishes, whether or not it succeeded.
+    '''
+    run = AcTimingRun(command, project_name)
+    token = _current_run.set(run)
+    status = "failed"
+    try:
+        yield run
+        status = "ok"
+    except SystemExit as e:
+        status = "ok" if not e.code else "failed"
+        raise
+    finally:
+        _current_run.reset(token)
+        append_history(history_path, run.to_record(status))
+
+
+@contextmanager
+def timed_phase(name):
+    '''
+    Records how long the block takes as a phase of the current timing run. Does nothing when no run is being timed.
+    '''
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        run.add_phase(name, time.monotonic() - started)
+
+
+def append_history(history_path, record):
+    if not os.path.isdir(os.path.dirname(history_path)):
+        return
+    with config_lock(history_path):
+        with open(history_path, "a") as history_file:
+            history_file.write(json.dumps(record) + "\n")
+
+
+def load_history(history_path):
+    '''
+    Returns the recorded runs, oldest first, skipping any lines that cannot be parsed.
+    '''
+    records = []
+    try:
+        with open(history_path, "r") as history_file:
+            for line in history_file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def percentile(values, pct):
+    '''
+    Linearly interpolated percentile of a list of numbers.
+    '''
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class AcPhaseStats:
+    def __init__(self, project_name, command, phase, durations, baseline_runs, threshold):
+        self.project_name = project_name
+        self.command = command
+        self.phase = phase
+        self.runs = len(durations)
+        self.p50 = percentile(durations, 50)
+        self.p95 = percentile(durations, 95)
+        self.last = durations[-1]
+        baseline = durations[-baseline_runs - 1:-1]
+        self.baseline = percentile(baseline, 50) if len(baseline) >= MIN_BASELINE_RUNS else None
+        self.change = (self.last - self.baseline) / self.baseline if self.baseline else None
+        self.regression = self.change is not None and self.change > threshold
+
+
+def compute_stats(records, project_name=None, command=None, baseline_runs=DEFAULT_BASELINE_RUNS, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    '''
+    Summarises successful runs per project, command and phase (plus the total).
+
+    The last run of each phase is compared with the median of the baseline_runs before it and flagged as a
+    regression when it is more than threshold (a fraction) slower.
+    '''
+    durations = {}
+    for record in records:
+        if record.get("status") != "ok":
+            continue
+        if project_name and record.get("project") != project_name:
+            continue
+        if command and record.get("command") != command:
+            continue
+        phases = dict(record.get("phases", {}))
+        phases["total"] = record.get("total", 0.0)
+        for phase, seconds in phases.items():
+            durations.setdefault((record["project"], record["command"], phase), []).append(seconds)
+
+    return [
+        AcPhaseStats(project, run_command, phase, values, baseline_runs, threshold)
+        for (project, run_command, phase), values in durations.items()
+    ]
+
+
+def _format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.1f}s"
+
+
+def report_stats(history_path, project_name=None, command=None, baseline_runs=DEFAULT_BASELINE_RUNS, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    '''
+    Writes a table of p50/p95 phase durations from the timing history, flagging phases whose last run regressed against the baseline.
+    '''
+    from prettytable import PrettyTable
+    from arches_containers.utils.logger import AcOutputManager
+
+    stats = compute_stats(load_history(history_path), project_name, command, baseline_runs, threshold)
+    if not stats:
+        AcOutputManager.complete_step("No timings recorded yet. Timings are recorded by the up, down, restart and init commands.")
+        return stats
+
+    table = PrettyTable()
+    table.align = "l"
+    table.field_names = ["Project", "Command", "Phase", "Runs", "p50", "p95", "Last", "vs baseline"]
+    for phase_stats in sorted(stats, key=lambda item: (item.project_name, item.command, item.phase == "total")):
+        if phase_stats.change is None:
+            change = "-"
+        else:
+            change = f"{'🔴 ' if phase_stats.regression else ''}{phase_stats.change:+.0%}"
+        table.add_row([
+            phase_stats.project_name,
+            phase_stats.command,
+            phase_stats.phase,
+            phase_stats.runs,
+            _format_seconds(phase_stats.p50),
+            _format_seconds(phase_stats.p95),
+            _format_seconds(phase_stats.last),
+            change,
+        ])
+    AcOutputManager.write(table.get_string())
+
+    for phase_stats in stats:
+        if phase_stats.regression:
+            AcOutputManager.failed_step(
+                f"{phase_stats.project_name} {phase_stats.command} {phase_stats.phase}: last run {_format_seconds(phase_stats.last)} "
+                f"is {phase_stats.change:.0%} slower than the baseline median of {_format_seconds(phase_stats.baseline)}."
+            )
+    return stats
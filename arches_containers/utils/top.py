@@ -0,0 +1,212 @@
+import json
+import time
+import threading
+import datetime
+from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.docker_api import AcDockerClient, AcDockerApiError, list_project_containers
+
+DEFAULT_INTERVAL = 2.0
+BYTE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB"]
+
+
+def format_bytes(value):
+    if value is None:
+        return "-"
+    value = float(value)
+    for unit in BYTE_UNITS:
+        if abs(value) < 1024 or unit == BYTE_UNITS[-1]:
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+
+def compute_container_stats(name, sample):
+    '''
+    Converts a raw Engine API stats sample into CPU %, memory against the limit, and cumulative block and network I/O.
+    '''
+    cpu_stats = sample.get("cpu_stats") or {}
+    precpu_stats = sample.get("precpu_stats") or {}
+    cpu_delta = cpu_stats.get("cpu_usage", {}).get("total_usage", 0) - precpu_stats.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+    online_cpus = cpu_stats.get("online_cpus") or len(cpu_stats.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+    cpu_percent = cpu_delta / system_delta * online_cpus * 100 if cpu_delta > 0 and system_delta > 0 else 0.0
+
+    memory_stats = sample.get("memory_stats") or {}
+    memory_detail = memory_stats.get("stats") or {}
+    # page cache is reclaimable, so it is left out as docker stats does (cgroup v1 reports 'cache', v2 'inactive_file')
+    memory_usage = memory_stats.get("usage", 0) - memory_detail.get("inactive_file", memory_detail.get("cache", 0))
+    memory_limit = memory_stats.get("limit")
+
+    block_read = block_write = 0
+    for entry in (sample.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        operation = entry.get("op", "").lower()
+        if operation == "read":
+            block_read += entry.get("value", 0)
+        elif operation == "write":
+            block_write += entry.get("value", 0)
+
+    networks = (sample.get("networks") or {}).values()
+    return {
+        "name": name,
+        "cpu_percent": round(cpu_percent, 2),
+        "memory_usage": max(memory_usage, 0),
+        "memory_limit": memory_limit,
+        "memory_percent": round(memory_usage / memory_limit * 100, 2) if memory_limit else None,
+        "block_read": block_read,
+        "block_write": block_write,
+        "net_rx": sum(network.get("rx_bytes", 0) for network in networks),
+        "net_tx": sum(network.get("tx_bytes", 0) for network in networks),
+    }
+
+
+class AcStatsCollector:
+    '''
+    Keeps the latest stats sample of each container, read from one streaming stats request per container in a background thread.
+    '''
+    def __init__(self, client, containers):
+        self.client = client
+        self.containers = containers
+        self.latest = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        for container in self.containers:
+            threading.Thread(target=self._follow, args=(container,), name=f"ac-stats-{container.name}", daemon=True).start()
+        return self
+
+    def _follow(self, container):
+        try:
+            for sample in self.client.stream(f"/containers/{container.container_id}/stats", {"stream": "1"}):
+                with self._lock:
+                    self.latest[container.name] = compute_container_stats(container.name, sample)
+        except AcDockerApiError as e:
+            with self._lock:
+                self.errors[container.name] = str(e)
+
+    def rows(self):
+        with self._lock:
+            return [self.latest[container.name] for container in self.containers if container.name in self.latest]
+
+    def failures(self):
+        with self._lock:
+            return dict(self.errors)
+
+
+def take_snapshot(project_name, client=None):
+    '''
+    Returns one stats sample for each running container of a project, and the error for each container whose stats could not be read.
+    The engine waits for a second sample before replying, so CPU % is populated.
+    '''
+    client = client or AcDockerClient()
+    # stats only come from the Engine API, so an unreachable engine fails here rather than after a fallback listing
+    containers = [container for container in list_project_containers(project_name, client, cli_fallback=False) if container.state == "running"]
+    rows = [None] * len(containers)
+    errors = {}
+
+    def fetch(index, container):
+        try:
+            sample = client.request("GET", f"/containers/{container.container_id}/stats", {"stream": "0"})
+        except AcDockerApiError as e:
+            # e.g. the container stopped after it was listed
+            errors[container.name] = str(e)
+            return
+        rows[index] = compute_container_stats(container.name, sample)
+
+    threads = [threading.Thread(target=fetch, args=(index, container)) for index, container in enumerate(containers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [row for row in rows if row is not None], dict(sorted(errors.items()))
+
+
+def write_snapshot(project_name, output_path, client=None):
+    '''
+    Writes a JSON snapshot of a project's container stats to output_path, or to stdout when output_path is '-'.
+    '''
+    rows, errors = take_snapshot(project_name, client)
+    snapshot = {
+        "project": project_name,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "containers": rows,
+        "errors": errors,
+    }
+    content = json.dumps(snapshot, indent=4)
+    if output_path == "-":
+        print(content)
+    else:
+        with open(output_path, "w") as output_file:
+            output_file.write(content + "\n")
+        AcOutputManager.complete_step(f"Stats snapshot written to {output_path}.")
+    return snapshot
+
+
+def _table_row(row):
+    memory = f"{format_bytes(row['memory_usage'])} / {format_bytes(row['memory_limit'])}"
+    memory_percent = "-" if row["memory_percent"] is None else f"{row['memory_percent']:.1f}%"
+    return [
+        row["name"],
+        f"{row['cpu_percent']:.1f}%",
+        memory,
+        memory_percent,
+        f"{format_bytes(row['block_read'])} / {format_bytes(row['block_write'])}",
+        f"{format_bytes(row['net_rx'])} / {format_bytes(row['net_tx'])}",
+    ]
+
+
+TABLE_HEADINGS = ["Name", "CPU", "Memory / Limit", "Mem %", "Block I/O (r/w)", "Net I/O (rx/tx)"]
+
+
+def build_table(project_name, rows, interval, errors=None):
+    '''
+    Builds the live table, with the containers whose stats stream failed listed under it.
+    '''
+    from rich.table import Table
+
+    caption = "\n".join(f"{name}: {error}" for name, error in sorted((errors or {}).items())) or None
+    table = Table(title=f"{project_name} - refreshing every {interval:g}s (ctrl+c to exit)", title_justify="left", caption=caption, caption_justify="left", caption_style="red")
+    for heading in TABLE_HEADINGS:
+        table.add_column(heading, justify="left" if heading == "Name" else "right", no_wrap=heading == "Name")
+    for row in rows:
+        table.add_row(*_table_row(row))
+    return table
+
+
+def run_top(project_name, interval=DEFAULT_INTERVAL, client=None):
+    '''
+    Streams the resource usage of a project's running containers into a live table until interrupted.
+    Without a terminal, a single snapshot table is written instead.
+    '''
+    client = client or AcDockerClient()
+    # stats only come from the Engine API, so an unreachable engine fails here rather than after a fallback listing
+    containers = [container for container in list_project_containers(project_name, client, cli_fallback=False) if container.state == "running"]
+    if not containers:
+        AcOutputManager.complete_step(f"No {project_name} containers running.")
+        return
+
+    spinner = AcOutputManager().spinner
+    if not spinner.interactive:
+        from prettytable import PrettyTable
+
+        table = PrettyTable()
+        table.align = "l"
+        table.field_names = TABLE_HEADINGS
+        rows, errors = take_snapshot(project_name, client)
+        for row in rows:
+            table.add_row(_table_row(row))
+        AcOutputManager.write(table)
+        for name, error in errors.items():
+            AcOutputManager.failed_step(f"{name}: {error}")
+        return
+
+    from rich.live import Live
+
+    collector = AcStatsCollector(client, containers).start()
+    spinner.stop()
+    try:
+        with Live(build_table(project_name, [], interval), console=spinner.console, refresh_per_second=4) as live:
+            while True:
+                live.update(build_table(project_name, collector.rows(), interval, collector.failures()))
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
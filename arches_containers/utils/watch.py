@@ -0,0 +1,213 @@
+import json
+import time
+import datetime
+from collections import deque
+from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.docker_api import AcDockerClient, list_project_containers, COMPOSE_PROJECT_LABEL, COMPOSE_SERVICE_LABEL
+
+# exec_* events are left out: every healthcheck run produces three of them, which would wake the watch for nothing
+WATCHED_EVENTS = ["create", "start", "restart", "die", "stop", "pause", "unpause", "destroy", "oom", "health_status", "connect", "disconnect"]
+RESTART_LOOP_DEATHS = 3
+RESTART_LOOP_WINDOW = 60
+RECENT_EVENT_LINES = 8
+
+STATE_LABELS = {
+    "running": "🟢 Running",
+    "created": "⚪ Created",
+    "paused": "🟡 Paused",
+    "restarting": "🟡 Restarting",
+}
+HEALTH_LABELS = {
+    "healthy": "🟢 healthy",
+    "starting": "🟡 starting",
+    "unhealthy": "🔴 unhealthy",
+}
+
+
+def network_name(project_name_urlsafe):
+    # the templates give every project a named bridge network that both compose files join
+    return f"{project_name_urlsafe}-network"
+
+
+class AcWatchedContainer:
+    '''
+    The state of one container as last reported by the event stream.
+    '''
+    def __init__(self, name, project, service, state, health=None):
+        self.name = name
+        self.project = project
+        self.service = service
+        self.state = state
+        self.health = health
+        self.restarts = 0
+        self.last_event = "-"
+        self._died = False
+        self._deaths = deque(maxlen=RESTART_LOOP_DEATHS)
+
+    @property
+    def restart_loop(self):
+        return len(self._deaths) == RESTART_LOOP_DEATHS and self._deaths[-1] - self._deaths[0] <= RESTART_LOOP_WINDOW
+
+    @property
+    def state_label(self):
+        if self.restart_loop and self.state != "running":
+            return "🔴 Restart loop"
+        return STATE_LABELS.get(self.state, "🔴 Stopped")
+
+
+class AcStatusWatch:
+    '''
+    Applies Docker events to the containers of the watched projects and describes each change.
+    '''
+    def __init__(self, project_names, network_names):
+        self.project_names = set(project_names)
+        self.network_names = set(network_names)
+        self.containers = {}
+        self.recent = deque(maxlen=RECENT_EVENT_LINES)
+
+    def load(self, containers):
+        for container in containers:
+            if container.project in self.project_names:
+                self.containers[container.container_id] = AcWatchedContainer(
+                    container.name, container.project, container.service, container.state, container.health
+                )
+
+    def filters(self):
+        # labels cannot be used to filter server-side: label filters are ANDed with the type filter and network events carry no labels
+        return {"type": ["container", "network"], "event": WATCHED_EVENTS}
+
+    def apply(self, event):
+        '''
+        Updates the watched state from one event, returning a description of the change or None if the event is not for a watched project.
+        '''
+        actor = event.get("Actor") or {}
+        attributes = actor.get("Attributes") or {}
+        action, _, detail = (event.get("Action") or "").partition(":")
+        timestamp = event["timeNano"] / 1e9 if event.get("timeNano") else event.get("time", time.time())
+
+        if event.get("Type") == "network":
+            if attributes.get("name") not in self.network_names:
+                return None
+            container = self.containers.get(attributes.get("container"))
+            description = f"network {attributes['name']}: {action}" + (f" {container.name}" if container else "")
+            return self._record(timestamp, description)
+
+        if attributes.get(COMPOSE_PROJECT_LABEL) not in self.project_names:
+            return None
+        container_id = actor.get("ID")
+        container = self.containers.get(container_id)
+        if container is None:
+            if action == "destroy":
+                return None
+            container = AcWatchedContainer(attributes.get("name", container_id), attributes[COMPOSE_PROJECT_LABEL], attributes.get(COMPOSE_SERVICE_LABEL), "created")
+            self.containers[container_id] = container
+
+        if action == "create":
+            container.state = "created"
+            description = "created"
+        elif action == "start":
+            if container._died:
+                container.restarts += 1
+            container.state = "running"
+            # a container with a healthcheck reports starting until its first check passes
+            container.health = "starting" if container.health else None
+            description = "started"
+        elif action == "health_status":
+            container.health = detail.strip()
+            description = container.health
+        elif action == "die":
+            container.state = "exited"
+            container._died = True
+            container._deaths.append(timestamp)
+            description = f"died (exit code {attributes.get('exitCode', '?')})"
+            if container.restart_loop:
+                description += f" - restart loop, {RESTART_LOOP_DEATHS} exits in {timestamp - container._deaths[0]:.0f}s"
+        elif action == "stop":
+            container.state = "exited"
+            description = "stopped"
+        elif action in ("pause", "unpause"):
+            container.state = "paused" if action == "pause" else "running"
+            description = f"{action}d"
+        elif action == "oom":
+            description = "out of memory"
+        elif action == "destroy":
+            del self.containers[container_id]
+            description = "removed"
+        else:
+            description = action
+        container.last_event = description
+        return self._record(timestamp, f"{container.name}: {description}")
+
+    def _record(self, timestamp, description):
+        line = f"{datetime.datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')} {description}"
+        self.recent.append(line)
+        return line
+
+    def render(self):
+        from rich.console import Group
+        from rich.table import Table
+        from rich.text import Text
+
+        table = Table(title="Watching docker events (ctrl+c to exit)", title_justify="left")
+        for heading in ["Name", "Service", "State", "Health", "Restarts", "Last event"]:
+            table.add_column(heading, no_wrap=heading == "Name")
+        for container in sorted(self.containers.values(), key=lambda container: container.name):
+            table.add_row(
+                container.name,
+                container.service or "-",
+                container.state_label,
+                HEALTH_LABELS.get(container.health, "-"),
+                str(container.restarts),
+                container.last_event,
+            )
+        return Group(table, *(Text(line, style="dim") for line in self.recent))
+
+
+def watch_status(projects, client=None):
+    '''
+    Shows the containers of the given projects (a mapping of project name to url-safe name) and updates them from the
+    Docker event stream as they start, become healthy, die or go into a restart loop. Runs until interrupted.
+
+    The events request blocks until the engine sends an event, so nothing runs between events. Events since the
+    containers were listed are replayed by the engine, so no change is missed between the list and the subscription.
+    '''
+    client = client or AcDockerClient()
+    watch = AcStatusWatch(projects.keys(), [network_name(urlsafe) for urlsafe in projects.values()])
+
+    listed_at = time.time_ns()
+    project_filter = next(iter(projects)) if len(projects) == 1 else None
+    watch.load(list_project_containers(project_filter, client))
+    query = {"since": str(listed_at // 1_000_000_000), "filters": json.dumps(watch.filters())}
+
+    spinner = AcOutputManager().spinner
+    live = None
+    if spinner.interactive:
+        from rich.live import Live
+
+        spinner.stop()
+        # no auto refresh: the table is redrawn only when an event arrives
+        live = Live(watch.render(), console=spinner.console, auto_refresh=False)
+        live.start(refresh=True)
+    else:
+        for container in sorted(watch.containers.values(), key=lambda container: container.name):
+            AcOutputManager.write(f"{container.name}: {container.state}" + (f" ({container.health})" if container.health else ""))
+
+    try:
+        for event in client.stream("/events", query):
+            # the since parameter has second resolution, so skip replayed events that the listing already covers
+            if event.get("timeNano", listed_at) < listed_at:
+                continue
+            line = watch.apply(event)
+            if line is None:
+                continue
+            if live:
+                live.update(watch.render(), refresh=True)
+            else:
+                AcOutputManager.write(line)
+        AcOutputManager.failed_step("The Docker event stream was closed by the engine.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if live:
+            live.stop()
+    return watch
@@ -1,24 +1,35 @@
 import platform
-import re
 import os, json, sys
 import shutil
 
-from slugify import slugify
 import arches_containers
 from enum import Enum
 import datetime
+from contextlib import contextmanager
 from arches_containers.utils.logger import AcOutputManager
+from arches_containers.utils.config_store import config_lock, atomic_write_json, atomic_write_text, LOCK_SUFFIX
+from arches_containers.utils.templates import (
+    get_template,
+    get_supported_versions,
+    adjust_platform_content,
+    materialise_project,
+    plan_upgrade,
+    read_render_manifest,
+    write_render_manifest,
+    UPGRADE_UPDATE,
+    UPGRADE_ADD,
+    UPGRADE_KEEP_LOCAL,
+    UPGRADE_CONFLICT,
+    UPGRADE_DELETED_LOCALLY,
+    UPGRADE_REMOVED_UPSTREAM,
+    UPGRADE_MERGE_STATE,
+)
 from arches_containers.utils.status import get_running_containers
+from arches_containers.utils.ports import allocate_port_offset
 
 AC_DIRECTORY_NAME = ".arches_containers"
 
 # HELPER FUNCTIONS
-def _get_ac_module_path():
-    '''
-    Returns the path to the arches-containers python module. Used to locate the template directory.
-    '''
-    return os.path.dirname(arches_containers.__file__)
-
 def _adjust_platform_lines(target_path, uncomment: bool):
     """
     Adjusts platform lines in docker-compose files.
@@ -31,27 +42,47 @@ def _adjust_platform_lines(target_path, uncomment: bool):
                 file_path = os.path.join(root, file)
                 with open(file_path, "r") as f:
                     content = f.read()
-                if uncomment:
-                    # Remove only the first '#' (and any following space) before 'platform: linux/arm64', preserving indentation
-                    new_content = re.sub(r'^(\s*)#(\s*)(platform:\s*linux/arm64)', r'\1\3', content, flags=re.MULTILINE)
-                else:
-                    # Add a '#' before 'platform: linux/arm64' if not already commented, preserving indentation
-                    new_content = re.sub(r'^(\s*)(platform:\s*linux/arm64)', r'\1#\2', content, flags=re.MULTILINE)
+                new_content = adjust_platform_content(content, uncomment)
                 if new_content != content:
                     with open(file_path, "w") as f:
                         f.write(new_content)
 
-TEMPLATE_PATH = os.path.join(_get_ac_module_path(), "template")
-REPLACE_TOKEN = "{{project}}"
-REPLACE_TOKEN_URLSAFE = "{{project_urlsafe}}"
+def _is_arm64():
+    return platform.machine() == "arm64" or platform.machine() == "aarch64"
 
 
 DEFAULT_AC_SETTINGS = {
     "active_project": "",
     "host": "localhost",
-    "port": 8002,
+    # seconds to wait for the dependency containers to report healthy when composing up
+    "dependency_timeout": 300,
+    # seconds to wait for the project service to respond once its containers are up; the first start includes the frontend build
+    "service_timeout": 1800,
+    # clone the arches repo from a user-level mirror cache shared by every workspace (see utils/repo_mirror.py)
+    "arches_repo_mirror": True,
 }
 
+def _file_signature(path):
+    '''
+    Returns a (mtime, size) signature for a file, or None if it does not exist. Used to detect when a cached config file has changed on disk.
+    '''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+@contextmanager
+def _locked_config(path):
+    '''
+    Takes the advisory lock for a config file, failing the command if it cannot be acquired in time.
+    '''
+    try:
+        with config_lock(path):
+            yield
+    except TimeoutError as e:
+        AcOutputManager.fail(f"{e}. Another arches-containers process may be updating the workspace.")
+
 # PUBLIC CLASSES
 
 class AcProjectSettings(Enum):
@@ -62,6 +93,11 @@ class AcProjectSettings(Enum):
     PROJECT_ARCHES_VERSION = "arches_version"
     PROJECT_ARCHES_REPO_ORGANIZATION = "arches_repo_organization"
     PROJECT_ARCHES_REPO_BRANCH = "arches_repo_branch"
+    PROJECT_ARCHES_REPO_WORKTREE = "arches_repo_worktree"
+    PROJECT_SERVER_WORKERS = "server_workers"
+    PROJECT_SERVER_THREADS = "server_threads"
+    PROJECT_DEBUGPY = "debugpy"
+    PROJECT_PORT_OFFSET = "port_offset"
 
 class AcProject:
     '''
@@ -73,9 +109,11 @@ class AcProject:
         self._path = os.path.join(ac_directory_path, project_name) 
         self._config_path = os.path.join(self._path, "config.json")
         self.project_name = project_name
+        self._signature = None
+        # keys changed since the last save, re-applied on top of the latest file contents when saving
+        self._changes = {}
         try:
-            with open(self._config_path, "r") as config_file:
-                self._config = json.load(config_file)
+            self._load()
         except FileNotFoundError:
             AcOutputManager.fail(f"Project configuration for '{project_name}' not found.")
             exit(1)
@@ -85,10 +123,35 @@ class AcProject:
 
     def __setitem__(self, key, value):
         self._config[key] = value
+        self._changes[key] = value
+
+    def get(self, key, default=None):
+        return self._config.get(key, default)
+
+    def _load(self):
+        with open(self._config_path, "r") as config_file:
+            self._config = json.load(config_file)
+        self._signature = _file_signature(self._config_path)
+
+    def is_stale(self):
+        '''
+        Returns True if the config file has changed on disk since it was last read or written.
+        '''
+        return _file_signature(self._config_path) != self._signature
+
+    def reload(self):
+        self._load()
+        self._config.update(self._changes)
 
     def save(self):
-        with open(self._config_path, "w") as config_file:
-            json.dump(self._config, config_file, indent=4)
+        '''
+        Saves changed keys as a locked read-modify-write, so edits made by other processes since the config was loaded are kept.
+        '''
+        with _locked_config(self._config_path):
+            self.reload()
+            atomic_write_json(self._config_path, self._config)
+            self._signature = _file_signature(self._config_path)
+            self._changes = {}
 
     def get_project_path(self):
         return self._path
@@ -102,58 +165,72 @@ class AcSettings:
     def __init__(self, workspace):
         self._workspace = workspace
         self._config_path = os.path.join(self._workspace._get_ac_directory_path(), "settings.json")
+        self._settings = None
+        self._signature = None
 
     @property
     def settings(self):
         return self._load_settings()
 
-    def _load_settings(self):
-        settings_path = os.path.join(self._workspace._get_ac_directory_path(), "settings.json")
-        if os.path.exists(settings_path):
-            with open(settings_path, "r") as settings_file:
-                # if settings file is empty, return default settings
-                if os.stat(settings_path).st_size == 0:
-                    return DEFAULT_AC_SETTINGS
-                
-                # if any settigns are missing, add them
+    def _load_settings(self, force=False):
+        '''
+        Returns the settings, only re-reading settings.json when it has changed on disk since it was last read or written.
+        '''
+        signature = _file_signature(self._config_path)
+        if not force and self._settings is not None and signature == self._signature:
+            return self._settings
+
+        if signature is None or signature[1] == 0:
+            # if settings file is missing or empty, return default settings
+            settings = dict(DEFAULT_AC_SETTINGS)
+        else:
+            with open(self._config_path, "r") as settings_file:
                 settings = json.load(settings_file)
-                missing_settings = False
-                for key in DEFAULT_AC_SETTINGS:
-                    if key not in settings:
-                        settings[key] = DEFAULT_AC_SETTINGS[key]
-                        missing_settings = True
 
-                if missing_settings:
-                    self.save_settings(settings)
+            # settings added since the file was written take their defaults in memory only; writing them back here would be an
+            # unlocked read-modify-write, so they reach the file with the next update_settings
+            for key, value in DEFAULT_AC_SETTINGS.items():
+                settings.setdefault(key, value)
 
-                return settings
-        else:
-            return DEFAULT_AC_SETTINGS
+        self._settings = settings
+        self._signature = signature
+        return settings
     
     def save_settings(self, settings):
-        with open(self._config_path, "w") as settings_file:
-            json.dump(settings, settings_file, indent=4)
+        atomic_write_json(self._config_path, settings)
+        self._settings = settings
+        self._signature = _file_signature(self._config_path)
+
+    def update_settings(self, changes):
+        '''
+        Applies changes to settings.json as a locked read-modify-write so concurrent processes do not overwrite each other's edits.
+        '''
+        with _locked_config(self._config_path):
+            settings = dict(self._load_settings(force=True))
+            settings.update(changes)
+            self.save_settings(settings)
+        return settings
 
     def set_active_project(self, project_name):
         if project_name not in self._workspace.list_projects():
             AcOutputManager.fail(f"Project '{project_name}' does not exist.")
             exit(1)
-        settings = self.settings
-        settings["active_project"] = project_name
-        self.save_settings(settings)
+        self.update_settings({"active_project": project_name})
 
     def get_active_project(self) -> AcProject:
         '''
         Returns the active project configuration. 
         '''
-        if self.settings["active_project"] == "":
+        active_project_name = self.settings["active_project"]
+        if active_project_name == "":
             try:
-                self.set_active_project(self._workspace.list_projects()[0])
+                active_project_name = self._workspace.list_projects()[0]
+                self.set_active_project(active_project_name)
             except IndexError:
                 AcOutputManager.fail("No active project found. Provide a project name or run 'arches-containers create' to create a new project.")
                 return None
         
-        active_project = self._workspace.get_project(self.settings["active_project"])
+        active_project = self._workspace.get_project(active_project_name)
         if active_project is None:
             AcOutputManager.fail("No active project found. Provide a project name or run 'arches-containers create' to create a new project.")
             return None
@@ -176,13 +253,14 @@ class AcSettings:
         return os.path.join(str(self._workspace), "settings.json")
     
     def clear_active_project(self):
-        settings = self.settings
-        settings["active_project"] = ""
-        self.save_settings(settings)
+        self.update_settings({"active_project": ""})
 
 class AcWorkspace:
     def __init__(self):
         self._path = self._get_ac_workspace()
+        self._settings = None
+        # identity map of loaded project configurations, keyed by project name
+        self._projects = {}
 
     def __str__(self):
         return self._path
@@ -220,21 +298,13 @@ class AcWorkspace:
         '''
         return os.path.join(self._path, AC_DIRECTORY_NAME)
 
-    def _get_template_folder(self, version):
-        version = f"_{version.lower()}_"
-        root_dir = TEMPLATE_PATH
-        for dirpath, dirnames, filenames in os.walk(root_dir):
-            for dirname in dirnames:
-                if version in dirname:
-                    return os.path.join(dirpath, dirname)
-        return None
-
     def _get_urlsafe_project_name(self, project_name):
+        from slugify import slugify
+
         return slugify(text=project_name, separator="")
 
     def _create_proj_directory(self, project_name, version):
-        template_folder = self._get_template_folder(version)
-        if template_folder is None:
+        if get_template(version) is None:
             AcOutputManager.fail(f"Arches version {version} not supported.")
             exit(1)
         
@@ -243,12 +313,8 @@ class AcWorkspace:
             AcOutputManager.fail(f"Project {project_name} already exists.")
             exit(1)
 
-        shutil.copytree(template_folder, target_path)
-        self._replace_projectname_placeholder(project_name, target_path)
-
-        # Adjust platform lines for arm64
-        if platform.machine() == "arm64" or platform.machine() == "aarch64":
-            _adjust_platform_lines(target_path, uncomment=True)
+        # Render the template in a single pass, uncommenting platform lines for arm64
+        materialise_project(version, target_path, project_name, self._get_urlsafe_project_name(project_name), arm64=_is_arm64())
         
         ac_settings = self.get_settings()
         
@@ -256,33 +322,42 @@ class AcWorkspace:
             ac_settings.set_active_project(project_name)
         return target_path
         
-    def _replace_projectname_placeholder(self,project_name, target_path):
-        for dname, dirs, files in os.walk(target_path):
-            for fname in files:
-                fpath = os.path.join(dname, fname)
-                with open(fpath) as f:
-                    s = f.read()
-                s = s.replace(REPLACE_TOKEN, project_name)
-                s = s.replace(REPLACE_TOKEN_URLSAFE, self._get_urlsafe_project_name(project_name))
-                with open(fpath, "w") as f:
-                    f.write(s)
-
     # PUBLIC METHODS
     def get_project(self, project_name) -> AcProject:
+        '''
+        Returns the project configuration. The same AcProject instance is returned for repeated calls and is only re-read when its config file changes on disk.
+        '''
+        project = self._projects.get(project_name)
+        if project is not None:
+            if project.is_stale():
+                if not os.path.exists(project._config_path):
+                    del self._projects[project_name]
+                    AcOutputManager.fail(f"Project '{project_name}' not found.")
+                    exit(1)
+                project.reload()
+            return project
+
         try:
-            return AcProject(project_name, self._get_ac_directory_path())
+            project = AcProject(project_name, self._get_ac_directory_path())
         except FileNotFoundError:
             AcOutputManager.fail(f"Project '{project_name}' not found.")
             exit(1)
+        self._projects[project_name] = project
+        return project
 
     def create_project(self, project_name, args):
         '''
         Creates a new project directory.
         '''
 
+        from slugify import slugify
+
         if project_name is None or project_name == "":
             AcOutputManager.fail("Project name is required.")
 
+        if get_template(args.version) is None:
+            AcOutputManager.fail(f"Arches version {args.version} not supported. Supported versions: {', '.join(get_supported_versions())}.")
+
         # the project must be a valid slug where the only allowed characters are letters, numbers, and underscores. It must start with a letter. it must be lowercase.
         # create a function to slugify the project name
         project_name = slugify(text=project_name, separator="_")
@@ -294,13 +369,87 @@ class AcWorkspace:
             project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value] = args.organization
         if args.branch:
             project[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value] = args.branch
+        # publish the project's containers on host ports no other project in the workspace uses, so projects can run side by side
+        port_offset = allocate_port_offset(self.get_port_offsets(exclude=project_name).values())
+        if port_offset:
+            project[AcProjectSettings.PROJECT_PORT_OFFSET.value] = port_offset
         
-        if args.organization or args.branch:
+        if args.organization or args.branch or port_offset:
             project.save()
         
         AcOutputManager.success(f"Project '{project_name}' created successfully.")
         return project
     
+    def upgrade_project(self, project_name, dry_run=False, force=False):
+        '''
+        Re-renders the project's template and rewrites only the files that changed upstream and were not edited locally.
+
+        Files changed both upstream and locally are reported as conflicts and left alone unless force is set,
+        in which case the local file is kept alongside as <file>.orig. Returns the list of conflicting files.
+        '''
+        project = self.get_project(project_name)
+        project_path = project.get_project_path()
+        version = project[AcProjectSettings.PROJECT_ARCHES_VERSION.value]
+        if get_template(version) is None:
+            AcOutputManager.fail(f"Arches version {version} not supported.")
+
+        with _locked_config(project._config_path):
+            plan = plan_upgrade(project_path, version, project_name, project[AcProjectSettings.PROJECT_NAME_URLSAFE.value], arm64=_is_arm64())
+            render_manifest = read_render_manifest(project_path) or {}
+            hashes = dict(render_manifest.get("files", {}))
+            conflicts = []
+            changed = 0
+            for step in plan:
+                file_path = os.path.join(project_path, *step.relative_path.split("/"))
+                if step.action == UPGRADE_MERGE_STATE:
+                    # only add keys introduced by the template, never overwrite project state
+                    template_config = json.loads(step.content)
+                    missing = [key for key in template_config if key not in project._config]
+                    for key in missing:
+                        AcOutputManager.complete_step(f"{step.relative_path}: added setting '{key}'")
+                        if not dry_run:
+                            project[key] = template_config[key]
+                    if missing and not dry_run:
+                        project.save()
+                    changed += len(missing)
+                    hashes[step.relative_path] = step.rendered_hash
+                elif step.action in (UPGRADE_UPDATE, UPGRADE_ADD) or (step.action == UPGRADE_CONFLICT and force):
+                    if step.action == UPGRADE_CONFLICT:
+                        AcOutputManager.skipped_step(f"{step.relative_path}: overwriting local changes (kept as {step.relative_path}.orig)")
+                        if not dry_run:
+                            shutil.copy2(file_path, f"{file_path}.orig")
+                    else:
+                        AcOutputManager.complete_step(f"{step.relative_path}: {'added' if step.action == UPGRADE_ADD else 'updated'}")
+                    if not dry_run:
+                        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                        atomic_write_text(file_path, step.content)
+                        os.chmod(file_path, step.mode)
+                    hashes[step.relative_path] = step.rendered_hash
+                    changed += 1
+                elif step.action == UPGRADE_CONFLICT:
+                    AcOutputManager.failed_step(f"{step.relative_path}: conflict - changed upstream and locally")
+                    conflicts.append(step.relative_path)
+                elif step.action == UPGRADE_DELETED_LOCALLY:
+                    AcOutputManager.skipped_step(f"{step.relative_path}: deleted locally, not restored")
+                elif step.action == UPGRADE_REMOVED_UPSTREAM:
+                    AcOutputManager.skipped_step(f"{step.relative_path}: no longer in the template, left in place")
+                    hashes.pop(step.relative_path, None)
+                else:
+                    # unchanged, or only edited locally
+                    if step.action == UPGRADE_KEEP_LOCAL:
+                        AcOutputManager.write(f"... ℹ️ {step.relative_path}: keeping local changes")
+                    hashes[step.relative_path] = step.rendered_hash
+
+            if not dry_run:
+                write_render_manifest(project_path, version, hashes)
+
+        summary = f"{changed} file(s) {'would be ' if dry_run else ''}updated, {len(conflicts)} conflict(s)."
+        if conflicts:
+            AcOutputManager.write(f"... ℹ️ {summary} Resolve conflicts manually or re-run with --force.")
+        else:
+            AcOutputManager.complete_step(summary)
+        return conflicts
+
     def delete_project(self, project_name):
         '''
         Deletes a project directory.
@@ -314,6 +463,7 @@ class AcWorkspace:
 
         project_path = project.get_project_path()
         shutil.rmtree(project_path)
+        self._projects.pop(project_name, None)
 
         AcOutputManager.success(f"Project {project_name} deleted.")
 
@@ -322,13 +472,27 @@ class AcWorkspace:
         Returns a list of all projects in the .arches-containers directory.
         '''
         context = self._get_ac_directory_path()
-        return [name for name in os.listdir(context) if os.path.isdir(os.path.join(context, name))]
+        # hidden directories hold in-progress renders and other workspace state, not projects
+        return [name for name in os.listdir(context) if not name.startswith(".") and os.path.isdir(os.path.join(context, name))]
+
+    def get_port_offsets(self, exclude=None):
+        '''
+        Returns the port offset of every project in the workspace that has a config file, by project name.
+        '''
+        context = self._get_ac_directory_path()
+        return {
+            name: self.get_project(name).get(AcProjectSettings.PROJECT_PORT_OFFSET.value)
+            for name in self.list_projects()
+            if name != exclude and os.path.exists(os.path.join(context, name, "config.json"))
+        }
 
     def get_settings(self):
         '''
         Returns the AcSettings object.
         '''
-        return AcSettings(self)
+        if self._settings is None:
+            self._settings = AcSettings(self)
+        return self._settings
 
     def export_project(self, project_name, repo_path):
         '''
@@ -360,6 +524,8 @@ class AcWorkspace:
             os.makedirs(ac_repo_path)
         
         for item in os.listdir(project_path):
+            if item.endswith(LOCK_SUFFIX):
+                continue
             s = os.path.join(project_path, item)
             d = os.path.join(ac_repo_path, item)
             if os.path.isdir(s):
@@ -422,7 +588,7 @@ class AcWorkspace:
                         f.write(content)
                         f.truncate()
         # Adjust platform lines for arm64
-        if platform.machine() == "arm64" or platform.machine() == "aarch64":
+        if _is_arm64():
             _adjust_platform_lines(project_path, uncomment=True)
         AcOutputManager.success(f"Project {project_name} imported from {ac_repo_path}.")
 
@@ -0,0 +1,72 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import socketserver
+import urllib.parse
+import pytest
+from http.server import BaseHTTPRequestHandler
+
+
+class FakeDockerEngine:
+    """
+    A fake Docker Engine listening on a unix socket. Routes map a request path to a JSON response,
+    a callable taking the parsed query, or a list of objects to stream one per line.
+    """
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.routes = {}
+        self.requests = []
+
+    @property
+    def docker_host(self):
+        return f"unix://{self.socket_path}"
+
+
+@pytest.fixture
+def fake_docker():
+    # unix socket paths are limited to ~100 characters, so use a short temporary directory rather than tmp_path
+    directory = tempfile.mkdtemp(prefix="ac-docker-")
+    engine = FakeDockerEngine(os.path.join(directory, "docker.sock"))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urllib.parse.urlparse(self.path)
+            query = {key: values[0] for key, values in urllib.parse.parse_qs(parsed.query).items()}
+            engine.requests.append((parsed.path, query))
+            route = engine.routes.get(parsed.path)
+            if route is None:
+                self._send(404, {"message": f"no such route {parsed.path}"})
+            elif isinstance(route, list):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                for item in route:
+                    self.wfile.write(json.dumps(item).encode() + b"\n")
+                    self.wfile.flush()
+            else:
+                self._send(200, route(query) if callable(route) else route)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            return "fake-docker"
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingUnixStreamServer(engine.socket_path, Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield engine
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory, ignore_errors=True)
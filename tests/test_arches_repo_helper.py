@@ -1,7 +1,9 @@
 import os
+import shutil
+import subprocess
 import pytest
 from unittest.mock import patch, MagicMock
-from arches_containers.utils.arches_repo_helper import _get_repo_info
+from arches_containers.utils.arches_repo_helper import _get_repo_info, change_arches_branch, is_on_branch
 
 @pytest.fixture
 def mock_workspace():
@@ -32,6 +34,98 @@ def test_get_repo_info(mock_workspace, mock_project_settings):
     assert clone_dir == os.path.join(mock_workspace_instance.path, "arches")
     assert branch == "main"
     
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout.strip()
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    '''
+    A workspace with a shared arches clone that has master and dev/7.5.x branches and an origin-only dev/7.6.x branch.
+    '''
+    for variable, value in [("GIT_AUTHOR_NAME", "Test"), ("GIT_COMMITTER_NAME", "Test"), ("GIT_AUTHOR_EMAIL", "test@example.com"), ("GIT_COMMITTER_EMAIL", "test@example.com")]:
+        monkeypatch.setenv(variable, value)
+    upstream = tmp_path / "upstream"
+    git("init", "-q", "-b", "master", str(upstream))
+    (upstream / "setup.py").write_text("master")
+    git("add", ".", cwd=str(upstream))
+    git("commit", "-q", "-m", "initial", cwd=str(upstream))
+    for branch in ["dev/7.5.x", "dev/7.6.x"]:
+        git("checkout", "-q", "-b", branch, "master", cwd=str(upstream))
+        (upstream / "setup.py").write_text(branch)
+        git("commit", "-q", "-am", branch, cwd=str(upstream))
+    git("clone", "-q", "-b", "master", str(upstream), str(tmp_path / "arches"))
+    git("branch", "-q", "dev/7.5.x", "origin/dev/7.5.x", cwd=str(tmp_path / "arches"))
+    return tmp_path
+
+def change_branch(workspace, project_name, branch, worktree=True):
+    project = {"arches_repo_worktree": worktree} if worktree is not None else {}
+    with patch("arches_containers.utils.arches_repo_helper._get_repo_info", return_value=(project, "", str(workspace / "arches"), branch)), \
+         patch("arches_containers.utils.arches_repo_helper.AcOutputManager") as mock_manager:
+        change_arches_branch(project_name, session=MagicMock())
+    mock_manager.fail.assert_not_called()
+    return mock_manager
+
+def test_each_project_gets_its_own_worktree(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x")
+    change_branch(workspace, "project_b", "dev/7.6.x")
+
+    assert (workspace / "project_a-arches" / "setup.py").read_text() == "dev/7.5.x"
+    assert (workspace / "project_b-arches" / "setup.py").read_text() == "dev/7.6.x"
+    # the shared clone is left alone
+    assert git("symbolic-ref", "--short", "HEAD", cwd=str(workspace / "arches")) == "master"
+
+def test_checkout_is_skipped_when_already_on_the_branch(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x")
+    setup_py = workspace / "project_a-arches" / "setup.py"
+    modified = setup_py.stat().st_mtime_ns
+
+    with patch("arches_containers.utils.arches_repo_helper.subprocess.run", wraps=subprocess.run) as mock_run:
+        mock_manager = change_branch(workspace, "project_a", "dev/7.5.x")
+
+    assert not any("checkout" in call.args[0] or "worktree" in call.args[0] for call in mock_run.call_args_list)
+    mock_manager.complete_step.assert_called_once_with("Arches repo already on dev/7.5.x")
+    assert setup_py.stat().st_mtime_ns == modified
+
+def test_branch_checked_out_elsewhere_is_detached(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x")
+    change_branch(workspace, "project_b", "dev/7.5.x")
+
+    worktree_b = str(workspace / "project_b-arches")
+    assert git("rev-parse", "HEAD", cwd=worktree_b) == git("rev-parse", "dev/7.5.x", cwd=str(workspace / "arches"))
+    assert subprocess.run(["git", "symbolic-ref", "-q", "HEAD"], cwd=worktree_b).returncode != 0
+    assert is_on_branch(worktree_b, "dev/7.5.x")
+
+def test_worktree_switches_branch(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x")
+    change_branch(workspace, "project_a", "dev/7.6.x")
+
+    assert (workspace / "project_a-arches" / "setup.py").read_text() == "dev/7.6.x"
+    assert git("symbolic-ref", "--short", "HEAD", cwd=str(workspace / "project_a-arches")) == "dev/7.6.x"
+
+def test_deleted_worktree_is_recreated(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x")
+    shutil.rmtree(workspace / "project_a-arches")
+
+    change_branch(workspace, "project_a", "dev/7.5.x")
+
+    assert (workspace / "project_a-arches" / "setup.py").read_text() == "dev/7.5.x"
+
+def test_fresh_clone_on_the_branch_is_still_checked_out(workspace):
+    # the shared clone is made with --no-checkout, which leaves HEAD on the remote default branch and the tree empty
+    shutil.rmtree(workspace / "arches")
+    git("clone", "-q", "--no-checkout", "-b", "master", str(workspace / "upstream"), str(workspace / "arches"))
+
+    change_branch(workspace, "project_a", "master", worktree=None)
+
+    assert (workspace / "arches" / "setup.py").read_text() == "master"
+
+def test_projects_without_the_setting_use_the_shared_clone(workspace):
+    change_branch(workspace, "project_a", "dev/7.5.x", worktree=None)
+
+    assert not (workspace / "project_a-arches").exists()
+    assert git("symbolic-ref", "--short", "HEAD", cwd=str(workspace / "arches")) == "dev/7.5.x"
+
 import unittest
 from unittest.mock import patch, MagicMock
 from arches_containers.utils.arches_repo_helper import _get_repo_info
@@ -0,0 +1,112 @@
+import os
+import json
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+from arches_containers.utils.base_image import AcBaseImageError, uses_base_image, prepare_base_context, list_base_images, prune_base_images
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout.strip()
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    '''
+    A local "upstream" repo with a dev/7.6.x branch, mirrored into a temporary cache directory.
+    '''
+    for variable in ["GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"]:
+        monkeypatch.setenv(variable, "Test")
+    for variable in ["GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"]:
+        monkeypatch.setenv(variable, "test@example.com")
+    monkeypatch.setenv("AC_CACHE_DIR", str(tmp_path / "cache"))
+    work_dir = tmp_path / "upstream-work"
+    git("init", "-q", "-b", "dev/7.6.x", str(work_dir))
+    (work_dir / "pyproject.toml").write_text("[project]\ndependencies = [\"django\"]\n")
+    (work_dir / "arches").mkdir()
+    (work_dir / "arches" / "__init__.py").write_text("")
+    git("add", ".", cwd=work_dir)
+    git("commit", "-q", "-m", "arches 7.6", cwd=work_dir)
+    # the mirror is cloned from the local repo rather than GitHub
+    with patch("arches_containers.utils.base_image.update_mirror", side_effect=lambda url, mirror_dir, verbose: git("clone", "-q", "--mirror", str(work_dir), mirror_dir)):
+        yield work_dir
+
+def docker_result(stdout="", returncode=0):
+    return MagicMock(returncode=returncode, stdout=stdout, stderr="")
+
+def test_uses_base_image(tmp_path):
+    assert not uses_base_image(str(tmp_path))
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11-slim\n")
+    assert not uses_base_image(str(tmp_path))
+    (tmp_path / "Dockerfile").write_text("ARG BASE_IMAGE=arches-containers/base:7.6\nFROM ${BASE_IMAGE}\n")
+    assert uses_base_image(str(tmp_path))
+
+def test_prepare_base_context_exports_only_the_dependency_manifests(mirror, tmp_path):
+    context_dir = tmp_path / "context"
+
+    dockerfile, source = prepare_base_context("7.6", str(context_dir))
+
+    assert os.path.basename(dockerfile) == "Dockerfile.base"
+    assert os.path.basename(os.path.dirname(dockerfile)) == "_7.6_"
+    assert source == "archesproject/dev/7.6.x"
+    assert os.listdir(context_dir) == ["pyproject.toml"]
+    assert "django" in (context_dir / "pyproject.toml").read_text()
+
+def test_prepare_base_context_fails_without_dependency_manifests(mirror, tmp_path):
+    git("checkout", "-q", "--orphan", "docs", cwd=mirror)
+    git("rm", "-q", "-r", "--cached", ".", cwd=mirror)
+    (mirror / "README.md").write_text("docs")
+    git("add", "README.md", cwd=mirror)
+    git("commit", "-q", "-m", "docs", cwd=mirror)
+
+    with pytest.raises(AcBaseImageError, match="No dependency manifests found on archesproject/docs"):
+        prepare_base_context("7.6", str(tmp_path / "context"), branch="docs")
+    with pytest.raises(AcBaseImageError, match="not supported"):
+        prepare_base_context("5.0", str(tmp_path / "context"))
+
+def test_list_base_images_sorts_by_version_and_skips_untagged():
+    images = [
+        {"Tag": "7.6", "ID": "b", "CreatedSince": "1 hour ago", "Size": "2GB"},
+        {"Tag": "<none>", "ID": "c"},
+        {"Tag": "7.10", "ID": "d"},
+        {"Tag": "6.2", "ID": "a"},
+    ]
+    with patch("arches_containers.utils.base_image.subprocess.run", return_value=docker_result("\n".join(json.dumps(image) for image in images))):
+        listed = list_base_images()
+
+    assert [image["version"] for image in listed] == ["6.2", "7.6", "7.10"]
+    assert listed[1] == {"version": "7.6", "id": "b", "created": "1 hour ago", "size": "2GB"}
+
+def test_prune_keeps_the_versions_in_use():
+    listing = "\n".join(json.dumps({"Tag": version, "ID": version}) for version in ["6.2", "7.5", "7.6"])
+
+    def run(command, **kwargs):
+        if command[:3] == ["docker", "image", "ls"]:
+            return docker_result(listing)
+        # the 6.2 image is still used by a stopped container
+        return docker_result(returncode=1 if command[-1].endswith(":6.2") else 0)
+
+    with patch("arches_containers.utils.base_image.subprocess.run", side_effect=run) as mock_run:
+        removed, failed = prune_base_images({"7.6"})
+
+    assert removed == ["arches-containers/base:7.5"]
+    assert failed == ["arches-containers/base:6.2"]
+    assert mock_run.call_args.args[0][:4] == ["docker", "image", "prune", "--force"]
+
+def test_prune_all_removes_the_versions_in_use_too():
+    listing = json.dumps({"Tag": "7.6", "ID": "a"})
+    with patch("arches_containers.utils.base_image.subprocess.run", side_effect=lambda command, **kwargs: docker_result(listing if command[2] == "ls" else "")):
+        removed, _ = prune_base_images({"7.6"}, remove_all=True)
+
+    assert removed == ["arches-containers/base:7.6"]
+
+def test_images_prune_keeps_the_versions_of_workspace_projects():
+    import sys
+    from arches_containers.main import main
+    with patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager"), \
+         patch("arches_containers.utils.base_image.prune_base_images", return_value=([], [])) as mock_prune:
+        mock_workspace.return_value.list_projects.return_value = ["demo", "legacy"]
+        mock_workspace.return_value.get_project.side_effect = lambda name: {"demo": {"arches_version": "7.6"}, "legacy": {"arches_version": "7.5"}}[name]
+        sys.argv = ["arches-containers", "images", "prune"]
+        main()
+
+    assert mock_prune.call_args.args == ({"7.6", "7.5"}, False, False)
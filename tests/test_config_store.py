@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import threading
+import subprocess
+import pytest
+from arches_containers.utils.config_store import config_lock, atomic_write_json, atomic_write_text
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_atomic_write_json_replaces_file(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text('{"old": true}')
+
+    atomic_write_json(str(path), {"new": True})
+
+    assert json.loads(path.read_text()) == {"new": True}
+    assert os.listdir(tmp_path) == ["settings.json"]
+
+def test_atomic_write_failure_leaves_original_intact(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text('{"old": true}')
+
+    with pytest.raises(TypeError):
+        atomic_write_json(str(path), {"bad": object()})
+
+    assert json.loads(path.read_text()) == {"old": True}
+    assert os.listdir(tmp_path) == ["settings.json"]
+
+def test_atomic_write_text_preserves_mode(tmp_path):
+    path = tmp_path / "entrypoint.sh"
+    path.write_text("#!/bin/bash\n")
+    os.chmod(path, 0o755)
+
+    atomic_write_text(str(path), "#!/bin/bash\necho hi\n")
+
+    assert os.stat(path).st_mode & 0o777 == 0o755
+
+def test_config_lock_is_reentrant(tmp_path):
+    path = str(tmp_path / "settings.json")
+    with config_lock(path, timeout=0.5):
+        with config_lock(path, timeout=0.5):
+            pass
+
+def test_config_lock_times_out_when_contended(tmp_path):
+    path = str(tmp_path / "settings.json")
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold_lock():
+        with config_lock(path):
+            acquired.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    acquired.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            with config_lock(path, timeout=0.2):
+                pass
+    finally:
+        release.set()
+        holder.join()
+
+    # once released the lock can be taken again
+    with config_lock(path, timeout=0.5):
+        pass
+
+def test_parallel_processes_do_not_lose_settings_updates(tmp_path):
+    (tmp_path / ".arches_containers").mkdir()
+    code = (
+        "import sys\n"
+        "from arches_containers.utils.workspace import AcWorkspace\n"
+        "settings = AcWorkspace().get_settings()\n"
+        "for i in range(10):\n"
+        "    settings.update_settings({f'worker_{sys.argv[1]}_{i}': i})\n"
+    )
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+    workers = [
+        subprocess.Popen([sys.executable, "-c", code, str(n)], cwd=tmp_path, env=env)
+        for n in range(6)
+    ]
+    assert all(worker.wait(60) == 0 for worker in workers)
+
+    with open(tmp_path / ".arches_containers" / "settings.json") as f:
+        settings = json.load(f)
+    for n in range(6):
+        for i in range(10):
+            assert settings[f"worker_{n}_{i}"] == i
+    assert settings["host"] == "localhost"
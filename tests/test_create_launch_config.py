@@ -2,11 +2,13 @@ import os
 import json
 import pytest
 from unittest.mock import patch, mock_open, MagicMock
-from arches_containers.utils.create_launch_config import create_launch_config
+from arches_containers.utils.create_launch_config import create_launch_config, launch_config, generate_launch_config
 
 @pytest.fixture
 def mock_workspace():
     with patch('arches_containers.utils.create_launch_config.AcWorkspace') as MockAcWorkspace:
+        # an active project with every setting at its default
+        MockAcWorkspace.return_value.get_settings.return_value.get_active_project.return_value.get.side_effect = lambda key, default=None: default
         yield MockAcWorkspace
 
 @pytest.fixture
@@ -114,4 +116,38 @@ def test_create_launch_config_vscode_dir_exists(mock_workspace, mock_os_path_exi
     # Second call: should override
     create_launch_config()
     mock_open_file().write.assert_called()
-    assert mock_open_file().write.call_count > 1
\ No newline at end of file
+    assert mock_open_file().write.call_count > 1
+def test_launch_config_maps_the_project_worktree():
+    config = launch_config("my_project-arches")
+
+    assert config["pathMappings"] == [
+        {"localRoot": "${workspaceFolder}/my_project-arches", "remoteRoot": "/web_root/arches"},
+        {"localRoot": "${workspaceFolder}", "remoteRoot": "/web_root"},
+    ]
+    assert len(launch_config()["pathMappings"]) == 1
+
+def test_generate_launch_config_toggles_the_debug_listener(mock_workspace):
+    project = MagicMock(project_name="demo")
+    mock_workspace.return_value.get_settings.return_value.get_active_project.return_value = project
+    with patch("arches_containers.utils.create_launch_config.create_launch_config") as mock_create, \
+         patch("arches_containers.utils.create_launch_config.AcOutputManager"):
+        generate_launch_config(debug=True)
+        project.__setitem__.assert_called_once_with("debugpy", True)
+        project.save.assert_called_once()
+
+        project.reset_mock()
+        generate_launch_config()
+        project.__setitem__.assert_not_called()
+
+    assert mock_create.call_count == 2
+
+def test_launch_config_attaches_to_the_debugpy_port_of_the_active_project(mock_workspace, tmp_path):
+    mock_workspace.return_value.path = str(tmp_path)
+    settings = {"port_offset": 2}
+    mock_workspace.return_value.get_settings.return_value.get_active_project.return_value.get.side_effect = lambda key, default=None: settings.get(key, default)
+
+    create_launch_config()
+
+    with open(tmp_path / ".vscode" / "launch.json") as f:
+        assert json.load(f)["configurations"][0]["connect"] == {"host": "localhost", "port": 5680}
+    assert launch_config()["connect"]["port"] == 5678
@@ -0,0 +1,294 @@
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from arches_containers.manage import compose_project, wait_for_project_service, build_up_pipeline, up_project, init_project, build_project, _restart_changed_services, _ensure_base_image, write_server_env
+
+@pytest.fixture
+def mock_session(tmp_path):
+    session = MagicMock()
+    session.workspace.get_project.return_value.get_project_path.return_value = str(tmp_path)
+    session.workspace.get_project.return_value.__getitem__.side_effect = {"project_name_url_safe": "demo", "arches_version": "7.6"}.get
+    session.workspace.get_project.return_value.get.return_value = None
+    session.workspace.get_settings.return_value.settings = {"dependency_timeout": 120, "host": "localhost"}
+    return session
+
+@pytest.fixture
+def mock_run():
+    with patch("arches_containers.manage.subprocess.run") as mock_run, \
+         patch("arches_containers.manage.AcOutputManager"):
+        mock_run.return_value.returncode = 0
+        yield mock_run
+
+def test_up_waits_for_dependency_health_instead_of_sleeping(mock_session, mock_run):
+    compose_project("demo", "up", container_type="dep", session=mock_session)
+
+    commands = [call.args[0] for call in mock_run.call_args_list]
+    assert len(commands) == 1
+    assert commands[0][3].endswith("docker-compose-dependencies.yml")
+    assert commands[0][4:] == ["up", "-d", "--wait", "--wait-timeout", "120"]
+    assert mock_run.call_args.kwargs["cwd"] == mock_session.workspace.get_project.return_value.get_project_path.return_value
+
+def test_up_starts_app_after_healthy_dependencies(mock_session, mock_run):
+    with patch("arches_containers.manage.wait_for_project_service"):
+        compose_project("demo", "up", build=True, session=mock_session)
+
+    commands = [call.args[0] for call in mock_run.call_args_list]
+    assert ["sleep", "15"] not in commands
+    # images are built as their own step before each compose up
+    assert [command[4] for command in commands] == ["build", "up", "build", "up"]
+    assert commands[1][3].endswith("docker-compose-dependencies.yml") and "--wait" in commands[1]
+    assert commands[3][3].endswith("docker-compose.yml") and "--wait" not in commands[3]
+
+def test_down_does_not_wait(mock_session, mock_run):
+    compose_project("demo", "down", session=mock_session)
+
+    assert all("--wait" not in call.args[0] for call in mock_run.call_args_list)
+
+def test_wait_for_project_service_fails_when_not_ready(mock_session):
+    from arches_containers.utils.readiness import AcReadinessResult
+    mock_session.workspace.get_settings.return_value.settings["service_timeout"] = 30
+    result = AcReadinessResult(False, 502, 3.0, None, 30.0, 6, "not ready after 30s")
+    with patch("arches_containers.utils.readiness.wait_for_service", return_value=result) as mock_wait, \
+         patch("arches_containers.manage.AcOutputManager") as mock_output:
+        wait_for_project_service("demo", mock_session)
+
+    assert mock_wait.call_args.args == ("http://localhost:8002/", 30)
+    mock_output.fail.assert_called_once()
+    assert "HTTP 502" in mock_output.fail.call_args.args[0]
+
+def test_up_pipeline_overlaps_repo_sync_and_build_with_dependencies(mock_session, tmp_path):
+    for compose_file in ["docker-compose.yml", "docker-compose-dependencies.yml"]:
+        (tmp_path / compose_file).write_text("services: {}")
+
+    pipeline = build_up_pipeline("demo", build=True, session=mock_session)
+
+    graph = {name: task.depends_on for name, task in pipeline.tasks.items()}
+    # the dependencies do not wait for the repo and the app image builds while they start
+    assert graph["repo_sync"] == []
+    assert graph["dependencies_up"] == ["build_dependencies"]
+    assert graph["base_image"] == []
+    assert sorted(graph["build_app"]) == ["base_image", "repo_sync"]
+    assert sorted(graph["app_up"]) == ["base_image", "build_app", "dependencies_up", "repo_sync"]
+    assert graph["service_ready"] == ["app_up"]
+
+def test_full_restart_pipeline_brings_everything_down_first(mock_session):
+    pipeline = build_up_pipeline("demo", session=mock_session, restart=True, full=True)
+
+    graph = {name: task.depends_on for name, task in pipeline.tasks.items()}
+    assert graph["app_down"] == []
+    assert graph["dependencies_down"] == ["app_down"]
+    assert graph["dependencies_up"] == ["dependencies_down"]
+    assert "dependencies_down" in graph["app_up"]
+    assert graph["repo_sync"] == []
+
+def test_up_project_runs_the_compose_commands(mock_session, mock_run):
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch") as mock_branch, \
+         patch("arches_containers.manage.wait_for_project_service") as mock_wait:
+        up_project("demo", session=mock_session, restart=True, full=True)
+
+    commands = [call.args[0][4] for call in mock_run.call_args_list]
+    assert commands == ["down", "down", "up", "up"]
+    mock_branch.assert_called_once()
+    mock_wait.assert_called_once()
+
+def test_init_project_pulls_dependency_images_alongside_the_clone(mock_session, mock_run, tmp_path):
+    (tmp_path / "docker-compose-dependencies.yml").write_text("services: {}")
+    with patch("arches_containers.manage.arches_repo_helper.clone_and_checkout_repo"), \
+         patch("arches_containers.manage.initialize_project"):
+        pipeline = init_project("demo", session=mock_session)
+
+    assert pipeline.tasks["pull_dependencies"].depends_on == []
+    assert pipeline.tasks["base_image"].depends_on == []
+    assert pipeline.tasks["init_project"].depends_on == ["repo_sync", "base_image"]
+    assert mock_run.call_args.args[0][4:] == ["pull", "--quiet"]
+
+def test_restart_pipeline_leaves_unchanged_services_running(mock_session, tmp_path):
+    for compose_file in ["docker-compose.yml", "docker-compose-dependencies.yml"]:
+        (tmp_path / compose_file).write_text("services: {}")
+
+    pipeline = build_up_pipeline("demo", build=True, session=mock_session, restart=True)
+
+    graph = {name: task.depends_on for name, task in pipeline.tasks.items()}
+    # nothing is brought down; each file recreates only what changed
+    assert not any(name.endswith("_down") for name in graph)
+    assert graph["dependencies_restart"] == ["build_dependencies"]
+    assert sorted(graph["app_restart"]) == ["base_image", "build_app", "dependencies_restart", "repo_sync"]
+    assert graph["service_ready"] == ["app_restart"]
+
+def restart_plan(changed, unchanged):
+    from arches_containers.utils.restart_plan import AcRestartPlan, AcServiceChange
+    return AcRestartPlan("demo", [AcServiceChange(service, "configuration changed") for service in changed], unchanged)
+
+def test_restart_recreates_changed_dependencies_only(mock_run, tmp_path):
+    with patch("arches_containers.utils.restart_plan.plan_restart", return_value=restart_plan(["nginx-demo"], ["db-demo", "elasticsearch-demo"])):
+        _restart_changed_services(str(tmp_path), "docker-compose-dependencies.yml", 120)
+
+    commands = [call.args[0][4:] for call in mock_run.call_args_list]
+    assert commands == [["up", "-d", "--force-recreate", "--no-deps", "--wait", "--wait-timeout", "120", "nginx-demo"]]
+
+def test_restart_restarts_unchanged_app_containers_in_place(mock_run, tmp_path):
+    with patch("arches_containers.utils.restart_plan.plan_restart", return_value=restart_plan([], ["demo", "demo-webpack"])):
+        _restart_changed_services(str(tmp_path), "docker-compose.yml", 120)
+
+    commands = [call.args[0][4:] for call in mock_run.call_args_list]
+    assert commands == [["restart", "demo", "demo-webpack"]]
+
+def test_restart_recreates_everything_if_the_plan_fails(mock_run, tmp_path):
+    from arches_containers.utils.restart_plan import AcRestartPlanError
+    with patch("arches_containers.utils.restart_plan.plan_restart", side_effect=AcRestartPlanError("engine unavailable")):
+        _restart_changed_services(str(tmp_path), "docker-compose.yml", 120)
+
+    commands = [call.args[0][4:] for call in mock_run.call_args_list]
+    assert commands == [["up", "-d", "--force-recreate"]]
+
+def test_build_without_a_cache_directory_uses_compose(mock_session, mock_run, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch") as mock_branch:
+        build_project("demo", session=mock_session)
+
+    mock_branch.assert_called_once()
+    assert [call.args[0][4:] for call in mock_run.call_args_list] == [["build"]]
+
+def test_build_imports_and_exports_the_cache_directory(mock_session, mock_run, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    cache_dir = tmp_path / "cache"
+    (cache_dir / "stale").mkdir(parents=True)
+
+    def run(command, **kwargs):
+        if command[:3] == ["docker", "buildx", "bake"]:
+            # buildx writes the exported cache to the directory named in cache-to
+            export_dir = next(argument for argument in command if "cache-to" in argument).split("dest=")[1].split(",")[0]
+            os.makedirs(os.path.join(export_dir, "blobs"))
+        return MagicMock(returncode=0)
+    mock_run.side_effect = run
+
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch"):
+        build_project("demo", cache_from=str(cache_dir), cache_to=str(cache_dir), session=mock_session)
+
+    bake = mock_run.call_args_list[-1].args[0]
+    assert bake[:6] == ["docker", "buildx", "bake", "--builder", "arches-containers", "--load"]
+    assert f"demo.cache-from=type=local,src={cache_dir}" in bake
+    assert f"demo.cache-to=type=local,dest={cache_dir}.new,mode=max" in bake
+    # the new cache replaces the old one rather than being merged into it
+    assert os.listdir(cache_dir) == ["blobs"]
+    assert not os.path.exists(f"{cache_dir}.new")
+
+def test_build_runtime_target_builds_the_stage_with_bake_on_the_default_builder(mock_session, mock_run, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch"), \
+         patch("arches_containers.manage._ensure_base_image") as mock_base:
+        build_project("demo", session=mock_session, stage="runtime")
+
+    bake = mock_run.call_args_list[-1].args[0]
+    # the default builder sees the locally built base image, so no cache means no builder of its own
+    assert "--builder" not in bake
+    mock_base.assert_called_once()
+    assert "demo.target=runtime" in bake
+    assert "demo.tags=he/demo:runtime" in bake
+    assert bake[-1] == "demo"
+
+def test_build_skips_a_missing_cache_directory(mock_session, mock_run, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch"):
+        build_project("demo", cache_from=str(tmp_path / "missing"), session=mock_session)
+
+    bake = mock_run.call_args_list[-1].args[0]
+    assert not any("cache-from" in argument for argument in bake)
+
+def test_ensure_base_image_builds_a_missing_base_image_once(mock_session, mock_run, tmp_path):
+    (tmp_path / "Dockerfile").write_text("ARG BASE_IMAGE=arches-containers/base:7.6\nFROM ${BASE_IMAGE}\n")
+    with patch("arches_containers.utils.base_image.base_image_exists", side_effect=[False, True]), \
+         patch("arches_containers.utils.base_image.build_base_image") as mock_build:
+        _ensure_base_image("demo", session=mock_session)
+        _ensure_base_image("demo", session=mock_session)
+
+    mock_build.assert_called_once_with("7.6", verbose=False)
+
+def test_ensure_base_image_skips_projects_not_built_from_it(mock_session, mock_run, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM python:3.11-slim\n")
+    with patch("arches_containers.utils.base_image.base_image_exists") as mock_exists:
+        _ensure_base_image("demo", session=mock_session)
+
+    mock_exists.assert_not_called()
+
+def test_build_with_a_cache_directory_builds_the_base_image_in_the_same_bake(mock_session, mock_run, tmp_path):
+    import json
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    (tmp_path / "Dockerfile").write_text("ARG BASE_IMAGE=arches-containers/base:7.6\nFROM ${BASE_IMAGE}\n")
+    bake_files = []
+
+    def run(command, **kwargs):
+        if command[:3] == ["docker", "buildx", "bake"]:
+            # the bake file only exists while the build runs
+            with open(command[command.index("-f", 7) + 1]) as f:
+                bake_files.append(json.load(f))
+        return MagicMock(returncode=0)
+    mock_run.side_effect = run
+
+    with patch("arches_containers.manage.arches_repo_helper.change_arches_branch"), \
+         patch("arches_containers.utils.base_image.prepare_base_context", return_value=("/templates/_7.6_/Dockerfile.base", "archesproject/dev/7.6.x")):
+        build_project("demo", cache_from=str(tmp_path), session=mock_session)
+
+    targets = bake_files[0]["target"]
+    assert targets["base"]["dockerfile"] == "/templates/_7.6_/Dockerfile.base"
+    assert targets["demo"]["contexts"] == {"arches-containers/base:7.6": "target:base"}
+
+def test_write_server_env_takes_the_worker_counts_from_the_project_config(mock_session, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("environment:\n  - ARCHES_SERVER_MODE=${ARCHES_SERVER_MODE:-debug}\n")
+    config = {"server_workers": 8, "server_threads": None}
+    mock_session.workspace.get_project.return_value.get.side_effect = lambda key, default=None: config.get(key, default)
+
+    write_server_env("demo", "perf", session=mock_session)
+
+    # an empty thread count lets the container choose its default
+    assert (tmp_path / ".env").read_text().startswith("ARCHES_SERVER_MODE=perf\nGUNICORN_WORKERS=8\nGUNICORN_THREADS=\nARCHES_DEBUGPY=False\nAC_APP_PORT=8002\n")
+
+def test_write_server_env_publishes_the_project_ports(mock_session, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("ports:\n  - ${AC_APP_PORT:-8002}:8000\n")
+    (tmp_path / "docker-compose-dependencies.yml").write_text("ports:\n  - ${AC_DB_PORT:-5433}:5432\n")
+    mock_session.workspace.get_project.return_value.get.side_effect = lambda key, default=None: {"port_offset": 3}.get(key, default)
+
+    write_server_env("demo", session=mock_session)
+
+    env = (tmp_path / ".env").read_text().splitlines()
+    assert "AC_APP_PORT=8005" in env and "AC_DB_PORT=5436" in env and "AC_DEBUGPY_PORT=5681" in env
+    # compose files rendered before the ports were parameterised would publish the default ports regardless
+    (tmp_path / "docker-compose-dependencies.yml").write_text("ports:\n  - 5433:5432\n")
+    with patch("arches_containers.manage.AcOutputManager") as mock_output:
+        mock_output.fail.side_effect = SystemExit(1)
+        with pytest.raises(SystemExit):
+            write_server_env("demo", session=mock_session)
+    assert "AC_DB_PORT" in mock_output.fail.call_args.args[0]
+
+def test_project_service_is_probed_on_the_project_port(mock_session):
+    from arches_containers.utils.readiness import AcReadinessResult
+    mock_session.workspace.get_settings.return_value.settings["service_timeout"] = 30
+    mock_session.workspace.get_project.return_value.get.side_effect = lambda key, default=None: {"port_offset": 1}.get(key, default)
+    result = AcReadinessResult(True, 200, 1.0, 1.0, 1.0, 1, None)
+    with patch("arches_containers.utils.readiness.wait_for_service", return_value=result) as mock_wait, \
+         patch("arches_containers.manage.AcOutputManager"):
+        wait_for_project_service("demo", session=mock_session)
+    assert mock_wait.call_args.args[0] == "http://localhost:8003/"
+
+def test_write_server_env_needs_an_upgraded_compose_file_for_perf_mode(mock_session, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("services: {}")
+    mock_session.workspace.get_project.return_value.get.return_value = None
+    with patch("arches_containers.manage.AcOutputManager") as mock_output:
+        mock_output.fail.side_effect = SystemExit(1)
+        with pytest.raises(SystemExit):
+            write_server_env("demo", "perf", session=mock_session)
+        write_server_env("demo", "debug", session=mock_session)
+
+    assert "act upgrade" in mock_output.fail.call_args.args[0]
+    assert (tmp_path / ".env").read_text().startswith("ARCHES_SERVER_MODE=debug\n")
+
+def test_write_server_env_starts_the_debugger_from_the_flag_or_the_project_setting(mock_session, tmp_path):
+    (tmp_path / "docker-compose.yml").write_text("environment:\n  - ARCHES_DEBUGPY=${ARCHES_DEBUGPY:-False}\n")
+    project = mock_session.workspace.get_project.return_value
+    project.get.side_effect = lambda key, default=None: {"debugpy": True}.get(key, default)
+
+    write_server_env("demo", session=mock_session)
+    assert "ARCHES_DEBUGPY=True\n" in (tmp_path / ".env").read_text()
+    # the flag wins over the setting
+    write_server_env("demo", session=mock_session, debug=False)
+    assert "ARCHES_DEBUGPY=False\n" in (tmp_path / ".env").read_text()
@@ -0,0 +1,60 @@
+import threading
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.logger import AcOutputManager, _RichSpinner
+from arches_containers.utils.orchestrator import run_for_projects
+
+@pytest.fixture(autouse=True)
+def plain_output():
+    """Uses a non-interactive spinner so output is written as plain text"""
+    with patch.object(AcOutputManager, "spinner", _RichSpinner(interactive=False), create=True), \
+         patch.object(AcOutputManager, "instance", object.__new__(AcOutputManager), create=True):
+        yield
+
+def test_single_project_runs_inline():
+    calls = []
+    assert run_for_projects(["demo"], lambda name: calls.append((name, threading.current_thread()))) == 0
+    assert calls == [("demo", threading.main_thread())]
+
+def test_projects_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    # every project must reach the barrier before any of them can finish, so this only passes if they run at once
+    assert run_for_projects(["a", "b", "c"], lambda name: barrier.wait(), max_workers=3) == 0
+
+def test_worker_pool_is_bounded():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def action(name):
+        with lock:
+            running.append(name)
+            peak.append(len(running))
+        threading.Event().wait(0.05)
+        with lock:
+            running.remove(name)
+
+    assert run_for_projects([f"p{i}" for i in range(6)], action, max_workers=2) == 0
+    assert max(peak) == 2
+
+def test_failure_in_one_project_does_not_stop_others(capsys):
+    finished = []
+
+    def action(name):
+        if name == "broken":
+            AcOutputManager.fail("compose failed")
+        AcOutputManager.complete_step("containers started.")
+        finished.append(name)
+
+    assert run_for_projects(["a", "broken", "b"], action) == 1
+    assert sorted(finished) == ["a", "b"]
+    output = capsys.readouterr().out
+    assert "broken | 🔴 compose failed" in output
+    assert "a | 🟢 containers started." in output
+    assert "🔴 broken: failed." in output
+
+def test_unexpected_exception_is_reported():
+    def action(name):
+        raise RuntimeError("boom")
+
+    assert run_for_projects(["a", "b"], action) == 1
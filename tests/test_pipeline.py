@@ -0,0 +1,79 @@
+import time
+import threading
+import contextvars
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.pipeline import AcPipeline
+
+def test_independent_tasks_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    pipeline = AcPipeline("test")
+    # each task waits for the other, so this only finishes if they run at the same time
+    pipeline.add("repo_sync", barrier.wait)
+    pipeline.add("dependencies_up", barrier.wait)
+
+    pipeline.run()
+
+    assert all(task.finished is not None for task in pipeline.tasks.values())
+
+def test_tasks_wait_for_their_dependencies():
+    order = []
+    pipeline = AcPipeline("test")
+    pipeline.add("repo_sync", lambda: (time.sleep(0.05), order.append("repo_sync")))
+    pipeline.add("dependencies_up", lambda: order.append("dependencies_up"))
+    pipeline.add("app_up", lambda: order.append("app_up"), depends_on=["repo_sync", "dependencies_up"])
+
+    pipeline.run()
+
+    assert order[-1] == "app_up"
+    assert pipeline.tasks["app_up"].started >= pipeline.tasks["repo_sync"].finished
+
+def test_failure_stops_dependent_tasks_and_is_raised():
+    ran = []
+    pipeline = AcPipeline("test")
+    pipeline.add("dependencies_up", lambda: exit(1))
+    pipeline.add("build_app", lambda: (time.sleep(0.05), ran.append("build_app")))
+    pipeline.add("app_up", lambda: ran.append("app_up"), depends_on=["dependencies_up", "build_app"])
+
+    with pytest.raises(SystemExit):
+        pipeline.run()
+
+    # the running build is allowed to finish, but nothing new starts
+    assert ran == ["build_app"]
+    assert pipeline.tasks["app_up"].started is None
+
+def test_tasks_see_the_callers_context():
+    variable = contextvars.ContextVar("scope", default=None)
+    seen = []
+    variable.set("project_a")
+    pipeline = AcPipeline("test")
+    pipeline.add("repo_sync", lambda: seen.append(variable.get()))
+    pipeline.add("dependencies_up", lambda: seen.append(variable.get()))
+
+    pipeline.run()
+
+    assert seen == ["project_a", "project_a"]
+
+def test_dependencies_must_be_added_first():
+    pipeline = AcPipeline("test")
+    with pytest.raises(ValueError, match="unknown tasks: repo_sync"):
+        pipeline.add("app_up", lambda: None, depends_on=["repo_sync"])
+    pipeline.add("repo_sync", lambda: None)
+    with pytest.raises(ValueError, match="already in the pipeline"):
+        pipeline.add("repo_sync", lambda: None)
+
+def test_critical_path_follows_the_slowest_dependencies():
+    pipeline = AcPipeline("test")
+    pipeline.add("repo_sync", lambda: time.sleep(0.01))
+    pipeline.add("dependencies_up", lambda: time.sleep(0.1))
+    pipeline.add("build_app", lambda: time.sleep(0.03), depends_on=["repo_sync"])
+    pipeline.add("app_up", lambda: None, depends_on=["repo_sync", "dependencies_up", "build_app"])
+    pipeline.add("service_ready", lambda: None, depends_on=["app_up"])
+
+    path = pipeline.run()
+
+    assert [task.name for task in path] == ["dependencies_up", "app_up", "service_ready"]
+    with patch("arches_containers.utils.pipeline.AcOutputManager") as mock_manager:
+        pipeline.report()
+    message = mock_manager.write.call_args[0][0]
+    assert "critical path: dependencies_up 0.1s → app_up 0.0s → service_ready 0.0s" in message
@@ -0,0 +1,19 @@
+from arches_containers.utils.ports import PROJECT_PORTS, get_project_ports, allocate_port_offset, find_port_conflicts
+
+def test_project_ports_add_the_offset_to_the_defaults():
+    assert get_project_ports(None) == PROJECT_PORTS
+    assert get_project_ports(2)["AC_APP_PORT"] == 8004
+
+def test_allocated_offset_shares_no_port_with_the_used_offsets():
+    assert allocate_port_offset([]) == 0
+    assert allocate_port_offset([0]) == 1
+    # RabbitMQ is published 5 ports below debugpy, so offset 5 clashes with offset 0 and offset 6 with offset 1
+    used = [0, 1, 2, 3, 4]
+    offset = allocate_port_offset(used)
+    assert offset not in (5, 6)
+    assert not any(find_port_conflicts({"new": offset, "used": used_offset}) for used_offset in used)
+
+def test_conflicts_name_each_pair_and_their_shared_ports():
+    conflicts = find_port_conflicts({"one": None, "two": 0, "three": 1})
+    assert [(one, other) for one, other, _ in conflicts] == [("one", "two")]
+    assert conflicts[0][2] == sorted(PROJECT_PORTS.values())
@@ -0,0 +1,96 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from arches_containers.utils.readiness import probe, wait_for_service
+
+@pytest.fixture
+def server():
+    """Serves the queued status codes in order, then keeps repeating the last one"""
+    statuses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            self.send_response(status)
+            if 300 <= status < 400:
+                self.send_header("Location", "/elsewhere")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/", statuses
+    httpd.shutdown()
+    httpd.server_close()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def unused_url():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/"
+
+def test_probe_returns_status_without_following_redirects(server):
+    url, statuses = server
+    statuses.append(302)
+    assert probe(url) == 302
+
+def test_probe_returns_none_when_nothing_is_listening():
+    assert probe(unused_url(), timeout=1) is None
+
+def test_waits_with_backoff_until_ready(server):
+    url, statuses = server
+    statuses.extend([503, 500, 200])
+    clock = FakeClock()
+
+    result = wait_for_service(url, 60, clock=clock, sleep=clock.sleep)
+
+    assert result.ready
+    assert result.status == 200
+    assert result.attempts == 3
+    assert clock.sleeps == [0.5, 1.0]
+    assert result.first_response == 0.0
+    assert result.ready_after == 1.5
+
+def test_redirect_counts_as_ready(server):
+    url, statuses = server
+    statuses.append(301)
+    assert wait_for_service(url, 5).ready
+
+def test_gives_up_at_deadline():
+    clock = FakeClock()
+
+    result = wait_for_service(unused_url(), 20, max_delay=4, clock=clock, sleep=clock.sleep)
+
+    assert not result.ready
+    assert result.first_response is None
+    assert max(clock.sleeps) == 4
+    assert clock.now <= 20
+    assert "20" in result.reason
+
+def test_abort_check_stops_waiting(server):
+    url, statuses = server
+    statuses.append(502)
+    clock = FakeClock()
+
+    result = wait_for_service(url, 60, abort_check=lambda: "container exited", clock=clock, sleep=clock.sleep)
+
+    assert not result.ready
+    assert result.reason == "container exited"
+    assert result.status == 502
+    assert result.attempts == 1
@@ -0,0 +1,88 @@
+import os
+import re
+import time
+import shutil
+import subprocess
+import pytest
+from arches_containers.utils.templates import materialise_project, get_template_folder
+from arches_containers.utils.base_image import BASE_DOCKERFILE, get_base_image
+
+# The benchmark builds a real project image, so it needs docker and an Arches checkout to build from:
+#   AC_BENCHMARK_ARCHES=/path/to/arches/clone AC_BENCHMARK_VERSION=7.6 pytest tests/test_rebuild_benchmark.py -s
+ARCHES_ENV = "AC_BENCHMARK_ARCHES"
+VERSION_ENV = "AC_BENCHMARK_VERSION"
+PROJECT = "benchmark"
+
+
+def docker_available():
+    if not shutil.which("docker"):
+        return False
+    return subprocess.run(["docker", "info"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get(ARCHES_ENV) or not docker_available(),
+    reason=f"set {ARCHES_ENV} to an Arches checkout and make docker available to run the rebuild benchmark",
+)
+
+
+def build_base(version):
+    '''
+    Builds the version's base image from the benchmark checkout, whose dependency manifests sit where Dockerfile.base expects them.
+    '''
+    command = ["docker", "build", "-f", os.path.join(get_template_folder(version), BASE_DOCKERFILE), "-t", get_base_image(version), os.environ[ARCHES_ENV]]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    assert result.returncode == 0, result.stdout[-4000:]
+
+
+def build(workspace):
+    command = [
+        "docker", "build", "--progress=plain",
+        "-f", f".arches_containers/{PROJECT}/Dockerfile",
+        "--build-arg", f"PROJ_NAME={PROJECT}",
+        "--build-arg", f"DOCKER_PATH=./.arches_containers/{PROJECT}/docker",
+        "--build-arg", f"ARCHES_PATH=./{PROJECT}-arches",
+        "-t", f"ac-benchmark/{PROJECT}:rebuild",
+        ".",
+    ]
+    started = time.monotonic()
+    result = subprocess.run(command, cwd=workspace, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    assert result.returncode == 0, result.stdout[-4000:]
+    return time.monotonic() - started, result.stdout
+
+
+def cached_steps(output):
+    '''
+    Returns the headers of the build steps BuildKit reported as CACHED in plain progress output.
+    '''
+    headers = {}
+    cached = set()
+    for line in output.splitlines():
+        match = re.match(r"#(\d+) (\[.*)", line)
+        if match:
+            headers.setdefault(match.group(1), match.group(2))
+        elif re.match(r"#(\d+) CACHED", line):
+            cached.add(line.split()[0][1:])
+    return [headers[step] for step in cached if step in headers]
+
+
+def test_rebuild_after_a_source_change_reuses_the_dependency_layer(tmp_path, record_property):
+    version = os.environ.get(VERSION_ENV, "7.6")
+    materialise_project(version, str(tmp_path / ".arches_containers" / PROJECT), PROJECT, PROJECT)
+    arches_dir = tmp_path / f"{PROJECT}-arches"
+    # projects mount a worktree of the shared clone, whose .git is only a pointer to the clone on the host
+    subprocess.run(["git", "-C", os.environ[ARCHES_ENV], "worktree", "add", "--detach", str(arches_dir)], check=True, stdout=subprocess.DEVNULL)
+    try:
+        build_base(version)
+        warm_seconds, _ = build(tmp_path)
+        with open(arches_dir / "arches" / "__init__.py", "a") as f:
+            f.write("\n# rebuild benchmark\n")
+        rebuild_seconds, output = build(tmp_path)
+    finally:
+        subprocess.run(["git", "-C", os.environ[ARCHES_ENV], "worktree", "remove", "--force", str(arches_dir)], stdout=subprocess.DEVNULL)
+
+    record_property("arches_version", version)
+    record_property("first_build_seconds", round(warm_seconds, 1))
+    record_property("rebuild_seconds", round(rebuild_seconds, 1))
+    print(f"\nArches {version}: first build {warm_seconds:.1f}s, rebuild after a one-line source change {rebuild_seconds:.1f}s")
+    assert any("requirements" in step for step in cached_steps(output)), "the dependency install layer was rebuilt"
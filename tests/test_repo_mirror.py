@@ -0,0 +1,123 @@
+import os
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+from arches_containers.utils.repo_mirror import AcMirrorError, get_cache_dir, get_mirror_path, update_mirror, clone_from_mirror
+from arches_containers.utils.arches_repo_helper import clone_and_checkout_repo
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout.strip()
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    for variable in ["GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"]:
+        monkeypatch.setenv(variable, "Test")
+    for variable in ["GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"]:
+        monkeypatch.setenv(variable, "test@example.com")
+
+def commit(work_dir, name, content):
+    with open(os.path.join(work_dir, name), "w") as f:
+        f.write(content)
+    git("add", name, cwd=work_dir)
+    git("commit", "-q", "-m", f"update {name}", cwd=work_dir)
+    return git("rev-parse", "HEAD", cwd=work_dir)
+
+@pytest.fixture
+def upstream(tmp_path):
+    '''
+    A bare "upstream" repo with a dev/7.5.x branch, plus a working copy used to push new commits to it.
+    '''
+    work_dir = tmp_path / "upstream-work"
+    bare_dir = tmp_path / "upstream.git"
+    git("init", "-q", "-b", "master", str(work_dir))
+    commit(work_dir, "README.md", "arches")
+    git("checkout", "-q", "-b", "dev/7.5.x", cwd=work_dir)
+    commit(work_dir, "setup.py", "version 7.5")
+    git("clone", "-q", "--bare", str(work_dir), str(bare_dir))
+    git("remote", "add", "upstream", str(bare_dir), cwd=work_dir)
+    git("update-ref", "refs/pull/1/head", "HEAD", cwd=str(bare_dir))
+    return work_dir, bare_dir
+
+def test_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.delenv("AC_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert get_cache_dir() == os.path.join(str(tmp_path), "arches-containers")
+
+    monkeypatch.setenv("AC_CACHE_DIR", "/cache")
+    assert get_cache_dir() == "/cache"
+    assert get_mirror_path("archesproject") == os.path.join("/cache", "mirrors", "archesproject", "arches.git")
+
+def test_update_mirror_clones_then_fetches_incrementally(upstream, tmp_path):
+    work_dir, bare_dir = upstream
+    mirror_dir = get_mirror_path("archesproject", cache_dir=str(tmp_path / "cache"))
+
+    assert update_mirror(str(bare_dir), mirror_dir) is True
+    assert git("rev-parse", "dev/7.5.x", cwd=mirror_dir) == git("rev-parse", "dev/7.5.x", cwd=str(bare_dir))
+    # pull request refs are not mirrored
+    assert "refs/pull" not in git("for-each-ref", cwd=mirror_dir)
+    assert git("config", "gc.pruneExpire", cwd=mirror_dir) == "never"
+
+    new_head = commit(work_dir, "setup.py", "version 7.5.1")
+    git("push", "-q", "upstream", "dev/7.5.x", cwd=work_dir)
+
+    assert update_mirror(str(bare_dir), mirror_dir) is False
+    assert git("rev-parse", "dev/7.5.x", cwd=mirror_dir) == new_head
+
+def test_fork_mirror_is_seeded_from_another_organisation(upstream, tmp_path):
+    work_dir, bare_dir = upstream
+    cache_dir = str(tmp_path / "cache")
+    update_mirror(str(bare_dir), get_mirror_path("archesproject", cache_dir=cache_dir))
+
+    fork_dir = tmp_path / "fork.git"
+    git("clone", "-q", "--bare", str(bare_dir), str(fork_dir))
+    fork_mirror = get_mirror_path("myorg", cache_dir=cache_dir)
+    update_mirror(str(fork_dir), fork_mirror)
+
+    # objects are copied in rather than borrowed, so the fork mirror does not depend on the other mirror
+    assert not os.path.exists(os.path.join(fork_mirror, "objects", "info", "alternates"))
+    assert git("rev-parse", "dev/7.5.x", cwd=fork_mirror) == git("rev-parse", "dev/7.5.x", cwd=str(bare_dir))
+
+def test_clone_from_mirror_shares_objects(upstream, tmp_path):
+    work_dir, bare_dir = upstream
+    mirror_dir = get_mirror_path("archesproject", cache_dir=str(tmp_path / "cache"))
+    update_mirror(str(bare_dir), mirror_dir)
+    clone_dir = str(tmp_path / "workspace" / "arches")
+
+    clone_from_mirror("https://github.com/archesproject/arches.git", mirror_dir, clone_dir)
+
+    with open(os.path.join(clone_dir, ".git", "objects", "info", "alternates")) as f:
+        assert os.path.realpath(f.read().strip()) == os.path.realpath(os.path.join(mirror_dir, "objects"))
+    assert git("remote", "get-url", "origin", cwd=clone_dir) == "https://github.com/archesproject/arches.git"
+    git("checkout", "-q", "dev/7.5.x", cwd=clone_dir)
+    assert os.path.exists(os.path.join(clone_dir, "setup.py"))
+
+def test_update_mirror_failure(tmp_path):
+    with pytest.raises(AcMirrorError, match="git clone failed"):
+        update_mirror(str(tmp_path / "missing.git"), get_mirror_path("archesproject", cache_dir=str(tmp_path / "cache")))
+
+def test_update_mirror_lock_timeout(tmp_path):
+    mirror_dir = get_mirror_path("archesproject", cache_dir=str(tmp_path / "cache"))
+    with patch("arches_containers.utils.repo_mirror.MIRROR_LOCK_TIMEOUT", 0.0), \
+         patch("arches_containers.utils.config_store._try_lock", return_value=False), \
+         patch("arches_containers.utils.repo_mirror._git") as mock_git:
+        with pytest.raises(AcMirrorError, match="waiting for the lock"):
+            update_mirror(str(tmp_path / "missing.git"), mirror_dir)
+    mock_git.assert_not_called()
+
+@pytest.mark.parametrize("use_mirror", [True, False])
+def test_clone_and_checkout_repo(upstream, tmp_path, monkeypatch, use_mirror):
+    work_dir, bare_dir = upstream
+    monkeypatch.setenv("AC_CACHE_DIR", str(tmp_path / "cache"))
+    clone_dir = str(tmp_path / "workspace" / "arches")
+    project = {"arches_repo_organization": "archesproject"}
+    session = MagicMock()
+    session.settings.settings = {"arches_repo_mirror": use_mirror}
+
+    with patch("arches_containers.utils.arches_repo_helper._get_repo_info", return_value=(project, str(bare_dir), clone_dir, "dev/7.5.x")), \
+         patch("arches_containers.utils.arches_repo_helper.AcOutputManager") as mock_manager:
+        clone_and_checkout_repo("test_project", session=session)
+
+    mock_manager.fail.assert_not_called()
+    assert git("rev-parse", "--abbrev-ref", "HEAD", cwd=clone_dir) == "dev/7.5.x"
+    assert os.path.exists(os.path.join(clone_dir, ".git", "objects", "info", "alternates")) == use_mirror
+    assert os.path.isdir(get_mirror_path("archesproject")) == use_mirror
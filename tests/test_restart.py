@@ -1,9 +1,16 @@
 import subprocess
+import pytest
 import sys
 import os
 from unittest.mock import patch
 from arches_containers.main import main
 
+@pytest.fixture(autouse=True)
+def no_timing_history():
+    """The workspace is mocked in these tests, so there is no history file to record timings in"""
+    with patch("arches_containers.main.timing_run"), patch("arches_containers.main.get_history_path"):
+        yield
+
 # Helper to simulate CLI arguments
 def run_cli(args):
     sys.argv = ["arches-containers"] + args
@@ -12,70 +19,90 @@ def run_cli(args):
     except SystemExit:
         pass
 
-def test_restart_runs_down_and_up():
-    with patch("arches_containers.main.compose_project") as mock_compose, \
-         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+def test_restart_recreates_only_changed_services_by_default():
+    with patch("arches_containers.main.up_project") as mock_up, \
+         patch("arches_containers.main.compose_project") as mock_compose, \
          patch("arches_containers.main.AcWorkspace") as mock_workspace, \
          patch("arches_containers.main.AcOutputManager"):
         # Simulate active project
         mock_settings = mock_workspace.return_value.get_settings.return_value
         mock_settings.get_active_project.return_value.project_name = "demo"
         run_cli(["restart", "-p", "demo"])
-        # Should call down then up
-        assert mock_compose.call_count == 2
-        assert mock_compose.call_args_list[0][0][1] == "down"
-        assert mock_compose.call_args_list[1][0][1] == "up"
+        # Should restart in one pipeline that only recreates what changed
+        assert mock_up.call_count == 1
+        assert mock_up.call_args[0][0] == "demo"
+        assert mock_up.call_args[1]["restart"] is True
+        assert mock_up.call_args[1]["full"] is False
+        mock_compose.assert_not_called()
+
+def test_restart_full_runs_down_and_up():
+    with patch("arches_containers.main.up_project") as mock_up, \
+         patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager"):
+        mock_settings = mock_workspace.return_value.get_settings.return_value
+        mock_settings.get_active_project.return_value.project_name = "demo"
+        run_cli(["restart", "-p", "demo", "--full"])
+        assert mock_up.call_args[1]["restart"] is True
+        assert mock_up.call_args[1]["full"] is True
+
+def test_restart_passes_the_server_mode():
+    with patch("arches_containers.main.up_project") as mock_up, \
+         patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager"):
+        mock_settings = mock_workspace.return_value.get_settings.return_value
+        mock_settings.get_active_project.return_value.project_name = "demo"
+        run_cli(["restart", "-p", "demo"])
+        assert mock_up.call_args[1]["mode"] == "debug"
+        run_cli(["restart", "-p", "demo", "--mode", "perf"])
+        assert mock_up.call_args[1]["mode"] == "perf"
 
 def test_restart_with_build_and_verbose():
-    with patch("arches_containers.main.compose_project") as mock_compose, \
-         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+    with patch("arches_containers.main.up_project") as mock_up, \
          patch("arches_containers.main.AcWorkspace") as mock_workspace, \
          patch("arches_containers.main.AcOutputManager"):
         mock_settings = mock_workspace.return_value.get_settings.return_value
         mock_settings.get_active_project.return_value.project_name = "demo"
         run_cli(["restart", "-p", "demo", "-b", "-vb"])
-        # Should call down (no build), then up (with build)
-        assert mock_compose.call_count == 2
-        assert mock_compose.call_args_list[0][0][2] is False  # build for down
-        assert mock_compose.call_args_list[1][0][2] is True   # build for up
+        # Should build when bringing the containers back up
+        assert mock_up.call_count == 1
+        assert mock_up.call_args[0][1] is True  # build
+        assert mock_up.call_args[0][2] is True  # verbose
 
 def test_restart_with_app_flag():
-    with patch("arches_containers.main.compose_project") as mock_compose, \
-         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+    with patch("arches_containers.main.up_project") as mock_up, \
          patch("arches_containers.main.AcWorkspace") as mock_workspace, \
          patch("arches_containers.main.AcOutputManager"):
         mock_settings = mock_workspace.return_value.get_settings.return_value
         mock_settings.get_active_project.return_value.project_name = "demo"
         run_cli(["restart", "-p", "demo", "--app"])
-        # Should call down then up with app container type
-        assert mock_compose.call_count == 2
-        assert mock_compose.call_args_list[0][0][4] == "app"  # container_type for down
-        assert mock_compose.call_args_list[1][0][4] == "app"  # container_type for up
+        # Should restart with app container type
+        assert mock_up.call_count == 1
+        assert mock_up.call_args[0][3] == "app"  # container_type
+        assert mock_up.call_args[1]["restart"] is True
 
 def test_restart_with_dep_flag():
-    with patch("arches_containers.main.compose_project") as mock_compose, \
-         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+    with patch("arches_containers.main.up_project") as mock_up, \
          patch("arches_containers.main.AcWorkspace") as mock_workspace, \
          patch("arches_containers.main.AcOutputManager"):
         mock_settings = mock_workspace.return_value.get_settings.return_value
         mock_settings.get_active_project.return_value.project_name = "demo"
         run_cli(["restart", "-p", "demo", "--dep"])
-        # Should call down then up with dep container type
-        assert mock_compose.call_count == 2
-        assert mock_compose.call_args_list[0][0][4] == "dep"  # container_type for down
-        assert mock_compose.call_args_list[1][0][4] == "dep"  # container_type for up
+        # Should restart with dep container type
+        assert mock_up.call_count == 1
+        assert mock_up.call_args[0][3] == "dep"  # container_type
+        assert mock_up.call_args[1]["restart"] is True
 
 def test_up_with_app_flag():
-    with patch("arches_containers.main.compose_project") as mock_compose, \
-         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+    with patch("arches_containers.main.up_project") as mock_up, \
          patch("arches_containers.main.AcWorkspace") as mock_workspace, \
          patch("arches_containers.main.AcOutputManager"):
         mock_settings = mock_workspace.return_value.get_settings.return_value
         mock_settings.get_active_project.return_value.project_name = "demo"
         run_cli(["up", "-p", "demo", "--app"])
         # Should call up with app container type
-        assert mock_compose.call_count == 1
-        assert mock_compose.call_args_list[0][0][4] == "app"  # container_type
+        assert mock_up.call_count == 1
+        assert mock_up.call_args[0][3] == "app"  # container_type
+        assert mock_up.call_args[1]["restart"] is False
 
 def test_down_with_dep_flag():
     with patch("arches_containers.main.compose_project") as mock_compose, \
@@ -126,3 +153,56 @@ def test_app_and_dep_flags_mutually_exclusive():
     # Should exit with error code (argparse error)
     assert result.returncode != 0
     assert "not allowed with argument" in result.stderr or "mutually exclusive" in result.stderr
+
+def test_up_with_several_projects():
+    with patch("arches_containers.main.up_project") as mock_up, \
+         patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager"), \
+         patch("arches_containers.main.run_for_projects", return_value=0) as mock_run:
+        run_cli(["up", "-p", "one", "two", "-p", "one", "three", "-j", "2"])
+        project_names, action, jobs = mock_run.call_args[0]
+        assert project_names == ["one", "two", "three"]
+        assert jobs == 2
+        action("two")
+        assert mock_up.call_args[0][0] == "two"
+
+def test_down_with_all_projects():
+    with patch("arches_containers.main.compose_project") as mock_compose, \
+         patch("arches_containers.main.arches_repo_helper.change_arches_branch") as mock_branch, \
+         patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager"), \
+         patch("arches_containers.main.run_for_projects", return_value=1) as mock_run:
+        mock_workspace.return_value.list_projects.return_value = ["one", "two"]
+        sys.argv = ["arches-containers", "down", "--all"]
+        with pytest.raises(SystemExit) as exit_info:
+            main()
+        assert mock_run.call_args[0][0] == ["one", "two"]
+        assert exit_info.value.code == 1
+
+def test_up_refuses_projects_that_share_host_ports():
+    with patch("arches_containers.main.AcWorkspace") as mock_workspace, \
+         patch("arches_containers.main.AcOutputManager") as mock_output, \
+         patch("arches_containers.main.run_for_projects", return_value=0) as mock_run:
+        mock_output.fail.side_effect = SystemExit(1)
+        offsets = {"one": None, "two": 1, "three": 0}
+        mock_workspace.return_value.get_project.side_effect = lambda name: {"port_offset": offsets[name]}
+        run_cli(["up", "-p", "one", "two", "three"])
+        mock_run.assert_not_called()
+        assert "projects one and three both publish host ports" in mock_output.write.call_args_list[-1].args[0]
+
+        # projects on their own ports start together
+        offsets["three"] = 2
+        run_cli(["up", "-p", "one", "two", "three"])
+        mock_run.assert_called_once()
+
+def test_debug_is_rejected_in_perf_mode(capsys):
+    with patch("arches_containers.main.up_project") as mock_up, \
+         patch("arches_containers.main.AcWorkspace"), \
+         patch("arches_containers.main.AcOutputManager"):
+        for command in ["up", "restart"]:
+            run_cli([command, "--mode", "perf", "--debug"])
+            assert "--debug: not allowed with argument --mode perf" in capsys.readouterr().err
+        mock_up.assert_not_called()
+
+        run_cli(["up", "--mode", "perf", "--no-debug"])
+        assert mock_up.call_args.kwargs["mode"] == "perf"
@@ -0,0 +1,81 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from arches_containers.utils.docker_api import AcDockerClient
+from arches_containers.utils.restart_plan import AcRestartPlanError, resolve_services, plan_restart
+
+CONFIG = {
+    "name": "demo",
+    "services": {
+        "db-demo": {"image": "postgis/postgis:14-3.2"},
+        "elasticsearch-demo": {"image": "docker.elastic.co/elasticsearch/elasticsearch:8.10.4"},
+        "rabbitmq-demo": {"image": "rabbitmq:3.12.6-management"},
+        "nginx-demo": {"image": "nginx:latest"},
+    },
+}
+HASHES = "db-demo aaa\nelasticsearch-demo bbb\nrabbitmq-demo ccc\nnginx-demo ddd\n"
+
+def compose_output(config=CONFIG, hashes=HASHES):
+    def run(command, **kwargs):
+        result = MagicMock(returncode=0, stderr="")
+        result.stdout = hashes if "--hash" in command else json.dumps(config)
+        return result
+    return run
+
+def container(service, config_hash, image_id, state="running"):
+    return {
+        "Names": [f"/{service}"],
+        "State": state,
+        "ImageID": image_id,
+        "Labels": {"com.docker.compose.project": "demo", "com.docker.compose.service": service, "com.docker.compose.config-hash": config_hash},
+    }
+
+def test_resolve_services_pairs_images_with_config_hashes():
+    with patch("arches_containers.utils.restart_plan.subprocess.run", side_effect=compose_output()) as mock_run:
+        project, services = resolve_services("/p/docker-compose-dependencies.yml", "/p")
+
+    assert project == "demo"
+    assert services["db-demo"] == {"image": "postgis/postgis:14-3.2", "config_hash": "aaa"}
+    assert mock_run.call_args_list[1].args[0][4:] == ["config", "--hash", "*"]
+
+def test_resolve_services_failure():
+    with patch("arches_containers.utils.restart_plan.subprocess.run", return_value=MagicMock(returncode=1, stderr="invalid compose file")):
+        with pytest.raises(AcRestartPlanError, match="invalid compose file"):
+            resolve_services("/p/docker-compose.yml", "/p")
+
+def test_plan_restart_recreates_only_changed_services(fake_docker):
+    containers = [
+        container("db-demo", "aaa", "sha256:postgis"),
+        container("elasticsearch-demo", "changed", "sha256:elastic"),
+        container("rabbitmq-demo", "ccc", "sha256:old-rabbit"),
+    ]
+    # a list route would be streamed one object per line, so return the list from a callable
+    fake_docker.routes["/containers/json"] = lambda query: containers
+    fake_docker.routes["/images/postgis/postgis:14-3.2/json"] = {"Id": "sha256:postgis"}
+    fake_docker.routes["/images/rabbitmq:3.12.6-management/json"] = {"Id": "sha256:new-rabbit"}
+
+    with patch("arches_containers.utils.restart_plan.subprocess.run", side_effect=compose_output()):
+        plan = plan_restart("/p/docker-compose-dependencies.yml", "/p", client=AcDockerClient(fake_docker.docker_host))
+
+    assert plan.unchanged == ["db-demo"]
+    assert {change.service: change.reason for change in plan.changed} == {
+        "elasticsearch-demo": "configuration changed",
+        "rabbitmq-demo": "image changed",
+        "nginx-demo": "no container",
+    }
+    assert fake_docker.requests[0][1]["filters"] == json.dumps({"label": ["com.docker.compose.project=demo"]})
+
+def test_plan_restart_recreates_stopped_containers(fake_docker):
+    fake_docker.routes["/containers/json"] = lambda query: [container("db-demo", "aaa", "sha256:postgis", state="exited")]
+    config = {"name": "demo", "services": {"db-demo": CONFIG["services"]["db-demo"]}}
+
+    with patch("arches_containers.utils.restart_plan.subprocess.run", side_effect=compose_output(config, "db-demo aaa\n")):
+        plan = plan_restart("/p/docker-compose-dependencies.yml", "/p", client=AcDockerClient(fake_docker.docker_host))
+
+    assert [(change.service, change.reason) for change in plan.changed] == [("db-demo", "container exited")]
+
+def test_plan_restart_needs_the_engine_api(tmp_path):
+    client = AcDockerClient(f"unix://{tmp_path}/missing.sock")
+    with patch("arches_containers.utils.restart_plan.subprocess.run", side_effect=compose_output()):
+        with pytest.raises(AcRestartPlanError, match="Could not reach the Docker engine"):
+            plan_restart("/p/docker-compose-dependencies.yml", "/p", client=client)
@@ -0,0 +1,78 @@
+import os
+import json
+import pytest
+from unittest.mock import patch
+from arches_containers.utils import workspace as workspace_module
+from arches_containers.utils.session import AcSession
+from arches_containers.utils.workspace import AcWorkspace, AcProjectSettings
+
+@pytest.fixture
+def session(tmp_path):
+    """Creates a session on a temporary workspace with a test project"""
+    os.chdir(tmp_path)
+    class Args:
+        version = "7.6"
+        organization = None
+        branch = None
+
+    session = AcSession()
+    session.workspace.create_project("test_project", Args())
+    yield session
+    os.chdir("/")
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_session_resolves_workspace_once(tmp_path):
+    os.chdir(tmp_path)
+    with patch.object(AcWorkspace, "_get_ac_workspace", autospec=True, return_value=str(tmp_path)) as mock_resolve:
+        (tmp_path / ".arches_containers").mkdir()
+        session = AcSession()
+        session.settings.settings
+        session.workspace.get_settings()
+        assert session.path == str(tmp_path)
+    assert mock_resolve.call_count == 1
+    os.chdir("/")
+
+def test_settings_read_once_while_unchanged(session):
+    session.settings.settings  # prime the cache
+    with patch.object(workspace_module.json, "load", wraps=json.load) as mock_load:
+        for _ in range(5):
+            session.settings.settings
+        session.get_active_project()
+        session.settings.get_active_project_name()
+    mock_load.assert_not_called()
+
+def test_settings_reloaded_after_external_change(session):
+    assert session.settings.settings["host"] == "localhost"
+    settings_path = os.path.join(session.workspace._get_ac_directory_path(), "settings.json")
+    with open(settings_path) as f:
+        data = json.load(f)
+    data["host"] = "example.org"
+    with open(settings_path, "w") as f:
+        json.dump(data, f)
+    bump_mtime(settings_path)
+
+    assert session.settings.settings["host"] == "example.org"
+
+def test_project_identity_map(session):
+    project = session.get_project("test_project")
+    with patch.object(workspace_module.json, "load", wraps=json.load) as mock_load:
+        assert session.get_project("test_project") is project
+        assert session.get_active_project() is project
+    mock_load.assert_not_called()
+
+def test_project_reloaded_in_place_after_external_change(session):
+    project = session.get_project("test_project")
+    config_path = os.path.join(project.get_project_path(), "config.json")
+    with open(config_path) as f:
+        data = json.load(f)
+    data[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value] = "feature/x"
+    with open(config_path, "w") as f:
+        json.dump(data, f)
+    bump_mtime(config_path)
+
+    reloaded = session.get_project("test_project")
+    assert reloaded is project
+    assert reloaded[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value] == "feature/x"
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import subprocess
+import pytest
+
+# Time budget for `act list` in a non-interactive shell. Override with AC_STARTUP_BUDGET (seconds) on slow runners.
+STARTUP_BUDGET_SECONDS = float(os.environ.get("AC_STARTUP_BUDGET", "1.0"))
+HEAVY_MODULES = ["rich", "rich_argparse", "prettytable", "slugify", "http", "concurrent"]
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workspace_dir(tmp_path):
+    """Creates an empty workspace with a .arches_containers directory"""
+    (tmp_path / ".arches_containers").mkdir()
+    return tmp_path
+
+
+def run_act(args, cwd):
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+    return subprocess.run(
+        [sys.executable, "-m", "arches_containers.main"] + args,
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+
+
+def test_list_within_startup_budget(workspace_dir):
+    # Take the best of a few runs so a single slow scheduler tick does not fail the benchmark
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = run_act(["list"], workspace_dir)
+        timings.append(time.perf_counter() - start)
+        assert result.returncode == 0, result.stderr
+
+    assert min(timings) < STARTUP_BUDGET_SECONDS, f"'act list' took {min(timings):.3f}s (budget {STARTUP_BUDGET_SECONDS}s)"
+
+
+def test_list_does_not_import_heavy_modules(workspace_dir):
+    code = (
+        "import sys\n"
+        "from arches_containers.main import main\n"
+        "sys.argv = ['act', 'list']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('loaded:' + ','.join(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY_MODULES!r})))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+    result = subprocess.run([sys.executable, "-c", code], cwd=workspace_dir, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    loaded = result.stdout.strip().splitlines()[-1]
+    assert loaded == "loaded:"
+
+
+def test_non_interactive_output_has_no_banner(workspace_dir):
+    result = run_act(["list"], workspace_dir)
+
+    assert result.returncode == 0, result.stderr
+    assert "Arches Container Projects" in result.stdout
+    assert "╚═╝" not in result.stdout
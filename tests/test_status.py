@@ -1,71 +1,140 @@
-import pytest, json
-from unittest.mock import patch, MagicMock
-from arches_containers.utils.status import get_running_containers
+import json
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.docker_api import AcDockerClient, AcDockerApiError, list_project_containers
+from arches_containers.utils.status import get_running_containers, get_all_projects_status
+
+def api_container(name, project, service, state="running", status="Up 5 minutes", ports=None):
+    return {
+        "Id": f"id-{name}",
+        "Names": [f"/{name}"],
+        "State": state,
+        "Status": status,
+        "Ports": ports or [],
+        "Labels": {"com.docker.compose.project": project, "com.docker.compose.service": service},
+    }
+
+CONTAINERS = [
+    api_container("db-testproject", "test_project", "db-testproject", status="Up 5 minutes (healthy)",
+                  ports=[{"IP": "0.0.0.0", "PrivatePort": 5432, "PublicPort": 5433, "Type": "tcp"},
+                         {"IP": "::", "PrivatePort": 5432, "PublicPort": 5433, "Type": "tcp"}]),
+    api_container("testproject", "test_project", "testproject", state="restarting", status="Restarting (1) 3 seconds ago"),
+    api_container("db-testproject2", "test_project2", "db-testproject2", state="exited", status="Exited (0) 1 hour ago"),
+]
 
 @pytest.fixture
-def mock_subprocess_run():
-    with patch('arches_containers.utils.status.subprocess.run') as mock_run:
-        yield mock_run
+def engine(fake_docker):
+    def list_containers(query):
+        labels = json.loads(query.get("filters", "{}")).get("label", [])
+        selected = CONTAINERS
+        for label in labels:
+            key, _, value = label.partition("=")
+            selected = [c for c in selected if key in c["Labels"] and (not value or c["Labels"][key] == value)]
+        return selected
+
+    fake_docker.routes["/containers/json"] = list_containers
+    for container in CONTAINERS:
+        restarts = 4 if container["State"] == "restarting" else 0
+        fake_docker.routes[f"/containers/{container['Id']}/json"] = {"RestartCount": restarts}
+    return fake_docker
 
 @pytest.fixture
 def mock_ac_output_manager():
     with patch('arches_containers.utils.status.AcOutputManager') as mock_manager:
         yield mock_manager
 
-def test_get_running_containers_no_containers(mock_subprocess_run, mock_ac_output_manager):
-    # Arrange
-    mock_subprocess_run.return_value.stdout = json.dumps({
-        "Names": "fake_project_container",
-        "Status": "Up 5 minutes"
-    }) + "\n"
-    project_name = "test_project"
-    project_name_urlsafe = "test_project"
+def test_list_filters_by_compose_project_label(engine):
+    containers = list_project_containers("test_project", AcDockerClient(engine.docker_host))
 
-    # Act
-    get_running_containers(project_name, project_name_urlsafe)
+    # test_project2 shares a prefix with test_project but is not included
+    assert [container.name for container in containers] == ["db-testproject", "testproject"]
+    path, query = engine.requests[0]
+    assert path == "/containers/json"
+    assert json.loads(query["filters"]) == {"label": ["com.docker.compose.project=test_project"]}
 
-    # Assert
-    mock_ac_output_manager.complete_step.assert_called_once_with(f"No {project_name} containers running.")
+def test_container_details(engine):
+    db, app = list_project_containers("test_project", AcDockerClient(engine.docker_host), restart_counts=True)
 
-def test_get_running_containers_with_project_containers(mock_subprocess_run, mock_ac_output_manager):
-    # Arrange
-    mock_subprocess_run.return_value.stdout = json.dumps({
-        "Names": "test_project_container",
-        "Status": "Up 5 minutes"
-    }) + "\n"
-    project_name = "test_project"
-    project_name_urlsafe = "test_project"
+    assert db.health == "healthy"
+    assert db.uptime == "5 minutes"
+    assert db.ports == ["5433->5432/tcp"]
+    assert db.restart_count == 0
+    assert app.state == "restarting"
+    assert app.restart_count == 4
+    assert app.uptime is None
 
-    # Act
-    get_running_containers(project_name, project_name_urlsafe)
+def test_get_running_containers_with_project_containers(engine, mock_ac_output_manager):
+    get_running_containers("test_project", client=AcDockerClient(engine.docker_host))
 
-    # Assert
     mock_ac_output_manager.write.assert_called_once()
-    assert "🟢 Running" in mock_ac_output_manager.write.call_args[0][0].get_string()
+    table = mock_ac_output_manager.write.call_args[0][0].get_string()
+    assert "🟢 Running" in table
+    assert "🟢 healthy" in table
+    assert "🟡 Restarting" in table
+    assert "5433->5432/tcp" in table
 
-def test_get_running_containers_without_project_containers(mock_subprocess_run, mock_ac_output_manager):
-    # Arrange
-    mock_subprocess_run.return_value.stdout = json.dumps({
-        "Names": "other_project_container",
-        "Status": "Up 5 minutes"
+def test_get_running_containers_no_containers(engine, mock_ac_output_manager):
+    get_running_containers("other_project", client=AcDockerClient(engine.docker_host))
+
+    mock_ac_output_manager.complete_step.assert_called_once_with("No other_project containers running.")
+
+def test_all_projects_status_uses_one_request(engine, mock_ac_output_manager):
+    get_all_projects_status(["test_project", "test_project2", "empty_project"], client=AcDockerClient(engine.docker_host))
+
+    assert len(engine.requests) == 1
+    assert json.loads(engine.requests[0][1]["filters"]) == {"label": ["com.docker.compose.project"]}
+    rows = mock_ac_output_manager.write.call_args[0][0].rows
+    assert rows == [
+        ["test_project", "🟡 Degraded", 1, 0, 1, 0],
+        ["test_project2", "🔴 Stopped", 0, 0, 0, 1],
+        ["empty_project", "⚪ No containers", 0, 0, 0, 0],
+    ]
+
+def test_api_error_is_raised_for_error_responses(fake_docker):
+    with pytest.raises(AcDockerApiError, match="404"):
+        AcDockerClient(fake_docker.docker_host).inspect_container("missing")
+
+def test_falls_back_to_cli_when_engine_unreachable(tmp_path):
+    cli_output = json.dumps({
+        "ID": "abc",
+        "Names": "db-testproject",
+        "State": "running",
+        "Status": "Up 2 hours (unhealthy)",
+        "Ports": "0.0.0.0:5433->5432/tcp, [::]:5433->5432/tcp",
+        "Labels": "com.docker.compose.project=test_project,com.docker.compose.service=db-testproject",
     }) + "\n"
-    project_name = "test_project"
-    project_name_urlsafe = "test_project"
+    client = AcDockerClient(f"unix://{tmp_path}/missing.sock")
+    with patch("arches_containers.utils.docker_api.subprocess.run") as mock_run:
+        mock_run.return_value.returncode = 0
+        mock_run.return_value.stdout = cli_output
+        [container] = list_project_containers("test_project", client)
 
-    # Act
-    get_running_containers(project_name, project_name_urlsafe)
+    assert "label=com.docker.compose.project=test_project" in mock_run.call_args[0][0]
+    assert container.health == "unhealthy"
+    assert container.service == "db-testproject"
+    assert container.ports == ["5433->5432/tcp"]
+
+def test_get_running_containers_exception_handling(mock_ac_output_manager):
+    # Arrange
+    with patch("arches_containers.utils.docker_api.list_project_containers", side_effect=Exception("Test exception")):
+        # Act
+        get_running_containers("test_project", "test_project")
 
     # Assert
-    mock_ac_output_manager.complete_step.assert_called_once_with(f"No {project_name} containers running.")
+    mock_ac_output_manager.fail.assert_called_once_with("An error occurred fetching status: Test exception")
 
-def test_get_running_containers_exception_handling(mock_subprocess_run, mock_ac_output_manager):
-    # Arrange
-    mock_subprocess_run.side_effect = Exception("Test exception")
-    project_name = "test_project"
-    project_name_urlsafe = "test_project"
+def test_docker_host_tcp_and_unsupported(monkeypatch):
+    monkeypatch.delenv("DOCKER_TLS_VERIFY", raising=False)
+    assert AcDockerClient("tcp://127.0.0.1:2375")._address == ("127.0.0.1", 2375)
+    with pytest.raises(AcDockerApiError):
+        AcDockerClient("npipe:////./pipe/docker_engine")
 
-    # Act
-    get_running_containers(project_name, project_name_urlsafe)
+def test_list_falls_back_to_the_cli_without_unix_sockets(monkeypatch):
+    monkeypatch.delattr("arches_containers.utils.docker_api.socket.AF_UNIX", raising=False)
+    with pytest.raises(AcDockerApiError, match="Unix sockets are not supported"):
+        AcDockerClient("unix:///var/run/docker.sock")
 
-    # Assert
-    mock_ac_output_manager.fail.assert_called_once_with("An error occurred fetching status: Test exception")
\ No newline at end of file
+    monkeypatch.setenv("DOCKER_HOST", "unix:///var/run/docker.sock")
+    with patch("arches_containers.utils.docker_api._list_with_cli", return_value=[]) as mock_cli:
+        assert list_project_containers("test_project") == []
+    mock_cli.assert_called_once()
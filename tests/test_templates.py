@@ -0,0 +1,405 @@
+import os
+import sys
+import json
+import importlib.util
+import fnmatch
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.templates import (
+    TEMPLATE_PATH,
+    MANIFEST_PATH,
+    build_manifest,
+    load_manifest,
+    get_template,
+    get_template_folder,
+    get_supported_versions,
+    render_content,
+    render_template,
+    materialise_project,
+)
+
+@pytest.fixture
+def fake_templates(tmp_path):
+    """Creates a template directory with versions whose names are substrings of each other"""
+    for version in ["7.1", "7.10", "17.1"]:
+        directory = tmp_path / f"_{version}_"
+        (directory / "docker").mkdir(parents=True)
+        (directory / "config.json").write_text(json.dumps({"arches_repo_branch": f"dev/{version}.x"}))
+        (directory / "docker" / "entrypoint.sh").write_text(f"echo {version}")
+    (tmp_path / "not_a_template").mkdir()
+    return str(tmp_path)
+
+def test_committed_manifest_is_up_to_date():
+    '''
+    manifest.json must be regenerated with `python -m arches_containers.utils.templates` whenever a template changes.
+    '''
+    with open(MANIFEST_PATH) as f:
+        committed = json.load(f)
+    assert committed == build_manifest(TEMPLATE_PATH)
+
+def test_lookup_is_exact_match(fake_templates):
+    assert get_template_folder("7.1", fake_templates) == os.path.join(fake_templates, "_7.1_")
+    assert get_template_folder("7.10", fake_templates) == os.path.join(fake_templates, "_7.10_")
+    assert get_template("7", fake_templates) is None
+    assert get_template("1.1", fake_templates) is None
+
+def test_versions_sorted_numerically(fake_templates):
+    assert get_supported_versions(fake_templates) == ["7.1", "7.10", "17.1"]
+
+def test_manifest_records_files_and_hashes(fake_templates):
+    template = get_template("7.10", fake_templates)
+    assert template["default_branch"] == "dev/7.10.x"
+    assert set(template["files"]) == {"config.json", "docker/entrypoint.sh"}
+    assert all(len(digest) == 64 for digest in template["files"].values())
+
+def test_load_manifest_does_not_walk_templates():
+    load_manifest()
+    with patch("arches_containers.utils.templates.os.walk") as mock_walk:
+        assert get_template_folder("7.6") == os.path.join(TEMPLATE_PATH, "_7.6_")
+        mock_walk.assert_not_called()
+
+def test_unsupported_version_returns_none():
+    assert get_template("5.2") is None
+    assert get_template_folder(None) is None
+
+def test_render_content_substitutes_placeholders_and_platform():
+    content = "name: {{project}}\nhost: db-{{project_urlsafe}}\n  #platform: linux/arm64\n"
+    rendered = render_content("docker-compose.yml", content, "my_project", "myproject", arm64=True)
+    assert rendered == "name: my_project\nhost: db-myproject\n  platform: linux/arm64\n"
+    # platform lines are only touched in compose files
+    assert "#platform" in render_content("docker/env_file.env", content, "my_project", "myproject", arm64=True)
+
+def test_materialise_project_reads_each_file_once(tmp_path):
+    target = tmp_path / "my_project"
+    template = get_template("7.6")
+    with patch("arches_containers.utils.templates.open", wraps=open) as mock_open:
+        materialise_project("7.6", str(target), "my_project", "myproject")
+
+    read_calls = [call for call in mock_open.call_args_list if call.args[1] == "r"]
+    assert len(read_calls) == len(template["files"])
+    assert os.access(target / "docker" / "entrypoint.sh", os.X_OK) == os.access(
+        os.path.join(get_template_folder("7.6"), "docker", "entrypoint.sh"), os.X_OK
+    )
+    with open(target / "config.json") as f:
+        assert json.load(f)["project_name"] == "my_project"
+
+def test_materialise_project_failure_leaves_no_partial_project(tmp_path):
+    target = tmp_path / "my_project"
+    rendered = []
+
+    def failing_render(*args, **kwargs):
+        for item in render_template(*args, **kwargs):
+            if len(rendered) == 3:
+                raise OSError("disk full")
+            rendered.append(item)
+            yield item
+
+    with patch("arches_containers.utils.templates.render_template", failing_render):
+        with pytest.raises(OSError):
+            materialise_project("7.6", str(target), "my_project", "myproject")
+
+    assert os.listdir(tmp_path) == []
+
+def stage_instructions(dockerfile, name):
+    '''
+    Returns the instructions of one build stage, with continuation lines joined so each instruction is one line.
+    '''
+    instructions = [line for line in dockerfile.replace("\\\n", " ").splitlines() if line and not line.startswith("#")]
+    start = instructions.index(next(line for line in instructions if line.startswith("FROM ") and line.endswith(f" AS {name}")))
+    end = next((index for index in range(start + 1, len(instructions)) if instructions[index].startswith("FROM ")), len(instructions))
+    return instructions[start:end]
+
+@pytest.fixture
+def rendered(version):
+    '''
+    Returns the files of a version's template rendered for a project named "demo", by relative path.
+    '''
+    return dict((path, content) for path, content, mode in render_template(version, "demo", "demo"))
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_dependency_services_define_healthchecks(version, rendered):
+    yaml = pytest.importorskip("yaml")
+    for compose_file in ["docker-compose-dependencies.yml", "docker-compose-persist-dependencies.yml"]:
+        services = yaml.safe_load(rendered[compose_file])["services"]
+        for service in ["db-demo", "elasticsearch-demo", "rabbitmq-demo"]:
+            assert "test" in services[service]["healthcheck"], f"{compose_file}: {service}"
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_dockerfile_installs_use_cache_mounts(version, rendered):
+    with open(os.path.join(get_template_folder(version), "Dockerfile.base"), "r") as f:
+        base_dockerfile = f.read()
+    for dockerfile in [rendered["Dockerfile"], base_dockerfile]:
+        assert dockerfile.startswith("# syntax=docker/dockerfile:1")
+        assert "rm -rf /root/.cache/pip" not in dockerfile
+        # join continuation lines so each RUN instruction is checked as a whole
+        instructions = dockerfile.replace("\\\n", " ").splitlines()
+        for instruction in instructions:
+            if not instruction.startswith("RUN "):
+                continue
+            # installing from the local wheels of a builder stage downloads nothing worth caching
+            if "pip install" in instruction and "--no-cache-dir" not in instruction:
+                assert "target=/root/.cache/pip" in instruction, instruction
+            if "apt-get install" in instruction or "apt install" in instruction:
+                assert "target=/var/cache/apt" in instruction, instruction
+            if "npm install" in instruction:
+                assert "target=/root/.npm" in instruction, instruction
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_project_dockerfile_builds_from_the_versioned_base_image(version, rendered):
+    instructions = [line for line in rendered["Dockerfile"].splitlines() if line and not line.startswith("#")]
+    assert instructions[0] == f"ARG BASE_IMAGE=arches-containers/base:{version}"
+    # the development image is the last stage, so it is what 'docker compose build' builds
+    assert [line for line in instructions if line.startswith("FROM ")][-1] == "FROM ${BASE_IMAGE} AS dev"
+    # the base image is built by the tool, not copied into projects
+    assert "Dockerfile.base" not in rendered
+    with open(os.path.join(get_template_folder(version), "Dockerfile.base"), "r") as f:
+        base_dockerfile = f.read()
+    assert f'LABEL org.archescontainers.base.version="{version}"' in base_dockerfile
+    assert "$ARCHES_PATH" not in base_dockerfile
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_dockerfile_installs_dependencies_before_copying_the_source(version, rendered):
+    instructions = stage_instructions(rendered["Dockerfile"], "dev")
+    source_copy = instructions.index("COPY $ARCHES_PATH ${ARCHES_ROOT}")
+    manifest_copy = next(index for index, instruction in enumerate(instructions) if instruction.startswith("COPY $ARCHES_PATH/"))
+    dependency_install = next(index for index, instruction in enumerate(instructions) if instruction.startswith("RUN ") and "requirements" in instruction)
+    assert manifest_copy < dependency_install < source_copy
+    # nothing after the source copy resolves the full dependency set again
+    assert not any("requirements" in instruction for instruction in instructions[source_copy:])
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_runtime_stage_ships_no_build_toolchain(version, rendered):
+    runtime = stage_instructions(rendered["Dockerfile"], "runtime")
+    assert "slim" in runtime[0] and "BASE_IMAGE" not in runtime[0]
+    for excluded in ["build-essential", "libgdal-dev", "nvm", "npm", "yarn", "[dev]", "requirements_dev"]:
+        assert not any(excluded in instruction for instruction in runtime), excluded
+    # everything compiled comes from the builder stages
+    assert any("from=wheels" in instruction for instruction in runtime)
+    assert "COPY --from=assets ${STATIC_ROOT} ${STATIC_ROOT}" in runtime
+    assert runtime[-2:] == ['CMD ["run_gunicorn"]', "EXPOSE 8000"]
+    assert "run_gunicorn)" in rendered["docker/entrypoint.sh"]
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_app_service_reads_the_server_mode_from_the_environment(version, rendered):
+    yaml = pytest.importorskip("yaml")
+    service = yaml.safe_load(rendered["docker-compose.yml"])["services"]["demo"]
+    assert "ARCHES_SERVER_MODE=${ARCHES_SERVER_MODE:-debug}" in service["environment"]
+    assert "GUNICORN_WORKERS=${GUNICORN_WORKERS:-}" in service["environment"]
+    config = json.loads(rendered["config.json"])
+    assert config["server_workers"] is None and config["server_threads"] is None
+    entrypoint = rendered["docker/entrypoint.sh"]
+    # the debug server stays the default, with debugpy baked into the image and only started on demand
+    assert "pip install debugpy" not in entrypoint
+    assert 'if [[ "${ARCHES_DEBUGPY}" == "True" ]]' in entrypoint
+    assert "exec python3 manage.py runserver" in entrypoint
+    assert "ARCHES_DEBUGPY=${ARCHES_DEBUGPY:-False}" in service["environment"]
+    assert any(line.startswith("RUN ") and "pip install" in line and "debugpy" in line for line in stage_instructions(rendered["Dockerfile"], "dev"))
+    assert 'if [[ "${ARCHES_SERVER_MODE}" == "perf" ]]' in entrypoint
+
+@pytest.fixture
+def import_project_settings(tmp_path, monkeypatch):
+    '''
+    Returns a function that imports the settings of a stub "demo" project with the rendered settings_local.py copied in, as the entrypoint does.
+    '''
+    modules = set(sys.modules)
+    if importlib.util.find_spec("django") is None:
+        # settings_local only needs ImproperlyConfigured from django
+        (tmp_path / "django" / "core").mkdir(parents=True)
+        (tmp_path / "django" / "__init__.py").write_text("")
+        (tmp_path / "django" / "core" / "__init__.py").write_text("")
+        (tmp_path / "django" / "core" / "exceptions.py").write_text("class ImproperlyConfigured(Exception):\n    pass\n")
+    # the project's settings.py imports settings_local at its end, as the project template arches generates does
+    (tmp_path / "demo").mkdir()
+    (tmp_path / "demo" / "__init__.py").write_text("")
+    (tmp_path / "demo" / "settings.py").write_text(
+        "DEBUG = True\n"
+        'MIDDLEWARE = ["django.middleware.security.SecurityMiddleware", "django.middleware.common.CommonMiddleware"]\n'
+        "try:\n    from .settings_local import *\nexcept ImportError:\n    pass\n"
+    )
+    for variable in ["DJANGO_MODE", "PGDBNAME", "PGUSERNAME", "PGPASSWORD", "PGHOST", "PGPORT", "RABBITMQ_USER", "RABBITMQ_PASS", "RABBITMQ_HOST",
+                     "COUCHDB_USER", "COUCHDB_PASS", "COUCHDB_HOST", "COUCHDB_PORT", "CANTALOUPE_HOST", "CANTALOUPE_PORT", "ESHOST",
+                     "DOMAIN_NAMES", "PUBLIC_SERVER_PROJECT_NAME", "ARCHES_PROJECT", "DJANGO_PORT"]:
+        monkeypatch.setenv(variable, "demo")
+    monkeypatch.setenv("DJANGO_DEBUG", "True")
+    monkeypatch.setenv("ESPORT", "9200")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def import_settings(settings_local):
+        (tmp_path / "demo" / "settings_local.py").write_text(settings_local)
+        return importlib.import_module("demo.settings")
+
+    yield import_settings
+    for name in set(sys.modules) - modules:
+        del sys.modules[name]
+
+@pytest.mark.parametrize("version", get_supported_versions())
+@pytest.mark.parametrize("server_mode", ["perf", "debug"])
+def test_perf_mode_settings_serve_static_files_with_whitenoise(version, rendered, server_mode, import_project_settings, monkeypatch):
+    monkeypatch.setenv("ARCHES_SERVER_MODE", server_mode)
+    settings = import_project_settings(rendered["docker/settings_local.py"])
+    if server_mode == "perf":
+        assert settings.DEBUG is False
+        assert settings.MIDDLEWARE == [
+            "django.middleware.security.SecurityMiddleware",
+            "whitenoise.middleware.WhiteNoiseMiddleware",
+            "django.middleware.common.CommonMiddleware",
+        ]
+    else:
+        assert settings.DEBUG is True
+        assert "whitenoise.middleware.WhiteNoiseMiddleware" not in settings.MIDDLEWARE
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_node_packages_install_once_into_a_shared_cache(version, rendered):
+    yaml = pytest.importorskip("yaml")
+    compose = yaml.safe_load(rendered["docker-compose.yml"])
+    assert compose["volumes"]["arches-node-cache"]["name"] == f"arches-containers-node-cache-{version}"
+    node_services = [name for name in ["demo", "demo-webpack"] if name in compose["services"]]
+    for name in node_services:
+        service = compose["services"][name]
+        assert "arches-node-cache:/var/cache/arches-node" in service["volumes"], name
+        assert "NODE_CACHE_DIR=/var/cache/arches-node" in service["environment"], name
+    entrypoint = rendered["docker/entrypoint.sh"]
+    # every install goes through the hash check, including the one the webpack container runs
+    assert "flock 9" in entrypoint
+    assert "npm install &&" not in entrypoint and "yarn install &&" not in entrypoint
+    assert entrypoint.count("install_node_packages ") == len(node_services)
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_entrypoint_waits_for_dependencies_in_parallel_with_a_deadline(version, rendered):
+    entrypoint = rendered["docker/entrypoint.sh"]
+    assert "wait_for_db" not in entrypoint
+    assert "DEPENDENCY_TIMEOUT=${DEPENDENCY_TIMEOUT:-300}" in entrypoint
+    checks = [line for line in entrypoint.splitlines() if line.strip().startswith("wait_for_dependency ")]
+    assert [line.split('"')[1] for line in checks] == ["Postgres", "Elasticsearch", "RabbitMQ"]
+    assert all(line.endswith("&") for line in checks)
+    # init_arches waits again after the dispatcher has, so later calls must return straight away
+    assert "if [[ -n ${DEPENDENCIES_READY} ]]; then" in entrypoint
+
+STUB_COMMAND = '''#!/bin/bash
+# logs its arguments and fails until it has been called more than $STUB_FAILURES_<NAME> times
+name=$(basename "$0")
+echo "$*" >> "${STUB_DIR}/${name}.calls"
+if [[ ${name} == npm ]]; then
+	mkdir -p node_modules
+fi
+failures=STUB_FAILURES_${name^^}
+(( $(wc -l < "${STUB_DIR}/${name}.calls") > ${!failures:-0} ))
+'''
+
+@pytest.fixture
+def run_entrypoint(tmp_path):
+    '''
+    Returns a function that sources the functions of a rendered entrypoint.sh in bash and runs a script against them, with psql, curl,
+    timeout and npm replaced by stubs and sleep only advancing bash's clock. Returns the completed process and the calls to each stub.
+    '''
+    if shutil.which("bash") is None or shutil.which("flock") is None:
+        pytest.skip("needs bash and flock")
+    stub_dir = tmp_path / "bin"
+    stub_dir.mkdir()
+    for command in ["psql", "curl", "timeout", "npm"]:
+        (stub_dir / command).write_text(STUB_COMMAND)
+        (stub_dir / command).chmod(0o755)
+    (tmp_path / "demo").mkdir()
+
+    def run(entrypoint, script, **env):
+        (tmp_path / "entrypoint.sh").write_text(entrypoint)
+        driver = (
+            "source <(sed '/^### Starting point ###/q' \"${WEB_ROOT}/entrypoint.sh\")\n"
+            'sleep() { echo "$1" >> "${STUB_DIR}/sleep.calls"; SECONDS=$(( SECONDS + $1 )); }\n'
+            + script
+        )
+        environment = dict(os.environ, PATH=f"{stub_dir}{os.pathsep}{os.environ['PATH']}", STUB_DIR=str(stub_dir),
+                           WEB_ROOT=str(tmp_path), ARCHES_PROJECT="demo", NODE_CACHE_DIR=str(tmp_path / "cache"), **env)
+        result = subprocess.run(["bash", "-c", driver], env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=60)
+        calls = {path.stem: path.read_text().splitlines() for path in stub_dir.glob("*.calls")}
+        return result, calls
+
+    return run
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_entrypoint_backs_off_until_the_dependencies_are_ready(version, rendered, run_entrypoint):
+    result, calls = run_entrypoint(rendered["docker/entrypoint.sh"], "wait_for_dependencies\nwait_for_dependencies\n", STUB_FAILURES_PSQL="2")
+
+    assert result.returncode == 0, result.stdout
+    assert all(f"{name} is up after " in result.stdout for name in ["Postgres", "Elasticsearch", "RabbitMQ"])
+    assert calls["sleep"] == ["1", "2"]
+    # the second call returns straight away
+    assert len(calls["psql"]) == 3 and len(calls["curl"]) == 1 and len(calls["timeout"]) == 1
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_entrypoint_gives_up_on_a_dependency_after_the_timeout(version, rendered, run_entrypoint):
+    result, calls = run_entrypoint(rendered["docker/entrypoint.sh"], "wait_for_dependencies\necho still running\n",
+                                   STUB_FAILURES_PSQL="1000", DEPENDENCY_TIMEOUT="20")
+
+    assert result.returncode == 1
+    assert "Postgres is not ready after 20s" in result.stdout and "Exiting..." in result.stdout
+    assert "still running" not in result.stdout
+    # the delay doubles up to the next attempt that would pass the deadline
+    assert calls["sleep"] == ["1", "2", "4", "8"]
+    assert len(calls["psql"]) == 5
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_entrypoint_skips_node_installs_while_the_package_files_are_unchanged(version, rendered, run_entrypoint, tmp_path):
+    (tmp_path / "demo" / "package.json").write_text('{"name": "demo"}')
+    script = (
+        'install_node_packages "${WEB_ROOT}/demo" npm\n' * 3
+        + 'echo \'{"name": "demo", "version": "2"}\' > "${WEB_ROOT}/demo/package.json"\n'
+        + 'install_node_packages "${WEB_ROOT}/demo" npm\n'
+    )
+    result, calls = run_entrypoint(rendered["docker/entrypoint.sh"], script, STUB_FAILURES_NPM="1")
+
+    assert result.returncode == 0, result.stdout
+    # a failed install leaves no hash, so the next start installs again; then only the package.json change does
+    assert calls["npm"] == ["install"] * 3
+    assert result.stdout.count("up to date, skipping npm install") == 1
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_project_builds_from_a_worktree_checkout(version, tmp_path, monkeypatch):
+    yaml = pytest.importorskip("yaml")
+    for variable, value in [("GIT_AUTHOR_NAME", "Test"), ("GIT_COMMITTER_NAME", "Test"), ("GIT_AUTHOR_EMAIL", "test@example.com"), ("GIT_COMMITTER_EMAIL", "test@example.com")]:
+        monkeypatch.setenv(variable, value)
+    git = lambda *args: subprocess.run(["git", *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    git("init", "-q", str(tmp_path / "arches"))
+    git("-C", str(tmp_path / "arches"), "commit", "-q", "--allow-empty", "-m", "arches")
+    git("-C", str(tmp_path / "arches"), "worktree", "add", "-q", "--detach", str(tmp_path / "demo-arches"))
+    # a worktree's .git is a pointer to the shared clone on the host, which git cannot follow inside the build
+    assert (tmp_path / "demo-arches" / ".git").is_file()
+
+    project_path = tmp_path / ".arches_containers" / "demo"
+    project_path.parent.mkdir()
+    materialise_project(version, str(project_path), "demo", "demo")
+    build_args = yaml.safe_load((project_path / "docker-compose.yml").read_text())["services"]["demo"]["build"]["args"]
+    arches_path = next(arg.split("=", 1)[1] for arg in build_args if arg.startswith("ARCHES_PATH="))
+    assert (tmp_path / arches_path).resolve() == (tmp_path / "demo-arches").resolve()
+
+    patterns = [line for line in (project_path / "Dockerfile.dockerignore").read_text().splitlines() if line and not line.startswith("#")]
+    assert any(fnmatch.fnmatch(f"{os.path.normpath(arches_path)}/.git", pattern) for pattern in patterns)
+    dockerfile = (project_path / "Dockerfile").read_text().replace("\\\n", " ")
+    assert not [line for line in dockerfile.splitlines() if line.startswith("RUN ") and ("pre-commit" in line or "git " in line)]
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_nginx_starts_before_the_application_container(version, rendered):
+    '''
+    nginx is in the dependencies file, which 'act up' brings up with --wait before the application container exists,
+    so its upstreams must be resolved per request: a literal proxy_pass host makes nginx exit with "host not found in upstream".
+    '''
+    for config in ["docker/nginx-config/default.conf", "docker/nginx-config/default_with_pg_serv.conf"]:
+        lines = [line.strip() for line in rendered[config].splitlines()]
+        assert "resolver 127.0.0.11 valid=10s ipv6=off;" in lines, config
+        proxy_passes = [line for line in lines if line.startswith("proxy_pass ")]
+        assert proxy_passes and all(line.startswith("proxy_pass $") for line in proxy_passes), config
+
+@pytest.mark.parametrize("version", get_supported_versions())
+def test_compose_files_publish_the_project_ports(version, rendered):
+    '''
+    Every published host port is read from the project's .env, so projects with different port offsets can run side by side.
+    '''
+    yaml = pytest.importorskip("yaml")
+    from arches_containers.utils.ports import PROJECT_PORTS
+    for compose_file in [path for path in rendered if path.startswith("docker-compose")]:
+        for name, service in yaml.safe_load(rendered[compose_file])["services"].items():
+            for mapping in service.get("ports", []):
+                variable, default = mapping.split("}")[0].lstrip("${").split(":-")
+                assert PROJECT_PORTS[variable] == int(default), f"{compose_file}: {name} {mapping}"
@@ -0,0 +1,105 @@
+import json
+import threading
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.timing import (
+    timing_run,
+    timed_phase,
+    load_history,
+    compute_stats,
+    percentile,
+    report_stats,
+)
+
+def record(project, phases, status="ok", command="up"):
+    return {"project": project, "command": command, "status": status, "total": sum(phases.values()), "phases": phases}
+
+def test_phases_are_recorded_to_history(tmp_path):
+    history_path = str(tmp_path / "timings.jsonl")
+    with timing_run("restart", "demo", history_path):
+        with timed_phase("git_checkout"):
+            pass
+        for _ in range(2):
+            with timed_phase("compose_up_app"):
+                pass
+
+    [entry] = load_history(history_path)
+    assert entry["command"] == "restart"
+    assert entry["project"] == "demo"
+    assert entry["status"] == "ok"
+    assert set(entry["phases"]) == {"git_checkout", "compose_up_app"}
+
+def test_failed_run_is_recorded_as_failed(tmp_path):
+    history_path = str(tmp_path / "timings.jsonl")
+    with pytest.raises(SystemExit):
+        with timing_run("up", "demo", history_path):
+            with timed_phase("compose_up_dependencies"):
+                raise SystemExit(1)
+
+    [entry] = load_history(history_path)
+    assert entry["status"] == "failed"
+    assert "compose_up_dependencies" in entry["phases"]
+
+def test_timed_phase_without_run_does_nothing(tmp_path):
+    with timed_phase("git_checkout"):
+        pass
+
+def test_concurrent_runs_are_kept_apart(tmp_path):
+    from contextvars import copy_context
+    history_path = str(tmp_path / "timings.jsonl")
+
+    def run(project):
+        with timing_run("up", project, history_path):
+            with timed_phase(f"phase_{project}"):
+                pass
+
+    threads = [threading.Thread(target=copy_context().run, args=(run, name)) for name in ["a", "b", "c"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = load_history(history_path)
+    assert sorted(entry["project"] for entry in entries) == ["a", "b", "c"]
+    assert all(list(entry["phases"]) == [f"phase_{entry['project']}"] for entry in entries)
+
+def test_load_history_skips_corrupt_lines(tmp_path):
+    history_path = tmp_path / "timings.jsonl"
+    history_path.write_text(json.dumps(record("demo", {"x": 1})) + "\n{not json\n")
+    assert len(load_history(str(history_path))) == 1
+
+def test_percentile():
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95) == pytest.approx(9.55)
+    assert percentile([], 50) is None
+
+def test_regression_is_flagged_against_baseline():
+    records = [record("demo", {"init_compose": seconds}, command="init") for seconds in [100, 102, 98, 101, 140]]
+    records.append(record("demo", {"init_compose": 500}, status="failed", command="init"))
+
+    stats = {item.phase: item for item in compute_stats(records)}
+
+    init_compose = stats["init_compose"]
+    assert init_compose.runs == 5
+    assert init_compose.baseline == 100.5
+    assert init_compose.regression
+    assert init_compose.change == pytest.approx(0.393, abs=0.001)
+
+def test_no_regression_without_enough_baseline_runs():
+    stats = compute_stats([record("demo", {"x": 1}), record("demo", {"x": 10})])
+    assert not any(item.regression for item in stats)
+
+def test_stats_are_filtered_by_project_and_command():
+    records = [record("a", {"x": 1}), record("b", {"x": 1}), record("a", {"x": 1}, command="down")]
+    stats = compute_stats(records, project_name="a", command="up")
+    assert {(item.project_name, item.command) for item in stats} == {("a", "up")}
+
+def test_report_stats_flags_regressions(tmp_path):
+    history_path = tmp_path / "timings.jsonl"
+    history_path.write_text("".join(json.dumps(record("demo", {"x": seconds})) + "\n" for seconds in [10, 10, 10, 20]))
+    with patch("arches_containers.utils.logger.AcOutputManager") as mock_output:
+        report_stats(str(history_path))
+
+    table = mock_output.write.call_args.args[0]
+    assert "🔴 +100%" in table
+    assert mock_output.failed_step.call_count == 2  # the phase and the total
@@ -0,0 +1,175 @@
+import sys
+import json
+import time
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.docker_api import AcDockerClient, list_project_containers
+from arches_containers.main import main
+from arches_containers.utils.top import compute_container_stats, format_bytes, take_snapshot, write_snapshot, run_top, AcStatsCollector
+
+MIB = 1024 * 1024
+
+def stats_sample(cpu_total=400, system_total=4000, memory_usage=600 * MIB, cache=100 * MIB, limit=2048 * MIB):
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": cpu_total}, "system_cpu_usage": system_total, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 200}, "system_cpu_usage": 2000},
+        "memory_stats": {"usage": memory_usage, "limit": limit, "stats": {"inactive_file": cache}},
+        "blkio_stats": {"io_service_bytes_recursive": [
+            {"major": 8, "minor": 0, "op": "read", "value": 10 * MIB},
+            {"major": 8, "minor": 0, "op": "write", "value": 2 * MIB},
+            {"major": 8, "minor": 16, "op": "Read", "value": 5 * MIB},
+        ]},
+        "networks": {"eth0": {"rx_bytes": 1000, "tx_bytes": 500}, "eth1": {"rx_bytes": 24, "tx_bytes": 12}},
+    }
+
+def api_container(name, state="running"):
+    return {
+        "Id": f"id-{name}",
+        "Names": [f"/{name}"],
+        "State": state,
+        "Status": "Up 1 minute" if state == "running" else "Exited (0) 1 minute ago",
+        "Ports": [],
+        "Labels": {"com.docker.compose.project": "test_project", "com.docker.compose.service": name},
+    }
+
+@pytest.fixture
+def engine(fake_docker):
+    fake_docker.routes["/containers/json"] = lambda query: [api_container("elasticsearch-testproject"), api_container("db-testproject"), api_container("celery-testproject", "exited")]
+    fake_docker.routes["/containers/id-db-testproject/stats"] = lambda query: stats_sample()
+    fake_docker.routes["/containers/id-elasticsearch-testproject/stats"] = lambda query: stats_sample(cpu_total=1200, memory_usage=1800 * MIB, cache=0)
+    return fake_docker
+
+def test_compute_container_stats():
+    row = compute_container_stats("db", stats_sample())
+
+    # 200 of 2000 system ticks on 4 cpus
+    assert row["cpu_percent"] == 40.0
+    # the reclaimable page cache is not counted
+    assert row["memory_usage"] == 500 * MIB
+    assert row["memory_limit"] == 2048 * MIB
+    assert row["memory_percent"] == pytest.approx(24.41, abs=0.01)
+    assert row["block_read"] == 15 * MIB
+    assert row["block_write"] == 2 * MIB
+    assert row["net_rx"] == 1024
+    assert row["net_tx"] == 512
+
+def test_compute_container_stats_without_a_previous_sample():
+    sample = stats_sample()
+    sample["precpu_stats"] = {}
+    sample["cpu_stats"]["system_cpu_usage"] = 0
+    del sample["networks"]
+
+    row = compute_container_stats("db", sample)
+
+    assert row["cpu_percent"] == 0.0
+    assert row["net_rx"] == 0
+
+def test_format_bytes():
+    assert format_bytes(512) == "512B"
+    assert format_bytes(1536) == "1.5KiB"
+    assert format_bytes(2048 * MIB) == "2.0GiB"
+    assert format_bytes(None) == "-"
+
+def test_take_snapshot_only_samples_running_containers(engine):
+    rows, errors = take_snapshot("test_project", AcDockerClient(engine.docker_host))
+
+    assert [row["name"] for row in rows] == ["db-testproject", "elasticsearch-testproject"]
+    assert rows[1]["cpu_percent"] == 200.0
+    stats_requests = [(path, query) for path, query in engine.requests if path.endswith("/stats")]
+    assert all(query == {"stream": "0"} for _, query in stats_requests)
+    assert not any("celery" in path for path, _ in stats_requests)
+    assert errors == {}
+
+def test_snapshot_records_containers_whose_stats_cannot_be_read(engine, tmp_path):
+    engine.routes["/containers/id-db-testproject/stats"] = None
+    output_path = tmp_path / "snapshot.json"
+    with patch("arches_containers.utils.top.AcOutputManager"):
+        write_snapshot("test_project", str(output_path), AcDockerClient(engine.docker_host))
+
+    snapshot = json.loads(output_path.read_text())
+    assert [row["name"] for row in snapshot["containers"]] == ["elasticsearch-testproject"]
+    assert snapshot["errors"]["db-testproject"].startswith("Docker engine returned 404")
+
+    with patch("arches_containers.utils.top.AcOutputManager") as mock_output:
+        mock_output.return_value.spinner.interactive = False
+        run_top("test_project", client=AcDockerClient(engine.docker_host))
+    mock_output.failed_step.assert_called_once()
+    assert mock_output.failed_step.call_args.args[0].startswith("db-testproject: Docker engine returned 404")
+
+@pytest.mark.parametrize("interval", ["0", "-1"])
+def test_top_rejects_an_interval_that_is_not_positive(interval, capsys):
+    sys.argv = ["arches-containers", "top", "-i", interval]
+    with patch("arches_containers.main.AcWorkspace") as mock_workspace, pytest.raises(SystemExit):
+        main()
+    assert "argument -i/--interval: must be greater than 0" in capsys.readouterr().err
+    mock_workspace.assert_not_called()
+
+def test_write_snapshot_to_file(engine, tmp_path):
+    output_path = tmp_path / "snapshot.json"
+    with patch("arches_containers.utils.top.AcOutputManager"):
+        write_snapshot("test_project", str(output_path), AcDockerClient(engine.docker_host))
+
+    snapshot = json.loads(output_path.read_text())
+    assert snapshot["project"] == "test_project"
+    assert "timestamp" in snapshot
+    assert [row["name"] for row in snapshot["containers"]] == ["db-testproject", "elasticsearch-testproject"]
+
+def test_write_snapshot_to_stdout(engine, capsys):
+    write_snapshot("test_project", "-", AcDockerClient(engine.docker_host))
+
+    assert json.loads(capsys.readouterr().out)["project"] == "test_project"
+
+def test_collector_keeps_the_latest_streamed_sample(engine):
+    engine.routes["/containers/id-db-testproject/stats"] = [stats_sample(cpu_total=300), stats_sample(cpu_total=1000)]
+    client = AcDockerClient(engine.docker_host)
+    containers = [container for container in list_project_containers("test_project", client) if container.name == "db-testproject"]
+
+    collector = AcStatsCollector(client, containers).start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not (collector.rows() and collector.rows()[0]["cpu_percent"] == 160.0):
+        time.sleep(0.01)
+
+    assert collector.rows()[0]["cpu_percent"] == 160.0
+    assert ("/containers/id-db-testproject/stats", {"stream": "1"}) in engine.requests
+
+def test_run_top_writes_a_single_table_without_a_terminal(engine):
+    with patch("arches_containers.utils.top.AcOutputManager") as mock_manager:
+        mock_manager.return_value.spinner.interactive = False
+        run_top("test_project", client=AcDockerClient(engine.docker_host))
+
+    table = mock_manager.write.call_args[0][0].get_string()
+    assert "elasticsearch-testproject" in table
+    assert "1.8GiB / 2.0GiB" in table
+    assert "celery-testproject" not in table
+
+def test_run_top_without_running_containers(fake_docker):
+    fake_docker.routes["/containers/json"] = lambda query: []
+    with patch("arches_containers.utils.top.AcOutputManager") as mock_manager:
+        run_top("test_project", client=AcDockerClient(fake_docker.docker_host))
+
+    mock_manager.complete_step.assert_called_once_with("No test_project containers running.")
+
+def test_stream_failures_are_shown_under_the_table(engine):
+    from rich.console import Console
+    from arches_containers.utils.top import build_table
+    engine.routes["/containers/id-db-testproject/stats"] = None
+    client = AcDockerClient(engine.docker_host)
+    containers = [container for container in list_project_containers("test_project", client) if container.name == "db-testproject"]
+
+    collector = AcStatsCollector(client, containers).start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not collector.failures():
+        time.sleep(0.01)
+
+    console = Console(width=200, record=True)
+    console.print(build_table("test_project", collector.rows(), 2, collector.failures()))
+    assert "db-testproject: Docker engine returned 404" in console.export_text()
+
+def test_run_top_fails_when_the_engine_is_unreachable(tmp_path):
+    from arches_containers.utils.docker_api import AcDockerApiError
+    client = AcDockerClient(f"unix://{tmp_path}/missing.sock")
+    with patch("arches_containers.utils.docker_api._list_with_cli") as mock_cli, pytest.raises(AcDockerApiError):
+        run_top("test_project", client=client)
+    with pytest.raises(AcDockerApiError):
+        take_snapshot("test_project", client=client)
+    mock_cli.assert_not_called()
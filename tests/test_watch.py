@@ -0,0 +1,113 @@
+import json
+import time
+import pytest
+from unittest.mock import patch
+from arches_containers.utils.docker_api import AcDockerClient
+from arches_containers.utils.watch import AcStatusWatch, watch_status, RESTART_LOOP_DEATHS
+
+# well ahead of when the tests run, so watch_status never drops the events as older than its listing
+NOW = time.time_ns() + 3600 * 1_000_000_000
+
+def api_container(name, project="test_project", state="running", status="Up 1 minute"):
+    return {
+        "Id": f"id-{name}",
+        "Names": [f"/{name}"],
+        "State": state,
+        "Status": status,
+        "Ports": [],
+        "Labels": {"com.docker.compose.project": project, "com.docker.compose.service": name},
+    }
+
+def container_event(action, name, project="test_project", offset=0, **attributes):
+    attributes.update({"name": name, "com.docker.compose.project": project, "com.docker.compose.service": name})
+    return {"Type": "container", "Action": action, "Actor": {"ID": f"id-{name}", "Attributes": attributes}, "timeNano": NOW + offset * 1_000_000_000}
+
+def network_event(action, network, container_id, offset=0):
+    return {"Type": "network", "Action": action, "Actor": {"ID": "net-id", "Attributes": {"name": network, "container": container_id, "type": "bridge"}}, "timeNano": NOW + offset * 1_000_000_000}
+
+@pytest.fixture
+def watch():
+    return AcStatusWatch(["test_project"], ["testproject-network"])
+
+def test_container_lifecycle(watch):
+    assert watch.apply(container_event("create", "db-testproject")).endswith("db-testproject: created")
+    watch.apply(container_event("start", "db-testproject"))
+    db = watch.containers["id-db-testproject"]
+    assert db.state == "running"
+    assert db.health is None
+
+    watch.apply(container_event("health_status: starting", "db-testproject"))
+    watch.apply(container_event("health_status: healthy", "db-testproject"))
+    assert db.health == "healthy"
+
+    line = watch.apply(container_event("die", "db-testproject", exitCode="137"))
+    assert line.endswith("db-testproject: died (exit code 137)")
+    assert db.state == "exited"
+    assert db.state_label == "🔴 Stopped"
+
+    watch.apply(container_event("destroy", "db-testproject"))
+    assert watch.containers == {}
+
+def test_events_for_other_projects_are_ignored(watch):
+    assert watch.apply(container_event("start", "db-testproject2", project="test_project2")) is None
+    assert watch.apply(network_event("connect", "testproject2-network", "id-db-testproject2")) is None
+    assert watch.containers == {}
+
+def test_network_events_for_the_project_network(watch):
+    watch.apply(container_event("create", "db-testproject"))
+
+    line = watch.apply(network_event("disconnect", "testproject-network", "id-db-testproject"))
+
+    assert line.endswith("network testproject-network: disconnect db-testproject")
+
+def test_restart_loop_detection(watch):
+    for attempt in range(RESTART_LOOP_DEATHS):
+        watch.apply(container_event("start", "testproject", offset=attempt * 5))
+        line = watch.apply(container_event("die", "testproject", offset=attempt * 5 + 2, exitCode="1"))
+
+    app = watch.containers["id-testproject"]
+    assert app.restarts == RESTART_LOOP_DEATHS - 1
+    assert app.restart_loop
+    assert app.state_label == "🔴 Restart loop"
+    assert "restart loop" in line
+
+def test_slow_restarts_are_not_a_loop(watch):
+    for attempt in range(RESTART_LOOP_DEATHS):
+        watch.apply(container_event("start", "testproject", offset=attempt * 100))
+        watch.apply(container_event("die", "testproject", offset=attempt * 100 + 2, exitCode="1"))
+
+    assert not watch.containers["id-testproject"].restart_loop
+
+def test_restarted_container_keeps_its_healthcheck(watch):
+    watch.apply(container_event("start", "db-testproject"))
+    watch.apply(container_event("health_status: healthy", "db-testproject"))
+    watch.apply(container_event("die", "db-testproject", exitCode="0"))
+    watch.apply(container_event("start", "db-testproject"))
+
+    assert watch.containers["id-db-testproject"].health == "starting"
+
+def test_watch_status_subscribes_once_and_applies_events(fake_docker):
+    fake_docker.routes["/containers/json"] = lambda query: [api_container("db-testproject", status="Up 1 minute (health: starting)")]
+    fake_docker.routes["/events"] = [
+        {"Type": "container", "Action": "start", "Actor": {"ID": "id-old"}, "timeNano": 1},
+        container_event("health_status: healthy", "db-testproject"),
+        container_event("start", "testproject"),
+    ]
+
+    with patch("arches_containers.utils.watch.AcOutputManager") as mock_manager:
+        mock_manager.return_value.spinner.interactive = False
+        watch = watch_status({"test_project": "testproject"}, AcDockerClient(fake_docker.docker_host))
+
+    event_requests = [query for path, query in fake_docker.requests if path == "/events"]
+    assert len(event_requests) == 1
+    assert json.loads(event_requests[0]["filters"])["type"] == ["container", "network"]
+    assert "exec_start" not in json.loads(event_requests[0]["filters"])["event"]
+    assert int(event_requests[0]["since"]) <= time.time()
+
+    written = [call[0][0] for call in mock_manager.write.call_args_list]
+    assert written[0] == "db-testproject: running (starting)"
+    assert written[1].endswith("db-testproject: healthy")
+    assert written[2].endswith("testproject: started")
+    # the stream closing ends the watch
+    mock_manager.failed_step.assert_called_once()
+    assert {container.name for container in watch.containers.values()} == {"db-testproject", "testproject"}
@@ -8,7 +8,8 @@ from arches_containers.utils.workspace import (
     AcSettings, 
     AcProject, 
     AcProjectSettings,
-    AC_DIRECTORY_NAME
+    AC_DIRECTORY_NAME,
+    DEFAULT_AC_SETTINGS,
 )
 
 @pytest.fixture
@@ -70,6 +71,15 @@ class TestAcWorkspace:
         if line2 is not None:
             assert line2.strip().startswith("#platform: linux/arm64")
 
+    def test_create_project_unsupported_version(self, temp_workspace):
+        class Args:
+            version = "5.0"
+            organization = None
+            branch = None
+        with pytest.raises(SystemExit):
+            temp_workspace.create_project("test_project", Args())
+        assert "test_project" not in temp_workspace.list_projects()
+
     @pytest.mark.parametrize("version", ["7.6", "8.0"])
     def test_export_project(self, workspace_with_project, tmp_path, monkeypatch, version):
         workspace, project_name = workspace_with_project
@@ -102,13 +112,133 @@ class TestAcWorkspace:
         if line is not None:
             assert line.strip().startswith("platform: linux/arm64")
 
+class TestAcWorkspaceUpgrade:
+    def _simulate_old_render(self, project_path, relative_path, old_content):
+        '''
+        Make a file look as if it was rendered from an older template that has since changed upstream.
+        '''
+        from arches_containers.utils.templates import hash_bytes, RENDER_MANIFEST_FILE_NAME
+        with open(os.path.join(project_path, relative_path), "w", newline="") as f:
+            f.write(old_content)
+        manifest_path = os.path.join(project_path, RENDER_MANIFEST_FILE_NAME)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest["files"][relative_path] = hash_bytes(old_content.encode("utf-8"))
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+    def test_create_records_render_manifest(self, workspace_with_project):
+        from arches_containers.utils.templates import read_render_manifest, get_template
+        workspace, project_name = workspace_with_project
+        manifest = read_render_manifest(workspace.get_project(project_name).get_project_path())
+        assert manifest["arches_version"] == "7.6"
+        assert set(manifest["files"]) == set(get_template("7.6")["files"])
+
+    def test_upgrade_updates_only_untouched_upstream_changes(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        project_path = workspace.get_project(project_name).get_project_path()
+        dockerfile = os.path.join(project_path, "Dockerfile")
+        with open(dockerfile) as f:
+            rendered_dockerfile = f.read()
+        self._simulate_old_render(project_path, "Dockerfile", "FROM old\n")
+        # a local edit to a file that did not change upstream is kept
+        env_file = os.path.join(project_path, "docker", "env_file.env")
+        with open(env_file, "a") as f:
+            f.write("MY_SETTING=1\n")
+        untouched = os.path.join(project_path, "docker", "supervisor.conf")
+        untouched_mtime = os.stat(untouched).st_mtime_ns
+
+        conflicts = workspace.upgrade_project(project_name)
+
+        assert conflicts == []
+        with open(dockerfile) as f:
+            assert f.read() == rendered_dockerfile
+        with open(env_file) as f:
+            assert f.read().endswith("MY_SETTING=1\n")
+        assert os.stat(untouched).st_mtime_ns == untouched_mtime
+
+    def test_upgrade_reports_conflicts(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        project_path = workspace.get_project(project_name).get_project_path()
+        self._simulate_old_render(project_path, "Dockerfile", "FROM old\n")
+        dockerfile = os.path.join(project_path, "Dockerfile")
+        with open(dockerfile, "w") as f:
+            f.write("FROM old\nRUN my-customisation\n")
+
+        assert workspace.upgrade_project(project_name) == ["Dockerfile"]
+        with open(dockerfile) as f:
+            assert "my-customisation" in f.read()
+
+        assert workspace.upgrade_project(project_name, force=True) == []
+        with open(dockerfile + ".orig") as f:
+            assert "my-customisation" in f.read()
+        with open(dockerfile) as f:
+            assert "my-customisation" not in f.read()
+
+    def test_upgrade_dry_run_writes_nothing(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        project_path = workspace.get_project(project_name).get_project_path()
+        self._simulate_old_render(project_path, "Dockerfile", "FROM old\n")
+
+        workspace.upgrade_project(project_name, dry_run=True)
+
+        with open(os.path.join(project_path, "Dockerfile")) as f:
+            assert f.read() == "FROM old\n"
+
+    def test_upgrade_adds_new_config_keys_only(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        project = workspace.get_project(project_name)
+        config_path = os.path.join(project.get_project_path(), "config.json")
+        with open(config_path) as f:
+            config = json.load(f)
+        del config["arches_repo_organization"]
+        config["arches_repo_branch"] = "my/branch"
+        with open(config_path, "w") as f:
+            json.dump(config, f)
+
+        workspace.upgrade_project(project_name)
+
+        with open(config_path) as f:
+            config = json.load(f)
+        assert config["arches_repo_organization"] == "archesproject"
+        assert config["arches_repo_branch"] == "my/branch"
+
+    def test_create_gives_each_project_its_own_ports(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        class Args:
+            version = "7.6"
+            organization = None
+            branch = None
+
+        assert workspace.get_project(project_name)["port_offset"] == 0
+        assert workspace.create_project("second", Args())["port_offset"] == 1
+        # a directory without a config file is not a project and is skipped
+        os.makedirs(os.path.join(workspace._get_ac_directory_path(), "scratch"))
+        assert workspace.create_project("third", Args())["port_offset"] == 2
+        assert workspace.get_port_offsets(exclude="third") == {project_name: 0, "second": 1}
+
 class TestAcSettings:
     def test_settings_creation(self, temp_workspace):
         settings = temp_workspace.get_settings()
         settings.clear_active_project()
         assert settings.settings["active_project"] == ""
         assert settings.settings["host"] == "localhost"
-        assert settings.settings["port"] == 8002
+        assert "port" not in settings.settings
+
+    def test_missing_defaults_are_not_written_back_on_read(self, temp_workspace):
+        settings_path = os.path.join(temp_workspace._get_ac_directory_path(), "settings.json")
+        with open(settings_path, "w") as settings_file:
+            json.dump({"active_project": "", "host": "localhost"}, settings_file)
+        settings = AcSettings(temp_workspace)
+        assert settings.settings["dependency_timeout"] == DEFAULT_AC_SETTINGS["dependency_timeout"]
+        with open(settings_path) as settings_file:
+            assert json.load(settings_file) == {"active_project": "", "host": "localhost"}
+
+        # another process's locked update is kept, and the defaults are written along with it
+        AcSettings(temp_workspace).update_settings({"host": "example.org"})
+        assert settings.settings["host"] == "example.org"
+        with open(settings_path) as settings_file:
+            assert json.load(settings_file) == dict(DEFAULT_AC_SETTINGS, host="example.org")
 
     def test_set_active_project(self, workspace_with_project):
         workspace, project_name = workspace_with_project
@@ -139,6 +269,20 @@ class TestAcProject:
         project = workspace.get_project(project_name)
         assert project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value] == "test_org"
 
+    def test_project_save_keeps_concurrent_edits(self, workspace_with_project):
+        workspace, project_name = workspace_with_project
+        # two independent views of the same config, as two processes would have
+        first = AcProject(project_name, workspace._get_ac_directory_path())
+        second = AcProject(project_name, workspace._get_ac_directory_path())
+        first[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value] = "test_org"
+        first.save()
+        second[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value] = "test_branch"
+        second.save()
+
+        project = AcProject(project_name, workspace._get_ac_directory_path())
+        assert project[AcProjectSettings.PROJECT_ARCHES_REPO_ORGANIZATION.value] == "test_org"
+        assert project[AcProjectSettings.PROJECT_ARCHES_REPO_BRANCH.value] == "test_branch"
+
     def test_get_project_path(self, workspace_with_project):
         workspace, project_name = workspace_with_project
         project = workspace.get_project(project_name)